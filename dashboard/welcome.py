@@ -1,9 +1,9 @@
 '''A script that creates a Streamlit dashboard using book data from the RDS'''
-import urllib.request
 from os import environ as ENV
 import logging
 import pandas as pd
 import requests
+from requests.adapters import HTTPAdapter
 import streamlit as st
 import psycopg2
 from dotenv import load_dotenv
@@ -17,6 +17,29 @@ load_dotenv()
 
 
 GOODREADS_URL = "https://www.goodreads.com/author/show/"
+GOODREADS_HEADERS = {
+    "User-Agent": (
+        "Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
+        "AppleWebKit/537.36 (KHTML, like Gecko) "
+        "Chrome/122.0.0.0 Safari/537.36"
+    ),
+    "Accept-Encoding": "gzip, deflate",
+    "Connection": "keep-alive"
+}
+
+
+class AuthorPageError(Exception):
+    '''Raised when an author page can't be fetched or doesn't have the author's details'''
+
+
+@st.cache_resource
+def get_http_session() -> requests.Session:
+    '''Returns a keep-alive session shared across reruns, so repeated
+    requests to goodreads.com reuse the same pooled connection'''
+    session = requests.Session()
+    session.headers.update(GOODREADS_HEADERS)
+    session.mount("https://", HTTPAdapter(pool_connections=1, pool_maxsize=4))
+    return session
 
 
 def connect_to_database() -> psycopg2.connect:
@@ -35,20 +58,14 @@ def connect_to_database() -> psycopg2.connect:
 
 def validate_author_url(author_url: str) -> bool:
     '''Checks if author URL contains desired string pattern, and returns 200 status code'''
-    headers = {
-        "User-Agent": (
-            "Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
-            "AppleWebKit/537.36 (KHTML, like Gecko) "
-            "Chrome/122.0.0.0 Safari/537.36"
-        )}
     if "www.goodreads.com/author/show/" not in author_url:
         st.write(
             ":x: Incorrect URL format - please review the above instructions and try again.")
         return False
-    if requests.get(author_url, headers=headers, timeout=50).status_code != 200:
-        st.write(requests.get(author_url, headers=headers, timeout=50).status_code)
-        st.write(
-            ":x: Unable to reach given URL: please check the URL link works for you in your browser.")
+    try:
+        get_author_page(author_url)
+    except AuthorPageError as e:
+        st.write(f":x: {e}")
         return False
     return True
 
@@ -81,11 +98,25 @@ def validate_email(email: str) -> bool:
     return True
 
 
-def get_soup(url: str) -> BeautifulSoup:
-    '''Returns a beautifulsoup HTML parser for a given goodreads.com url.'''
-    with urllib.request.urlopen(url) as page:
-        html = page.read().decode('utf-8')
-    return BeautifulSoup(html, "lxml")
+@st.cache_data(ttl=600, max_entries=64, show_spinner=False)
+def get_author_page(author_url: str) -> dict:
+    '''Fetches an author page and parses the author's name and image, remembered
+    for ten minutes so checking and then adding an author only fetches their page once.
+    Raises AuthorPageError if the page can't be fetched or read, which isn't remembered,
+    so the next attempt fetches the page again'''
+    response = get_http_session().get(author_url, timeout=50)
+    if response.status_code != 200:
+        raise AuthorPageError(
+            f"Unable to reach given URL ({response.status_code}): "
+            "please check the URL link works for you in your browser.")
+    author_soup = BeautifulSoup(response.content.decode('utf-8'), "lxml")
+    try:
+        return {'author_name': get_author_name(author_soup),
+                'author_image_url': get_author_image(author_soup)}
+    except AttributeError as e:
+        raise AuthorPageError(
+            "Unable to find the author's name and image at the given URL: "
+            "please check it is an author's page.") from e
 
 
 def get_author_name(author_soup: BeautifulSoup) -> dict:
@@ -102,14 +133,11 @@ def get_author_image(author_soup: BeautifulSoup) -> dict:
 def get_author_data(author_url: str) -> dict:
     '''Scrapes average_rating, rating_count and review_count
       for a given goodreads.com author url.'''
-    author_soup: BeautifulSoup = get_soup(author_url)
-
-    author_name = get_author_name(author_soup)
-    author_image_url = get_author_image(author_soup)
+    author_page = get_author_page(author_url)
     author_data = {
-        'author_name': author_name,
+        'author_name': author_page['author_name'],
         'author_url': author_url,
-        'author_image_url': author_image_url
+        'author_image_url': author_page['author_image_url']
     }
     return author_data
 
@@ -143,8 +171,8 @@ def standardise_author_url(url: str) -> str:
 
 def mini_etl(author_url: str, conn: psycopg2.connect):
     '''A mini version of the URL that inserts author information only into the DB'''
-    author_data = get_author_data(author_url)
     try:
+        author_data = get_author_data(author_url)
         is_valid_url(author_url)
         is_valid_image_url(author_data['author_image_url'])
         author_data['author_url'] = standardise_author_url(author_url)
@@ -167,6 +195,8 @@ def mini_etl(author_url: str, conn: psycopg2.connect):
 
         return "success"
 
+    except AuthorPageError as e:
+        return f"failure: {e}"
     except ValueError as e:
         return f"failure: valueerror: {e}"
     except KeyError as e:
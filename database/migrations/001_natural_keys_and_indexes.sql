@@ -0,0 +1,38 @@
+-- 001: unique constraints on the natural keys and indexes for the hot lookups.
+-- A unique constraint can't be added while the table has duplicates, which can be found with e.g.
+-- SELECT author_url, COUNT(*) FROM author GROUP BY author_url HAVING COUNT(*) > 1;
+
+CREATE TABLE IF NOT EXISTS schema_migration (
+    version VARCHAR PRIMARY KEY,
+    applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+DO $$
+BEGIN
+    IF NOT EXISTS (SELECT 1 FROM pg_constraint WHERE conname = 'unique_publisher_email') THEN
+        ALTER TABLE publisher ADD CONSTRAINT unique_publisher_email UNIQUE (publisher_email);
+    END IF;
+    IF NOT EXISTS (SELECT 1 FROM pg_constraint WHERE conname = 'unique_author_url') THEN
+        ALTER TABLE author ADD CONSTRAINT unique_author_url UNIQUE (author_url);
+    END IF;
+    IF NOT EXISTS (SELECT 1 FROM pg_constraint WHERE conname = 'unique_publisher_author') THEN
+        ALTER TABLE author_assignment
+        ADD CONSTRAINT unique_publisher_author UNIQUE (publisher_id, author_id);
+    END IF;
+    -- Also serves lookups of an author's books, as author_id comes first
+    IF NOT EXISTS (SELECT 1 FROM pg_constraint WHERE conname = 'unique_author_book') THEN
+        ALTER TABLE book ADD CONSTRAINT unique_author_book UNIQUE (author_id, book_url_path);
+    END IF;
+END $$;
+
+CREATE INDEX IF NOT EXISTS author_name_index ON author (author_name);
+
+CREATE INDEX IF NOT EXISTS book_url_title_index ON book (book_url_path, book_title);
+
+CREATE INDEX IF NOT EXISTS author_measurement_author_recorded
+ON author_measurement (author_id, date_recorded);
+
+CREATE INDEX IF NOT EXISTS book_measurement_book_recorded
+ON book_measurement (book_id, date_recorded);
+
+INSERT INTO schema_migration (version) VALUES ('001') ON CONFLICT DO NOTHING;
@@ -0,0 +1,114 @@
+-- 002: partitions author_measurement and book_measurement by month of date_recorded.
+-- The existing measurements are copied into the partitioned tables, keeping their ids.
+-- The index keeping one measurement per day can't be on a partitioned table, as it is on
+-- an expression, so create_measurement_partition adds it to every partition instead.
+-- Only the latest measurement of each day is copied, as the rows recorded before that
+-- index existed can have more than one, e.g. from a run that was retried.
+
+CREATE OR REPLACE FUNCTION create_measurement_partition(parent_table TEXT, month DATE)
+RETURNS TEXT AS $$
+DECLARE
+    month_start DATE := date_trunc('month', month);
+    partition_name TEXT := parent_table || '_' || to_char(month_start, 'YYYY_MM');
+    key_column TEXT := replace(parent_table, '_measurement', '_id');
+BEGIN
+    EXECUTE format('CREATE TABLE IF NOT EXISTS %I PARTITION OF %I FOR VALUES FROM (%L) TO (%L)',
+                   partition_name, parent_table, month_start,
+                   month_start + INTERVAL '1 month');
+    EXECUTE format('CREATE UNIQUE INDEX IF NOT EXISTS %I ON %I (%I, (CAST(date_recorded AS DATE)))',
+                   partition_name || '_day', partition_name, key_column);
+    RETURN partition_name;
+END;
+$$ LANGUAGE plpgsql;
+
+
+ALTER TABLE author_measurement RENAME TO author_measurement_unpartitioned;
+ALTER INDEX author_measurement_pkey RENAME TO author_measurement_unpartitioned_pkey;
+ALTER SEQUENCE author_measurement_author_measurement_id_seq
+RENAME TO author_measurement_unpartitioned_id_seq;
+
+CREATE TABLE author_measurement (
+    author_measurement_id INT GENERATED ALWAYS AS IDENTITY,
+    rating_count INT,
+    average_rating FLOAT,
+    date_recorded TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    author_id INT NOT NULL,
+    shelved_count INT,
+    review_count INT,
+    PRIMARY KEY (author_measurement_id, date_recorded),
+    CONSTRAINT fk_author_id FOREIGN KEY (author_id) REFERENCES author(author_id)
+) PARTITION BY RANGE (date_recorded);
+
+SELECT create_measurement_partition('author_measurement', CAST(month AS DATE))
+FROM generate_series(
+    date_trunc('month', COALESCE((SELECT MIN(date_recorded) FROM author_measurement_unpartitioned),
+                                 CURRENT_TIMESTAMP)),
+    date_trunc('month', CURRENT_TIMESTAMP) + INTERVAL '3 months',
+    INTERVAL '1 month') AS month;
+
+INSERT INTO author_measurement (author_measurement_id, rating_count, average_rating,
+                                date_recorded, author_id, shelved_count, review_count)
+OVERRIDING SYSTEM VALUE
+SELECT DISTINCT ON (author_id, CAST(COALESCE(date_recorded, CURRENT_TIMESTAMP) AS DATE))
+       author_measurement_id, rating_count, average_rating,
+       COALESCE(date_recorded, CURRENT_TIMESTAMP), author_id, shelved_count, review_count
+FROM author_measurement_unpartitioned
+ORDER BY author_id, CAST(COALESCE(date_recorded, CURRENT_TIMESTAMP) AS DATE),
+         date_recorded DESC NULLS LAST, author_measurement_id DESC;
+
+SELECT setval(pg_get_serial_sequence('author_measurement', 'author_measurement_id'),
+              COALESCE(MAX(author_measurement_id), 0) + 1, false)
+FROM author_measurement;
+
+DROP TABLE author_measurement_unpartitioned;
+
+CREATE INDEX author_measurement_author_recorded
+ON author_measurement (author_id, date_recorded);
+
+
+ALTER TABLE book_measurement RENAME TO book_measurement_unpartitioned;
+ALTER INDEX book_measurement_pkey RENAME TO book_measurement_unpartitioned_pkey;
+ALTER SEQUENCE book_measurement_book_measurement_id_seq
+RENAME TO book_measurement_unpartitioned_id_seq;
+
+CREATE TABLE book_measurement (
+    book_measurement_id BIGINT GENERATED ALWAYS AS IDENTITY,
+    rating_count INT,
+    average_rating FLOAT,
+    date_recorded TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    book_id INT,
+    book_price FLOAT,
+    review_count INT,
+    PRIMARY KEY (book_measurement_id, date_recorded),
+    CONSTRAINT fk_book_id FOREIGN KEY (book_id) REFERENCES book (book_id)
+) PARTITION BY RANGE (date_recorded);
+
+SELECT create_measurement_partition('book_measurement', CAST(month AS DATE))
+FROM generate_series(
+    date_trunc('month', COALESCE((SELECT MIN(date_recorded) FROM book_measurement_unpartitioned),
+                                 CURRENT_TIMESTAMP)),
+    date_trunc('month', CURRENT_TIMESTAMP) + INTERVAL '3 months',
+    INTERVAL '1 month') AS month;
+
+INSERT INTO book_measurement (book_measurement_id, rating_count, average_rating,
+                              date_recorded, book_id, book_price, review_count)
+OVERRIDING SYSTEM VALUE
+SELECT DISTINCT ON (book_id, CAST(COALESCE(date_recorded, CURRENT_TIMESTAMP) AS DATE))
+       book_measurement_id, rating_count, average_rating,
+       COALESCE(date_recorded, CURRENT_TIMESTAMP), book_id, book_price, review_count
+FROM book_measurement_unpartitioned
+ORDER BY book_id, CAST(COALESCE(date_recorded, CURRENT_TIMESTAMP) AS DATE),
+         date_recorded DESC NULLS LAST, book_measurement_id DESC;
+
+SELECT setval(pg_get_serial_sequence('book_measurement', 'book_measurement_id'),
+              COALESCE(MAX(book_measurement_id), 0) + 1, false)
+FROM book_measurement;
+
+DROP TABLE book_measurement_unpartitioned;
+
+CREATE INDEX book_measurement_book_recorded
+ON book_measurement (book_id, date_recorded);
+
+ANALYZE author_measurement, book_measurement;
+
+INSERT INTO schema_migration (version) VALUES ('002') ON CONFLICT DO NOTHING;
@@ -0,0 +1,8 @@
+-- 003: marks whether a book measurement came from fetching the book's page, or reused
+-- the values of an earlier fetch, so incremental runs can tell when a page was last fetched.
+-- The measurements already stored all came from fetched pages.
+
+ALTER TABLE book_measurement
+ADD COLUMN IF NOT EXISTS book_page_fetched BOOLEAN NOT NULL DEFAULT TRUE;
+
+INSERT INTO schema_migration (version) VALUES ('003') ON CONFLICT DO NOTHING;
@@ -0,0 +1,23 @@
+-- 004: the tables pipeline/checkpoint.py records runs and the stage each author has
+-- reached in. The index keeping one measurement per day comes from 002, which adds it
+-- to every measurement partition.
+
+CREATE TABLE IF NOT EXISTS pipeline_run (
+    run_id VARCHAR PRIMARY KEY,
+    started_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    finished_at TIMESTAMP
+);
+
+CREATE TABLE IF NOT EXISTS run_state (
+    run_state_id INT PRIMARY KEY GENERATED ALWAYS AS IDENTITY,
+    run_id VARCHAR NOT NULL,
+    author_id INT NOT NULL,
+    stage VARCHAR NOT NULL CHECK (stage IN ('extracted', 'transformed', 'loaded')),
+    started_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    CONSTRAINT fk_run_id FOREIGN KEY (run_id) REFERENCES pipeline_run (run_id),
+    CONSTRAINT fk_author_id FOREIGN KEY (author_id) REFERENCES author (author_id),
+    CONSTRAINT unique_run_author UNIQUE (run_id, author_id)
+);
+
+INSERT INTO schema_migration (version) VALUES ('004') ON CONFLICT DO NOTHING;
@@ -0,0 +1,8 @@
+-- 005: keeps the seconds each author took in a run on its pipeline_run row, which
+-- pipeline/deadline.py estimates the time per author from, as a Lambda has nowhere
+-- else to keep them between invocations.
+
+ALTER TABLE pipeline_run
+ADD COLUMN IF NOT EXISTS author_seconds FLOAT[];
+
+INSERT INTO schema_migration (version) VALUES ('005') ON CONFLICT DO NOTHING;
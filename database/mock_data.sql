@@ -3,16 +3,16 @@ INSERT INTO author (author_name, author_url, author_image_url, date_added) VALUE
 ('J.K. Rowling', 'https://www.goodreads.com/author/show/1077326', 'https://images.gr-assets.com/authors/1596216614p5/1077326.jpg', '2025-04-16 16:42:29.346177');
 
 INSERT INTO book (author_id, book_title, year_published, big_image_url, small_image_url, book_url_path, date_added) VALUES
-(1, 'The Hunger Games', 2008, 'https://images.gr-assets.com/books/1447303603l/2767052.jpg', 'https://images.gr-assets.com/books/1447303603s/2767052.jpg', 'https://www.goodreads.com/author/show/153394', '2025-04-08 10:00:00'),
-(1, 'Catching Fire', 2009, 'https://images.gr-assets.com/books/1447303603l/6148028.jpg', 'https://images.gr-assets.com/books/1447303603s/6148028.jpg', 'https://www.goodreads.com/author/show/153394', '2025-04-08 10:00:00'),
-(1, 'Mockingjay', 2010, 'https://images.gr-assets.com/books/1447303603l/7260188.jpg', 'https://images.gr-assets.com/books/1447303603s/7260188.jpg', 'https://www.goodreads.com/author/show/153394', '2025-04-08 10:00:00'),
-(2, 'The Hobbit', 1937, 'https://images.gr-assets.com/books/1372847500l/5907.jpg', 'https://images.gr-assets.com/books/1372847500s/5907.jpg', 'https://www.goodreads.com/author/show/153394', '2025-04-08 10:00:00'),
-(2, 'The Fellowship of the Ring', 1954, 'https://images.gr-assets.com/books/1298411339l/34.jpg', 'https://images.gr-assets.com/books/1298411339s/34.jpg', 'https://www.goodreads.com/author/show/153394', '2025-04-08 10:00:00'),
-(2, 'The Two Towers', 1954, 'https://images.gr-assets.com/books/1546071216l/15241.jpg', 'https://images.gr-assets.com/books/1546071216s/15241.jpg', 'https://www.goodreads.com/author/show/153394', '2025-04-08 10:00:00'),
-(2, 'The Return of the King', 1955, 'https://images.gr-assets.com/books/1546071337l/18512.jpg', 'https://images.gr-assets.com/books/1546071337s/18512.jpg', 'https://www.goodreads.com/author/show/153394', '2025-04-08 10:00:00'),
-(3, 'Harry Potter and the Philosophers Stone', 1997, 'https://images.gr-assets.com/books/1474154022l/3.jpg', 'https://images.gr-assets.com/books/1474154022s/3.jpg', 'https://www.goodreads.com/author/show/153394', '2025-04-08 10:00:00'),
-(3, 'Harry Potter and the Chamber of Secrets', 1998, 'https://images.gr-assets.com/books/1474169725l/15881.jpg', 'https://images.gr-assets.com/books/1474169725s/15881.jpg', 'https://www.goodreads.com/author/show/153394', '2025-04-08 10:00:00'),
-(3, 'Harry Potter and the Prisoner of Azkaban', 1999, 'https://images.gr-assets.com/books/1630547330l/5.jpg', 'https://images.gr-assets.com/books/1630547330s/5.jpg', 'https://www.goodreads.com/author/show/153394', '2025-04-08 10:00:00');
+(1, 'The Hunger Games', 2008, 'https://images.gr-assets.com/books/1447303603l/2767052.jpg', 'https://images.gr-assets.com/books/1447303603s/2767052.jpg', 'https://www.goodreads.com/book/show/2767052-the-hunger-games', '2025-04-08 10:00:00'),
+(1, 'Catching Fire', 2009, 'https://images.gr-assets.com/books/1447303603l/6148028.jpg', 'https://images.gr-assets.com/books/1447303603s/6148028.jpg', 'https://www.goodreads.com/book/show/6148028-catching-fire', '2025-04-08 10:00:00'),
+(1, 'Mockingjay', 2010, 'https://images.gr-assets.com/books/1447303603l/7260188.jpg', 'https://images.gr-assets.com/books/1447303603s/7260188.jpg', 'https://www.goodreads.com/book/show/7260188-mockingjay', '2025-04-08 10:00:00'),
+(2, 'The Hobbit', 1937, 'https://images.gr-assets.com/books/1372847500l/5907.jpg', 'https://images.gr-assets.com/books/1372847500s/5907.jpg', 'https://www.goodreads.com/book/show/5907.The_Hobbit', '2025-04-08 10:00:00'),
+(2, 'The Fellowship of the Ring', 1954, 'https://images.gr-assets.com/books/1298411339l/34.jpg', 'https://images.gr-assets.com/books/1298411339s/34.jpg', 'https://www.goodreads.com/book/show/61215351-the-fellowship-of-the-ring', '2025-04-08 10:00:00'),
+(2, 'The Two Towers', 1954, 'https://images.gr-assets.com/books/1546071216l/15241.jpg', 'https://images.gr-assets.com/books/1546071216s/15241.jpg', 'https://www.goodreads.com/book/show/15241.The_Two_Towers', '2025-04-08 10:00:00'),
+(2, 'The Return of the King', 1955, 'https://images.gr-assets.com/books/1546071337l/18512.jpg', 'https://images.gr-assets.com/books/1546071337s/18512.jpg', 'https://www.goodreads.com/book/show/18512.The_Return_of_the_King', '2025-04-08 10:00:00'),
+(3, 'Harry Potter and the Philosophers Stone', 1997, 'https://images.gr-assets.com/books/1474154022l/3.jpg', 'https://images.gr-assets.com/books/1474154022s/3.jpg', 'https://www.goodreads.com/book/show/3.Harry_Potter_and_the_Sorcerer_s_Stone', '2025-04-08 10:00:00'),
+(3, 'Harry Potter and the Chamber of Secrets', 1998, 'https://images.gr-assets.com/books/1474169725l/15881.jpg', 'https://images.gr-assets.com/books/1474169725s/15881.jpg', 'https://www.goodreads.com/book/show/15881.Harry_Potter_and_the_Chamber_of_Secrets', '2025-04-08 10:00:00'),
+(3, 'Harry Potter and the Prisoner of Azkaban', 1999, 'https://images.gr-assets.com/books/1630547330l/5.jpg', 'https://images.gr-assets.com/books/1630547330s/5.jpg', 'https://www.goodreads.com/book/show/5.Harry_Potter_and_the_Prisoner_of_Azkaban', '2025-04-08 10:00:00');
 
 INSERT INTO author_measurement (rating_count, average_rating, date_recorded, author_id, shelved_count, review_count) VALUES
 -- Day 1
@@ -1,10 +1,11 @@
-DROP TABLE IF EXISTS author_assignment, author_measurement, book_measurement, book, author, publisher;
+DROP TABLE IF EXISTS schema_migration, run_state, pipeline_run, author_assignment, author_measurement, book_measurement, book, author, publisher;
 
 CREATE TABLE publisher (
     publisher_id SMALLINT PRIMARY KEY GENERATED ALWAYS AS IDENTITY,
     publisher_email VARCHAR NOT NULL,
     publisher_name VARCHAR,
-    date_subscribed TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    date_subscribed TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    CONSTRAINT unique_publisher_email UNIQUE (publisher_email)
 );
 
 CREATE TABLE author (
@@ -12,27 +13,35 @@ CREATE TABLE author (
     author_name VARCHAR NOT NULL,
     author_url VARCHAR NOT NULL,
     author_image_url VARCHAR,
-    date_added TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    date_added TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    CONSTRAINT unique_author_url UNIQUE (author_url)
 );
 
+CREATE INDEX author_name_index ON author (author_name);
+
 CREATE TABLE author_assignment (
     author_assignment_id INT PRIMARY KEY GENERATED ALWAYS AS IDENTITY,
     author_id INT NOT NULL,
     publisher_id SMALLINT NOT NULL,
     CONSTRAINT fk_author_id FOREIGN KEY (author_id) REFERENCES author (author_id),
-    CONSTRAINT fk_publisher_id FOREIGN KEY (publisher_id) REFERENCES publisher (publisher_id)
+    CONSTRAINT fk_publisher_id FOREIGN KEY (publisher_id) REFERENCES publisher (publisher_id),
+    CONSTRAINT unique_publisher_author UNIQUE (publisher_id, author_id)
 );
 
 CREATE TABLE author_measurement (
-    author_measurement_id INT PRIMARY KEY GENERATED ALWAYS AS IDENTITY,
+    author_measurement_id INT GENERATED ALWAYS AS IDENTITY,
     rating_count INT,
     average_rating FLOAT,
-    date_recorded TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    date_recorded TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
     author_id INT NOT NULL,
     shelved_count INT,
     review_count INT,
+    PRIMARY KEY (author_measurement_id, date_recorded),
     CONSTRAINT fk_author_id FOREIGN KEY (author_id) REFERENCES author(author_id)
-);
+) PARTITION BY RANGE (date_recorded);
+
+CREATE INDEX author_measurement_author_recorded
+ON author_measurement (author_id, date_recorded);
 
 
 CREATE TABLE book (
@@ -44,20 +53,81 @@ CREATE TABLE book (
     small_image_url VARCHAR,
     book_url_path VARCHAR NOT NULL,
     date_added TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-    CONSTRAINT fk_author_id FOREIGN KEY (author_id) REFERENCES author (author_id)
+    CONSTRAINT fk_author_id FOREIGN KEY (author_id) REFERENCES author (author_id),
+    CONSTRAINT unique_author_book UNIQUE (author_id, book_url_path)
 );
 
+CREATE INDEX book_url_title_index ON book (book_url_path, book_title);
+
 CREATE TABLE book_measurement (
-    book_measurement_id BIGINT PRIMARY KEY GENERATED ALWAYS AS IDENTITY,
+    book_measurement_id BIGINT GENERATED ALWAYS AS IDENTITY,
     rating_count INT,
     average_rating FLOAT,
-    date_recorded TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    date_recorded TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
     book_id INT,
     book_price FLOAT,
     review_count INT,
+    book_page_fetched BOOLEAN NOT NULL DEFAULT TRUE,
+    PRIMARY KEY (book_measurement_id, date_recorded),
     CONSTRAINT fk_book_id FOREIGN KEY (book_id) REFERENCES book (book_id)
+) PARTITION BY RANGE (date_recorded);
+
+CREATE INDEX book_measurement_book_recorded
+ON book_measurement (book_id, date_recorded);
+
+-- The measurement tables are partitioned by month of date_recorded. Each partition has
+-- its own index keeping one measurement per day, as that index is on an expression,
+-- which a partitioned table can't have a unique index on.
+CREATE OR REPLACE FUNCTION create_measurement_partition(parent_table TEXT, month DATE)
+RETURNS TEXT AS $$
+DECLARE
+    month_start DATE := date_trunc('month', month);
+    partition_name TEXT := parent_table || '_' || to_char(month_start, 'YYYY_MM');
+    key_column TEXT := replace(parent_table, '_measurement', '_id');
+BEGIN
+    EXECUTE format('CREATE TABLE IF NOT EXISTS %I PARTITION OF %I FOR VALUES FROM (%L) TO (%L)',
+                   partition_name, parent_table, month_start,
+                   month_start + INTERVAL '1 month');
+    EXECUTE format('CREATE UNIQUE INDEX IF NOT EXISTS %I ON %I (%I, (CAST(date_recorded AS DATE)))',
+                   partition_name || '_day', partition_name, key_column);
+    RETURN partition_name;
+END;
+$$ LANGUAGE plpgsql;
+
+-- From the month of the mock data to three months ahead, after which partitions.py adds them
+SELECT create_measurement_partition(parent_table, CAST(month AS DATE))
+FROM unnest(ARRAY['author_measurement', 'book_measurement']) AS parent_table,
+generate_series(CAST('2025-04-01' AS TIMESTAMP),
+                date_trunc('month', CURRENT_TIMESTAMP) + INTERVAL '3 months',
+                INTERVAL '1 month') AS month;
+
+CREATE TABLE pipeline_run (
+    run_id VARCHAR PRIMARY KEY,
+    started_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    finished_at TIMESTAMP,
+    author_seconds FLOAT[]
+);
+
+CREATE TABLE run_state (
+    run_state_id INT PRIMARY KEY GENERATED ALWAYS AS IDENTITY,
+    run_id VARCHAR NOT NULL,
+    author_id INT NOT NULL,
+    stage VARCHAR NOT NULL CHECK (stage IN ('extracted', 'transformed', 'loaded')),
+    started_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    CONSTRAINT fk_run_id FOREIGN KEY (run_id) REFERENCES pipeline_run (run_id),
+    CONSTRAINT fk_author_id FOREIGN KEY (author_id) REFERENCES author (author_id),
+    CONSTRAINT unique_run_author UNIQUE (run_id, author_id)
+);
+
+CREATE TABLE schema_migration (
+    version VARCHAR PRIMARY KEY,
+    applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
 );
 
+-- The tables above already include every migration
+INSERT INTO schema_migration (version) VALUES ('001'), ('002'), ('003'), ('004'), ('005');
+
 INSERT INTO author (author_name, author_url, author_image_url)
 VALUES ('Suzanne Collins', 'https://www.goodreads.com/author/show/153394', 'https://images.gr-assets.com/authors/1630199330p5/153394.jpg');
 
@@ -0,0 +1,116 @@
+'''Benchmarks writing book measurements to the Postgres database in the .env, which
+should be a local one, through executemany (the per row path), a single
+execute_values insert (the bulk load path) and COPY (the COPY_MEASUREMENTS path),
+e.g. `python benchmark_load.py --rows 10000 100000 1000000 --flush-rows 1000 10000`.
+Only COPY is timed at each flush size, as the other writers send every row at once.
+The rows go into a temporary copy of book_measurement, without its foreign key,
+so nothing is kept.'''
+import time
+import argparse
+from functools import partial
+from contextlib import redirect_stdout
+from io import StringIO
+from load import (connect_to_database, upload_new_values_to_database, insert_measurements,
+                  copy_measurements, format_values_to_upload, COLUMN_NAMES_IN_TABLES,
+                  DB_NAME, DB_USERNAME, DB_PASSWORD, DB_HOST, DB_PORT)
+
+TABLE_NAME = 'book_measurement'
+COLUMN_NAMES = COLUMN_NAMES_IN_TABLES[TABLE_NAME]
+
+
+def get_measurements(rows: int) -> list[dict]:
+    '''Returns a measurement for each of rows books.'''
+    return [{'book_id': book_id, 'rating_count': book_id * 3,
+             'average_rating': round(3 + (book_id % 200) / 100, 2),
+             'review_count': book_id % 5000, 'book_page_fetched': True}
+            for book_id in range(1, rows + 1)]
+
+
+def write_with_executemany(measurements: list[dict], conn) -> None:
+    '''Writes the measurements with one INSERT per row, as upload_new_values_to_database does.'''
+    with redirect_stdout(StringIO()):
+        upload_new_values_to_database(format_values_to_upload(measurements, COLUMN_NAMES),
+                                      conn, COLUMN_NAMES, TABLE_NAME)
+
+
+def write_with_execute_values(measurements: list[dict], conn) -> None:
+    '''Writes the measurements with the multi row INSERT of the bulk loader.'''
+    with conn.cursor() as cursor:
+        insert_measurements(measurements, cursor, TABLE_NAME, COLUMN_NAMES)
+    conn.commit()
+
+
+def write_with_copy(measurements: list[dict], conn, flush_rows: int) -> None:
+    '''Writes the measurements through COPY, flush_rows at a time.'''
+    with conn.cursor() as cursor:
+        copy_measurements(measurements, cursor, TABLE_NAME, COLUMN_NAMES, flush_rows)
+    conn.commit()
+
+
+WRITERS = {'executemany': write_with_executemany,
+           'execute_values': write_with_execute_values}
+
+
+def create_benchmark_table(conn) -> None:
+    '''Creates a temporary, unpartitioned book_measurement, which hides the real one
+    for this connection, with the per day unique index of its partitions but no
+    foreign key.'''
+    with conn.cursor() as cursor:
+        cursor.execute(f'''
+        CREATE TEMP TABLE {TABLE_NAME} (LIKE public.{TABLE_NAME} INCLUDING ALL)''')
+        cursor.execute(f'''
+        CREATE UNIQUE INDEX ON {TABLE_NAME} (book_id, (CAST(date_recorded AS DATE)))''')
+    conn.commit()
+
+
+def time_writer(writer, measurements: list[dict], conn) -> float:
+    '''Returns the rows per second a writer manages into an empty table.'''
+    with conn.cursor() as cursor:
+        cursor.execute(f'TRUNCATE {TABLE_NAME}')
+    conn.commit()
+    started = time.perf_counter()
+    writer(measurements, conn)
+    return len(measurements) / (time.perf_counter() - started)
+
+
+def run_benchmark(arguments: argparse.Namespace) -> list[dict]:
+    '''Times each writer at every row count, and COPY at every flush size,
+    skipping executemany above its limit.'''
+    conn = connect_to_database(DB_NAME, DB_USERNAME, DB_PASSWORD, DB_HOST, DB_PORT)
+    results = []
+    try:
+        create_benchmark_table(conn)
+        for rows in arguments.rows:
+            measurements = get_measurements(rows)
+            for name, writer in WRITERS.items():
+                if name == 'executemany' and rows > arguments.executemany_limit:
+                    continue
+                results.append({'rows': rows, 'writer': name, 'flush_rows': None,
+                                'rows_per_second': round(time_writer(writer, measurements, conn))})
+            for flush_rows in arguments.flush_rows:
+                copy_writer = partial(write_with_copy, flush_rows=flush_rows)
+                results.append({'rows': rows, 'writer': 'copy', 'flush_rows': flush_rows,
+                                'rows_per_second': round(time_writer(copy_writer, measurements,
+                                                                     conn))})
+    finally:
+        conn.close()
+    return results
+
+
+def get_arguments(argv: list[str] = None) -> argparse.Namespace:
+    '''Parses the row counts to benchmark and the COPY flush sizes.'''
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rows', type=int, nargs='+', default=[10000, 100000, 1000000])
+    parser.add_argument('--flush-rows', type=int, nargs='+', default=[10000],
+                        help='rows COPY sends at a time, only used by COPY')
+    parser.add_argument('--executemany-limit', type=int, default=100000,
+                        help='largest row count to time executemany at, as it is slow')
+    return parser.parse_args(argv)
+
+
+if __name__ == '__main__':
+    benchmark_arguments = get_arguments()
+    print(f"{'rows':>10}  {'writer':<16}{'flush rows':>12}{'rows/s':>10}")
+    for result in run_benchmark(benchmark_arguments):
+        print(f"{result['rows']:>10}  {result['writer']:<16}{result['flush_rows'] or '-':>12}"
+              f"{result['rows_per_second']:>10}")
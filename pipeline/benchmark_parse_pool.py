@@ -0,0 +1,72 @@
+'''Benchmarks how page throughput scales with the number of parser processes in
+parse_pool.py, against fetching and parsing on the same threads. Fetches are
+simulated with a fixed latency and return the saved test html, so the benchmark
+measures the pipeline rather than goodreads.com.'''
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from benchmark_parsers import read_test_html
+from parse_pool import ParsePipeline, BOOK_LIST_PAGE, parse_page
+
+FETCH_LATENCY_SECONDS = 0.05
+FETCH_WORKERS = 16
+PAGES = 64
+
+
+def simulated_fetch(html: str, latency: float):
+    '''Returns a fetch function that waits for latency seconds and returns the html.'''
+    def fetch(_url: str) -> str:
+        time.sleep(latency)
+        return html
+    return fetch
+
+
+def time_threads_only(pages: int, fetch, fetch_workers: int) -> float:
+    '''Returns the pages per second when each thread fetches and parses its own page.'''
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=fetch_workers) as executor:
+        list(executor.map(lambda page: parse_page(BOOK_LIST_PAGE, fetch(page)),
+                          range(pages)))
+    return pages / (time.perf_counter() - started)
+
+
+def time_parse_pool(pages: int, fetch, fetch_workers: int, parse_workers: int) -> float:
+    '''Returns the pages per second with fetching on threads and parsing on processes.'''
+    pipeline = ParsePipeline(fetch_workers=fetch_workers, parse_workers=parse_workers,
+                             queue_size=2 * parse_workers, fetch=fetch)
+    with pipeline:
+        started = time.perf_counter()
+        for page in range(pages):
+            pipeline.submit(BOOK_LIST_PAGE, str(page), page)
+        for _ in range(pages):
+            _, _, error = pipeline.get_result()
+            if error is not None:
+                raise error
+        elapsed = time.perf_counter() - started
+    return pages / elapsed
+
+
+def run_benchmark(pages: int = PAGES, fetch_workers: int = FETCH_WORKERS,
+                  latency: float = FETCH_LATENCY_SECONDS) -> list[dict]:
+    '''Times the threads only baseline and the parse pool with 1 up to every core.'''
+    fetch = simulated_fetch(read_test_html('test_book_list.html'), latency)
+    baseline = time_threads_only(pages, fetch, fetch_workers)
+    results = [{'parser': 'threads only', 'pages_per_second': round(baseline, 1),
+                'speedup': 1.0}]
+    parse_workers = 1
+    while parse_workers <= (os.cpu_count() or 1):
+        throughput = time_parse_pool(pages, fetch, fetch_workers, parse_workers)
+        results.append({'parser': f'{parse_workers} parsers',
+                        'pages_per_second': round(throughput, 1),
+                        'speedup': round(throughput / baseline, 1)})
+        parse_workers *= 2
+    return results
+
+
+if __name__ == '__main__':
+    page_count = int(sys.argv[1]) if len(sys.argv) > 1 else PAGES
+    print(f"{'parser':<16}{'pages/s':>10}{'speedup':>10}")
+    for result in run_benchmark(page_count):
+        print(f"{result['parser']:<16}{result['pages_per_second']:>10}"
+              f"{result['speedup']:>9}x")
@@ -0,0 +1,51 @@
+'''Benchmarks the BeautifulSoup parsing in extract.py against the lxml parsing in
+fast_extract.py, using the test html for each type of goodreads page.'''
+import timeit
+from os import path
+from fast_extract import (parse_author_page as lxml_author_page,
+                          parse_book_list_page as lxml_book_list_page,
+                          parse_book_page as lxml_book_page)
+from parse_pool import (parse_author_page as soup_author_page,
+                        parse_book_list_page as soup_book_list_page,
+                        parse_book_page as soup_book_page)
+
+
+def read_test_html(filename: str) -> str:
+    '''Reads one of the saved goodreads pages used by the tests.'''
+    with open(path.join(path.dirname(__file__), filename), 'r', encoding='utf-8') as html_file:
+        return html_file.read()
+
+
+PAGE_TYPES = {
+    'author page': ('test_author_page.html', soup_author_page, lxml_author_page),
+    'book list page': ('test_book_list.html', soup_book_list_page, lxml_book_list_page),
+    'book page': ('test_book_page.html', soup_book_page, lxml_book_page)
+}
+
+
+def time_parser(parse, html: str, repeats: int, number: int) -> float:
+    '''Returns the best average time in seconds to parse the html.'''
+    return min(timeit.repeat(lambda: parse(html), repeat=repeats, number=number)) / number
+
+
+def run_benchmark(repeats: int = 5, number: int = 5) -> list[dict]:
+    '''Times both parsers on each page type, checking they agree first.'''
+    results = []
+    for page_type, (filename, soup_parse, lxml_parse) in PAGE_TYPES.items():
+        html = read_test_html(filename)
+        if soup_parse(html) != lxml_parse(html):
+            raise ValueError(f"Parsers disagree on the {page_type}")
+        soup_time = time_parser(soup_parse, html, repeats, number)
+        lxml_time = time_parser(lxml_parse, html, repeats, number)
+        results.append({'page_type': page_type,
+                        'soup_ms': round(soup_time * 1000, 2),
+                        'lxml_ms': round(lxml_time * 1000, 2),
+                        'speedup': round(soup_time / lxml_time, 1)})
+    return results
+
+
+if __name__ == '__main__':
+    print(f"{'page type':<16}{'soup (ms)':>12}{'lxml (ms)':>12}{'speedup':>10}")
+    for result in run_benchmark():
+        print(f"{result['page_type']:<16}{result['soup_ms']:>12}"
+              f"{result['lxml_ms']:>12}{result['speedup']:>9}x")
@@ -0,0 +1,124 @@
+'''Benchmarks a whole pipeline run end to end against the mock goodreads server in
+mock_goodreads.py and the Postgres database in the .env, which should be a local
+one. The mock authors are added to the author table if they aren't there yet, and
+pipeline.handler is run over just those authors, reporting authors per minute,
+the p50/p95 latency of each page fetch and the peak memory of the run, e.g.
+`python benchmark_pipeline.py --authors 50 --mode async --throttle-rate 0.02`.'''
+import os
+import time
+import resource
+import argparse
+import multiprocessing
+from datetime import datetime
+from statistics import quantiles
+from mock_goodreads import add_mock_site_arguments, create_server, FIRST_AUTHOR_ID
+
+
+def serve_mock_site(arguments: argparse.Namespace, connection) -> None:
+    '''Runs the mock server in its own process, so its work isn't counted in the
+    benchmark, sending back its url and then its stats once told to stop.'''
+    with create_server(arguments) as server:
+        connection.send(server.base_url)
+        connection.recv()
+        connection.send(server.get_stats())
+
+
+def add_mock_authors(conn, author_urls: list[str]) -> None:
+    '''Adds the mock authors to the author table if they aren't there yet.'''
+    query = '''
+    INSERT INTO author (author_name, author_url)
+    SELECT %s, %s
+    WHERE NOT EXISTS (SELECT 1 FROM author WHERE author_url = %s)'''
+    with conn.cursor() as cursor:
+        for author_index, author_url in enumerate(author_urls):
+            cursor.execute(query, (f'Mock Author {author_index}', author_url, author_url))
+    conn.commit()
+
+
+def time_page_fetches(extract_module, latencies: list[float]) -> None:
+    '''Records how long every page fetch made by extract.py takes.'''
+    get_page = extract_module.get_page
+
+    def timed_get_page(*args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return get_page(*args, **kwargs)
+        finally:
+            latencies.append(time.perf_counter() - started)
+    extract_module.get_page = timed_get_page
+
+
+def get_percentiles(latencies: list[float]) -> dict:
+    '''Returns the p50 and p95 of the page latencies in milliseconds.'''
+    if len(latencies) < 2:
+        return {'p50_ms': None, 'p95_ms': None}
+    cut_points = quantiles(latencies, n=100)
+    return {'p50_ms': round(cut_points[49] * 1000, 1), 'p95_ms': round(cut_points[94] * 1000, 1)}
+
+
+def run_pipeline_against(base_url: str, arguments: argparse.Namespace) -> tuple:
+    '''Runs pipeline.handler over the mock authors on the server at base_url,
+    returning its response, how long it took and the latency of every page fetch.'''
+    # extract.py and transform.py read the base url when they are imported
+    os.environ['GOODREADS_BASE_URL'] = base_url
+    import extract  # pylint: disable=import-outside-toplevel
+    import pipeline  # pylint: disable=import-outside-toplevel
+    from load import connect_to_database  # pylint: disable=import-outside-toplevel
+
+    author_urls = [f'{base_url}/author/show/{author_id}' for author_id in
+                   range(FIRST_AUTHOR_ID, FIRST_AUTHOR_ID + arguments.authors)]
+    conn = connect_to_database(pipeline.DB_NAME, pipeline.DB_USERNAME, pipeline.DB_PASSWORD,
+                               pipeline.DB_HOST, pipeline.DB_PORT)
+    try:
+        add_mock_authors(conn, author_urls)
+    finally:
+        conn.close()
+
+    latencies = []
+    time_page_fetches(extract, latencies)
+    event = {'mode': arguments.mode,
+             'run_id': f"benchmark-{datetime.now().strftime('%Y-%m-%dT%H%M%S')}",
+             'continuation': {'author_urls': author_urls}}
+    started = time.perf_counter()
+    response = pipeline.handler(event)
+    return response, time.perf_counter() - started, latencies
+
+
+def run_benchmark(arguments: argparse.Namespace) -> dict:
+    '''Starts the mock server, points the pipeline at it and runs it over every mock author.'''
+    parent_connection, child_connection = multiprocessing.Pipe()
+    server_process = multiprocessing.Process(target=serve_mock_site,
+                                             args=(arguments, child_connection))
+    server_process.start()
+    base_url = parent_connection.recv()
+    try:
+        response, elapsed_seconds, latencies = run_pipeline_against(base_url, arguments)
+    finally:
+        parent_connection.send('stop')
+        server_stats = parent_connection.recv()
+        server_process.join()
+
+    stats = response.get('stats', {})
+    authors_loaded = stats.get('authors', 0) - stats.get('authors_failed', 0)
+    return {'mode': arguments.mode, 'status_code': response.get('statusCode'),
+            'authors': arguments.authors, 'authors_loaded': authors_loaded,
+            'elapsed_seconds': round(elapsed_seconds, 2),
+            'authors_per_minute': round(authors_loaded * 60 / elapsed_seconds, 1),
+            'pages_fetched': len(latencies), **get_percentiles(latencies),
+            'peak_rss_mb': round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+            'server': server_stats}
+
+
+def get_arguments(argv: list[str] = None) -> argparse.Namespace:
+    '''Parses the mock site options and the pipeline mode to benchmark.'''
+    parser = argparse.ArgumentParser(description=__doc__)
+    add_mock_site_arguments(parser)
+    parser.set_defaults(port=0)
+    parser.add_argument('--mode', default='serial',
+                        choices=['serial', 'async', 'parallel', 'staged'])
+    return parser.parse_args(argv)
+
+
+if __name__ == '__main__':
+    for name, value in run_benchmark(get_arguments()).items():
+        print(f"{name:<20}{value}")
@@ -0,0 +1,159 @@
+'''Checks the migrations in database/migrations against the database in the .env, by
+applying them to the tables as they were before 002, seeded with more than one
+measurement a day as rows from before the per day index can be. Everything runs in
+a scratch schema inside one transaction that is rolled back, so nothing is kept.
+Exits with 1 if a migration fails or leaves the data wrong, e.g.
+`python check_migrations.py --authors 10 --books 5 --days 40`.'''
+import sys
+import argparse
+from os import path
+from glob import glob
+import psycopg2
+from load import connect_to_database, DB_NAME, DB_USERNAME, DB_PASSWORD, DB_HOST, DB_PORT
+
+MIGRATIONS_DIRECTORY = path.join(path.dirname(__file__), '..', 'database', 'migrations')
+FIRST_CHECKED_VERSION = '002'
+SCRATCH_SCHEMA = 'migration_check'
+# The measurement tables as schema.sql created them before they were partitioned
+BASELINE_SCHEMA = '''
+CREATE TABLE schema_migration (
+    version VARCHAR PRIMARY KEY,
+    applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+CREATE TABLE author (
+    author_id INT PRIMARY KEY GENERATED ALWAYS AS IDENTITY,
+    author_name VARCHAR NOT NULL,
+    author_url VARCHAR NOT NULL,
+    author_image_url VARCHAR,
+    date_added TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+CREATE TABLE author_measurement (
+    author_measurement_id INT PRIMARY KEY GENERATED ALWAYS AS IDENTITY,
+    rating_count INT,
+    average_rating FLOAT,
+    date_recorded TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    author_id INT NOT NULL,
+    shelved_count INT,
+    review_count INT,
+    CONSTRAINT fk_author_id FOREIGN KEY (author_id) REFERENCES author(author_id)
+);
+CREATE TABLE book (
+    book_id INT PRIMARY KEY GENERATED ALWAYS AS IDENTITY,
+    author_id INT NOT NULL,
+    book_title VARCHAR NOT NULL,
+    year_published SMALLINT,
+    big_image_url VARCHAR,
+    small_image_url VARCHAR,
+    book_url_path VARCHAR NOT NULL,
+    date_added TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    CONSTRAINT fk_author_id FOREIGN KEY (author_id) REFERENCES author (author_id)
+);
+CREATE TABLE book_measurement (
+    book_measurement_id BIGINT PRIMARY KEY GENERATED ALWAYS AS IDENTITY,
+    rating_count INT,
+    average_rating FLOAT,
+    date_recorded TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    book_id INT,
+    book_price FLOAT,
+    review_count INT,
+    CONSTRAINT fk_book_id FOREIGN KEY (book_id) REFERENCES book (book_id)
+);'''
+# Every author and book is measured at 9:00 and again at 18:00 on each day, with the
+# hour as its rating count, so only the 18:00 measurements should be kept
+SEED_QUERIES = [
+    '''
+    INSERT INTO author (author_name, author_url)
+    SELECT 'Migration Check Author ' || n, 'https://migration-check.invalid/author/show/' || n
+    FROM generate_series(1, %(authors)s) n''',
+    '''
+    INSERT INTO book (author_id, book_title, book_url_path)
+    SELECT author_id, 'Migration Check Book ' || n, author_url || '/book/' || n
+    FROM author CROSS JOIN generate_series(1, %(books)s) n''',
+    '''
+    INSERT INTO author_measurement (author_id, rating_count, average_rating, date_recorded)
+    SELECT author_id, hour, 4.0, CURRENT_DATE - d + make_interval(hours => hour)
+    FROM author CROSS JOIN generate_series(1, %(days)s) d
+    CROSS JOIN unnest(ARRAY[9, 18]) hour''',
+    '''
+    INSERT INTO book_measurement (book_id, rating_count, average_rating, date_recorded)
+    SELECT book_id, hour, 4.0, CURRENT_DATE - d + make_interval(hours => hour)
+    FROM book CROSS JOIN generate_series(1, %(days)s) d
+    CROSS JOIN unnest(ARRAY[18, 9]) hour''']
+RESULT_CHECKS = {
+    'one author measurement a day':
+    'SELECT COUNT(*) = %(authors)s * %(days)s FROM author_measurement',
+    'latest author measurement of the day kept':
+    'SELECT bool_and(rating_count = 18) FROM author_measurement',
+    'one book measurement a day':
+    'SELECT COUNT(*) = %(authors)s * %(books)s * %(days)s FROM book_measurement',
+    'latest book measurement of the day kept':
+    'SELECT bool_and(rating_count = 18) FROM book_measurement',
+    'measurement ids continue after the copied ones': '''
+    WITH new_measurement AS (
+        INSERT INTO book_measurement (book_id, rating_count)
+        SELECT MIN(book_id), 0 FROM book
+        RETURNING book_measurement_id)
+    SELECT (SELECT book_measurement_id FROM new_measurement) > MAX(book_measurement_id)
+    FROM book_measurement'''}
+
+
+def get_migrations(first_version: str = FIRST_CHECKED_VERSION) -> list[str]:
+    '''Returns the paths of the migrations from first_version on, in order.'''
+    return [migration for migration in sorted(glob(path.join(MIGRATIONS_DIRECTORY, '*.sql')))
+            if path.basename(migration).split('_')[0] >= first_version]
+
+
+def check_migrations(conn, migrations: list[str], authors: int, books: int,
+                     days: int) -> list[str]:
+    '''Applies the migrations to seeded baseline tables in a scratch schema and
+    returns the checks that failed, including a migration that couldn't be applied.
+    Rolls back at the end.'''
+    parameters = {'authors': authors, 'books': books, 'days': days}
+    failures = []
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute(f'CREATE SCHEMA {SCRATCH_SCHEMA}')
+            cursor.execute(f'SET LOCAL search_path TO {SCRATCH_SCHEMA}')
+            cursor.execute(BASELINE_SCHEMA)
+            for query in SEED_QUERIES:
+                cursor.execute(query, parameters)
+            for migration in migrations:
+                with open(migration, encoding='utf-8') as migration_file:
+                    cursor.execute(migration_file.read())
+                print(f"Applied {path.basename(migration)}")
+            for name, query in RESULT_CHECKS.items():
+                cursor.execute(query, parameters)
+                if not cursor.fetchone()[0]:
+                    failures.append(name)
+    except psycopg2.Error as error:
+        failures.append(f"unable to apply the migrations: {error}")
+    finally:
+        conn.rollback()
+    return failures
+
+
+def get_arguments(argv: list[str] = None) -> argparse.Namespace:
+    '''Parses the amount of seed data and the first migration to check.'''
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--authors', type=int, default=10)
+    parser.add_argument('--books', type=int, default=5, help='books per author')
+    parser.add_argument('--days', type=int, default=40, help='days of measurements')
+    parser.add_argument('--from-version', default=FIRST_CHECKED_VERSION,
+                        help='first migration to apply to the baseline tables')
+    return parser.parse_args(argv)
+
+
+if __name__ == '__main__':
+    check_arguments = get_arguments()
+    connection = connect_to_database(DB_NAME, DB_USERNAME, DB_PASSWORD, DB_HOST, DB_PORT)
+    try:
+        failed_checks = check_migrations(connection, get_migrations(check_arguments.from_version),
+                                         check_arguments.authors, check_arguments.books,
+                                         check_arguments.days)
+    finally:
+        connection.close()
+    for failed_check in failed_checks:
+        print(f"Failed: {failed_check}")
+    if failed_checks:
+        sys.exit(1)
+    print("Every migration applied and kept the data intact")
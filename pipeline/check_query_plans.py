@@ -0,0 +1,191 @@
+'''Checks that the hot lookups of the pipeline, dashboard and emails are planned as
+index scans rather than sequential scans, against the Postgres database in the .env.
+By default it first adds 1000 synthetic authors with 20 books each and 50 days of
+measurements, 1,000,000 book measurements, so the planner sees a realistic amount of
+data. Everything runs in one transaction that is rolled back, so nothing is kept.
+Queries over recent measurements must also be pruned to the latest partitions.
+Exits with 1 if any query scans a whole table or too many partitions, e.g.
+`python check_query_plans.py --authors 1000 --books 20 --days 50`.'''
+import re
+import sys
+import argparse
+from load import connect_to_database, DB_NAME, DB_USERNAME, DB_PASSWORD, DB_HOST, DB_PORT
+
+CHECKED_TABLES = {'author', 'book', 'author_measurement', 'book_measurement'}
+PARTITION_SUFFIX = re.compile(r'_\d{4}_\d{2}$')
+SEED_URL = 'https://plan-check.invalid/author/show/'
+SEED_QUERIES = [
+    '''
+    SELECT create_measurement_partition(parent_table, CAST(month AS DATE))
+    FROM unnest(ARRAY['author_measurement', 'book_measurement']) AS parent_table,
+    generate_series(date_trunc('month', CAST(CURRENT_DATE - %(days)s AS TIMESTAMP)),
+                    CAST(CURRENT_DATE AS TIMESTAMP), INTERVAL '1 month') AS month''',
+    '''
+    INSERT INTO author (author_name, author_url)
+    SELECT 'Plan Check Author ' || n, %(url)s || n FROM generate_series(1, %(authors)s) n''',
+    '''
+    INSERT INTO book (author_id, book_title, book_url_path)
+    SELECT author_id, 'Plan Check Book ' || n, author_url || '/book/' || n
+    FROM author CROSS JOIN generate_series(1, %(books)s) n
+    WHERE author_url LIKE %(url)s || '%%' ''',
+    '''
+    INSERT INTO author_measurement (author_id, rating_count, average_rating, date_recorded)
+    SELECT author_id, d, 4.0, CURRENT_DATE - d
+    FROM author CROSS JOIN generate_series(1, %(days)s) d
+    WHERE author_url LIKE %(url)s || '%%' ''',
+    '''
+    INSERT INTO book_measurement (book_id, rating_count, average_rating, date_recorded)
+    SELECT book_id, d, 4.0, CURRENT_DATE - d
+    FROM book CROSS JOIN generate_series(1, %(days)s) d
+    WHERE book_url_path LIKE %(url)s || '%%' ''',
+    'ANALYZE author, book, author_measurement, book_measurement']
+SAMPLE_QUERY = '''
+    SELECT a.author_id, a.author_name, a.author_url, b.book_id, b.book_title, b.book_url_path
+    FROM author AS a JOIN book AS b ON a.author_id = b.author_id
+    ORDER BY b.book_id DESC LIMIT 1'''
+HOT_QUERIES = {
+    'author by url': 'SELECT COUNT(*) FROM author WHERE author_url = %(author_url)s',
+    'author by name': 'SELECT * FROM author WHERE author_name = %(author_name)s',
+    'book by title and url': '''
+    SELECT * FROM book WHERE book_title = %(book_title)s AND book_url_path = %(book_url_path)s''',
+    'books by author': 'SELECT * FROM book WHERE author_id = %(author_id)s',
+    'author measurements': '''
+    SELECT am.date_recorded, am.rating_count, am.average_rating
+    FROM author AS a
+    LEFT JOIN author_measurement AS am ON a.author_id = am.author_id
+    WHERE a.author_name = %(author_name)s''',
+    'book measurements by author': '''
+    SELECT b.book_title, bm.date_recorded, bm.rating_count
+    FROM book AS b
+    JOIN book_measurement AS bm ON b.book_id = bm.book_id
+    WHERE b.author_id = (
+        SELECT author_id FROM author WHERE author_name = %(author_name)s LIMIT 1)''',
+    'author rating change': '''
+    SELECT average_rating - LAG(average_rating) OVER (
+        ORDER BY am.date_recorded DESC) avg_change_since_yesterday
+    FROM author AS a
+    JOIN author_measurement AS am ON a.author_id = am.author_id
+    WHERE am.author_id = %(author_id)s
+    ORDER BY am.date_recorded DESC''',
+    'recent book measurements': '''
+    SELECT * FROM book_measurement
+    WHERE book_id = %(book_id)s AND date_recorded >= NOW() - INTERVAL '7 days' ''',
+    'recent author measurements': '''
+    SELECT am.date_recorded, am.rating_count
+    FROM author AS a
+    JOIN author_measurement AS am ON a.author_id = am.author_id
+    WHERE a.author_name = %(author_name)s AND am.date_recorded >= CURRENT_DATE - 7''',
+    'known books': '''
+    SELECT DISTINCT ON (b.book_url_path) b.book_url_path, bm.review_count, bm.date_recorded
+    FROM author AS a
+    JOIN book AS b ON b.author_id = a.author_id
+    JOIN book_measurement AS bm ON bm.book_id = b.book_id
+    WHERE a.author_url = ANY(ARRAY[%(author_url)s]) AND bm.book_page_fetched
+    AND bm.date_recorded >= NOW() - INTERVAL '7 days'
+    ORDER BY b.book_url_path, bm.date_recorded DESC'''}
+# The most partitions of a measurement table a query over the last week should read
+PRUNED_QUERIES = {'recent book measurements': 2, 'recent author measurements': 2,
+                  'known books': 2}
+
+
+def get_scans(plan: dict) -> list[tuple[str, str]]:
+    '''Returns the node type and table of every scan in an EXPLAIN (FORMAT JSON) plan.'''
+    scans = []
+    if 'Relation Name' in plan:
+        scans.append((plan['Node Type'], plan['Relation Name']))
+    for child_plan in plan.get('Plans', []):
+        scans.extend(get_scans(child_plan))
+    return scans
+
+
+def get_table_name(relation_name: str) -> str:
+    '''Returns the table a monthly measurement partition belongs to.'''
+    return PARTITION_SUFFIX.sub('', relation_name)
+
+
+def get_sequential_scans(plan: dict) -> list[str]:
+    '''Returns the checked tables, or their partitions, a plan reads with a sequential scan.'''
+    return [table for node_type, table in get_scans(plan)
+            if node_type == 'Seq Scan' and get_table_name(table) in CHECKED_TABLES]
+
+
+def get_scanned_partitions(plan: dict) -> dict:
+    '''Returns the number of partitions of each measurement table a plan reads.'''
+    partitions = {}
+    for _, table in set(get_scans(plan)):
+        if PARTITION_SUFFIX.search(table):
+            partitions[get_table_name(table)] = partitions.get(get_table_name(table), 0) + 1
+    return partitions
+
+
+def get_unpruned_tables(query_name: str, plan: dict) -> list[str]:
+    '''Returns the tables a query over recent measurements reads too many partitions of.'''
+    if query_name not in PRUNED_QUERIES:
+        return []
+    return [f'{table} ({count} partitions)'
+            for table, count in get_scanned_partitions(plan).items()
+            if count > PRUNED_QUERIES[query_name]]
+
+
+def seed_measurements(cursor, authors: int, books: int, days: int) -> None:
+    '''Adds synthetic authors, books and daily measurements, and refreshes the
+    planner's statistics.'''
+    for query in SEED_QUERIES:
+        cursor.execute(query, {'url': SEED_URL, 'authors': authors,
+                               'books': books, 'days': days})
+
+
+def explain_queries(cursor, parameters: dict) -> dict:
+    '''Returns the plan of every hot query, keyed by its name.'''
+    plans = {}
+    for query_name, query in HOT_QUERIES.items():
+        cursor.execute(f'EXPLAIN (FORMAT JSON) {query}', parameters)
+        plans[query_name] = cursor.fetchone()[0][0]['Plan']
+    return plans
+
+
+def check_query_plans(conn, authors: int, books: int, days: int) -> dict:
+    '''Returns the sequential scans and unpruned partitions in the plan of every hot
+    query, keyed by its name, after seeding the database if authors is above 0.
+    Rolls back at the end.'''
+    try:
+        with conn.cursor() as cursor:
+            if authors > 0:
+                seed_measurements(cursor, authors, books, days)
+            cursor.execute(SAMPLE_QUERY)
+            columns = [column[0] for column in cursor.description]
+            parameters = dict(zip(columns, cursor.fetchone()))
+            plans = explain_queries(cursor, parameters)
+    finally:
+        conn.rollback()
+    for query_name, plan in plans.items():
+        scans = ', '.join(f'{node} on {table}' for node, table in get_scans(plan))
+        print(f"{query_name:<30}{scans}")
+    return {query_name: get_sequential_scans(plan) + get_unpruned_tables(query_name, plan)
+            for query_name, plan in plans.items()}
+
+
+def get_arguments(argv: list[str] = None) -> argparse.Namespace:
+    '''Parses the amount of synthetic data to seed.'''
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--authors', type=int, default=1000,
+                        help='synthetic authors to add, 0 to use the data as it is')
+    parser.add_argument('--books', type=int, default=20, help='books per author')
+    parser.add_argument('--days', type=int, default=50, help='days of measurements')
+    return parser.parse_args(argv)
+
+
+if __name__ == '__main__':
+    check_arguments = get_arguments()
+    connection = connect_to_database(DB_NAME, DB_USERNAME, DB_PASSWORD, DB_HOST, DB_PORT)
+    try:
+        regression_scans = check_query_plans(connection, check_arguments.authors,
+                                             check_arguments.books, check_arguments.days)
+    finally:
+        connection.close()
+    regressions = {name: tables for name, tables in regression_scans.items() if tables}
+    for name, tables in regressions.items():
+        print(f"Whole table scan in '{name}' of {', '.join(tables)}")
+    if regressions:
+        sys.exit(1)
+    print("Every hot query uses an index and recent queries are pruned")
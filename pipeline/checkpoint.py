@@ -0,0 +1,97 @@
+'''This module records how far each author has got through a pipeline run in the
+run_state table, so a run that dies part-way can be resumed by skipping the
+authors that were already loaded and re-running the rest.'''
+import os
+from datetime import datetime
+import pandas as pd
+import psycopg2
+
+RESUME_WINDOW_HOURS = float(os.environ.get('RESUME_WINDOW_HOURS', '12'))
+EXTRACTED = 'extracted'
+TRANSFORMED = 'transformed'
+LOADED = 'loaded'
+RUN_ID_FORMAT = "%Y-%m-%dT%H%M%S"
+
+
+def create_run_id() -> str:
+    """Returns the id for a new run, made from the time it started"""
+    return datetime.now().strftime(RUN_ID_FORMAT)
+
+
+def start_run(conn: psycopg2.connect, run_id: str) -> None:
+    """Records a run as started, if it hasn't been already"""
+    query = '''
+    INSERT INTO pipeline_run (run_id)
+    VALUES (%s)
+    ON CONFLICT (run_id) DO NOTHING'''
+    with conn.cursor() as cursor:
+        cursor.execute(query, (run_id,))
+    conn.commit()
+
+
+def finish_run(conn: psycopg2.connect, run_id: str) -> None:
+    """Records a run as having finished every author"""
+    query = '''
+    UPDATE pipeline_run
+    SET finished_at = CURRENT_TIMESTAMP
+    WHERE run_id = %s'''
+    with conn.cursor() as cursor:
+        cursor.execute(query, (run_id,))
+    conn.commit()
+
+
+def get_interrupted_run_id(conn: psycopg2.connect, window_hours: float = None) -> str:
+    """Returns the id of the most recent run that started within the last window_hours
+    and never finished, or None. The window is by the hour rather than the day, so
+    a run interrupted just before midnight is still resumed after it, but it should
+    stay shorter than the time between scheduled runs"""
+    window_hours = RESUME_WINDOW_HOURS if window_hours is None else window_hours
+    query = '''
+    SELECT run_id FROM pipeline_run
+    WHERE finished_at IS NULL
+    AND started_at >= CURRENT_TIMESTAMP - %s * INTERVAL '1 hour'
+    ORDER BY started_at DESC
+    LIMIT 1'''
+    runs_df = pd.read_sql(query, conn, params=(window_hours,))
+    if runs_df.empty:
+        return None
+    return runs_df['run_id'][0]
+
+
+class RunCheckpoint:
+    """Tracks the stage each author has reached in a single run"""
+
+    def __init__(self, conn: psycopg2.connect, run_id: str):
+        self.conn = conn
+        self.run_id = run_id
+        authors_df = pd.read_sql('SELECT author_id, author_url FROM author', conn)
+        self.author_ids = dict(zip(authors_df['author_url'], authors_df['author_id']))
+
+    def get_loaded_author_urls(self) -> set[str]:
+        """Returns the urls of the authors already loaded in this run"""
+        query = '''
+        SELECT a.author_url FROM run_state AS rs
+        JOIN author AS a ON a.author_id = rs.author_id
+        WHERE rs.run_id = %s AND rs.stage = %s'''
+        loaded_df = pd.read_sql(query, self.conn, params=(self.run_id, LOADED))
+        return set(loaded_df['author_url'])
+
+    def get_authors_to_run(self, author_urls: list[str]) -> list[str]:
+        """Returns the authors that still need to be run, in their original order"""
+        loaded_author_urls = self.get_loaded_author_urls()
+        return [author_url for author_url in author_urls
+                if author_url not in loaded_author_urls]
+
+    def mark(self, author_url: str, stage: str) -> None:
+        """Records the stage an author has reached in this run"""
+        author_id = self.author_ids.get(author_url)
+        if author_id is None:
+            return
+        query = '''
+        INSERT INTO run_state (run_id, author_id, stage)
+        VALUES (%s, %s, %s)
+        ON CONFLICT (run_id, author_id)
+        DO UPDATE SET stage = EXCLUDED.stage, updated_at = CURRENT_TIMESTAMP'''
+        with self.conn.cursor() as cursor:
+            cursor.execute(query, (self.run_id, int(author_id), stage))
+        self.conn.commit()
@@ -0,0 +1,118 @@
+'''This module crawls many goodreads.com authors at once using asyncio, so that
+the run time of the pipeline is no longer the sum of every author's latency.'''
+import os
+import asyncio
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable
+from bs4 import BeautifulSoup
+import extract
+from extract import ScrapingError
+
+CRAWL_CONCURRENCY = int(os.environ.get('CRAWL_CONCURRENCY', '16'))
+CRAWL_AUTHORS_IN_FLIGHT = int(os.environ.get('CRAWL_AUTHORS_IN_FLIGHT', '8'))
+NOT_ADMITTED = object()
+
+
+async def fetch_soup(url: str, fetch_limit: asyncio.Semaphore) -> BeautifulSoup:
+    '''Fetches and parses a page on a worker thread once the global
+    concurrency limit has a free slot.'''
+    async with fetch_limit:
+        return await asyncio.to_thread(extract.get_soup, url)
+
+
+async def crawl_book(book_container_soup: BeautifulSoup,
+                     fetch_limit: asyncio.Semaphore) -> dict:
+    '''Fetches a single book page, returning None if it can't be scraped.'''
+    try:
+        async with fetch_limit:
+            return await asyncio.to_thread(extract.get_individual_book_data,
+                                           book_container_soup)
+    except ScrapingError as error:
+        print(f"Skipping book: {error}")
+        return None
+
+
+async def crawl_author(author_url: str, fetch_limit: asyncio.Semaphore) -> dict:
+    '''Crawls an author's page, book list and all of their book pages,
+    with the book pages fetched at the same time.'''
+    author_page = extract.parse_author_page(await fetch_soup(author_url, fetch_limit))
+    books_soup = await fetch_soup(author_page['books_url'], fetch_limit)
+
+    books = await asyncio.gather(*[crawl_book(book, fetch_limit)
+                                   for book in books_soup.find_all("tr")])
+    books_data = extract.format_books_measurement_data(
+        author_page, extract.get_shelved_books_count(books_soup), [book for book in books if book])
+    return extract.format_author_data(author_url, author_page, books_data)
+
+
+async def author_worker(author_queue: asyncio.Queue, finished: asyncio.Queue,
+                        fetch_limit: asyncio.Semaphore, log: logging.Logger,
+                        admit: Callable[[str], bool] = None) -> None:
+    '''Takes authors off the queue one at a time and puts each
+    crawled author on the finished queue, skipping any author
+    that admit turns away.'''
+    while True:
+        author_url = await author_queue.get()
+        if admit is not None and not admit(author_url):
+            await finished.put((author_url, NOT_ADMITTED))
+            author_queue.task_done()
+            continue
+        try:
+            await finished.put((author_url, await crawl_author(author_url, fetch_limit)))
+        except Exception as error:
+            log.error("Unable to scrape data for %s: %s", author_url, error)
+            await finished.put((author_url, None))
+        finally:
+            author_queue.task_done()
+
+
+async def crawl_authors(author_urls: list[str], on_author: Callable[[dict], None],
+                        log: logging.Logger, concurrency: int = None,
+                        authors_in_flight: int = None,
+                        on_failure: Callable[[str], None] = None,
+                        admit: Callable[[str], bool] = None) -> dict:
+    '''Crawls every author with at most `concurrency` page fetches running at once,
+    passing each finished author to on_author as soon as it is ready, and the url
+    of each author that couldn't be crawled to on_failure. An author is only
+    started if admit, when given, returns True for their url.
+    on_author is run on one thread at a time, so it can safely share a connection.'''
+    concurrency = concurrency or CRAWL_CONCURRENCY
+    authors_in_flight = authors_in_flight or CRAWL_AUTHORS_IN_FLIGHT
+    asyncio.get_running_loop().set_default_executor(
+        ThreadPoolExecutor(max_workers=concurrency))
+
+    fetch_limit = asyncio.Semaphore(concurrency)
+    author_queue = asyncio.Queue()
+    finished = asyncio.Queue()
+    for author_url in author_urls:
+        author_queue.put_nowait(author_url)
+
+    workers = [asyncio.create_task(author_worker(author_queue, finished, fetch_limit, log, admit))
+               for _ in range(min(authors_in_flight, len(author_urls)))]
+
+    stats = {'authors_crawled': 0, 'authors_failed': 0}
+    for _ in author_urls:
+        author_url, author = await finished.get()
+        if author is NOT_ADMITTED:
+            continue
+        if author is None:
+            stats['authors_failed'] += 1
+            if on_failure is not None:
+                on_failure(author_url)
+            continue
+        await asyncio.to_thread(on_author, author)
+        stats['authors_crawled'] += 1
+
+    for worker in workers:
+        worker.cancel()
+    return stats
+
+
+def run_crawl(author_urls: list[str], on_author: Callable[[dict], None],
+              log: logging.Logger, concurrency: int = None,
+              on_failure: Callable[[str], None] = None,
+              admit: Callable[[str], bool] = None) -> dict:
+    '''Runs the asyncio crawl over all authors and returns the crawl stats.'''
+    return asyncio.run(crawl_authors(author_urls, on_author, log, concurrency,
+                                     on_failure=on_failure, admit=admit))
@@ -0,0 +1,155 @@
+'''This module schedules authors against the time left in a run, so a long author
+list stops before the Lambda times out instead of part-way through an author.
+Authors that weren't started are handed back in a continuation token, which a
+follow-up invocation can be started with to pick up where the run stopped.
+The seconds each author took are kept on the run's row in pipeline_run, so the
+estimate carries over between invocations that share no disk.'''
+import os
+import json
+import time
+import threading
+from statistics import median
+import pandas as pd
+import psycopg2
+
+RUN_DEADLINE_SECONDS = os.environ.get('RUN_DEADLINE_SECONDS')
+DEADLINE_MARGIN_SECONDS = float(os.environ.get('DEADLINE_MARGIN_SECONDS', '30'))
+DEFAULT_AUTHOR_COST_SECONDS = float(os.environ.get('AUTHOR_COST_SECONDS', '20'))
+COST_HISTORY_PATH = os.environ.get('COST_HISTORY_PATH')
+COST_HISTORY_SIZE = 50
+COST_SMOOTHING = 0.3
+
+
+def get_remaining_seconds(context=None) -> float:
+    '''Returns the seconds left in the Lambda invocation, or RUN_DEADLINE_SECONDS
+    when run locally, or None if the run has no deadline.'''
+    if context is not None and hasattr(context, 'get_remaining_time_in_millis'):
+        return context.get_remaining_time_in_millis() / 1000
+    if RUN_DEADLINE_SECONDS:
+        return float(RUN_DEADLINE_SECONDS)
+    return None
+
+
+def load_cost_history(history_path: str) -> list[float]:
+    '''Returns the seconds taken per author in recent runs.'''
+    if not history_path or not os.path.exists(history_path):
+        return []
+    try:
+        with open(history_path, 'r', encoding='utf-8') as history_file:
+            return [float(duration) for duration in json.load(history_file)]
+    except (OSError, ValueError, TypeError):
+        return []
+
+
+def load_run_cost_history(conn: psycopg2.connect,
+                          size: int = COST_HISTORY_SIZE) -> list[float]:
+    '''Returns the seconds taken per author in the latest runs in pipeline_run,
+    oldest first, up to size of them.'''
+    query = '''
+    SELECT seconds FROM (
+        SELECT pr.started_at, author.position, author.seconds
+        FROM pipeline_run AS pr
+        CROSS JOIN unnest(pr.author_seconds) WITH ORDINALITY AS author (seconds, position)
+        ORDER BY pr.started_at DESC, author.position DESC
+        LIMIT %s) AS recent
+    ORDER BY started_at, position'''
+    history_df = pd.read_sql(query, conn, params=(size,))
+    return [float(seconds) for seconds in history_df['seconds']]
+
+
+def save_run_costs(conn: psycopg2.connect, run_id: str, durations: list[float]) -> None:
+    '''Adds the seconds each author took to the run's row, after those of
+    earlier invocations of the same run.'''
+    if not durations:
+        return
+    query = '''
+    UPDATE pipeline_run
+    SET author_seconds = COALESCE(author_seconds, CAST(ARRAY[] AS FLOAT[]))
+        || CAST(%s AS FLOAT[])
+    WHERE run_id = %s'''
+    with conn.cursor() as cursor:
+        cursor.execute(query, ([round(duration, 3) for duration in durations], run_id))
+    conn.commit()
+
+
+class DeadlineScheduler:
+    '''Admits an author only while there is time left to finish them, estimating
+    the time per author from recent runs and updating it as authors finish.'''
+
+    def __init__(self, remaining_seconds: float = None,
+                 margin_seconds: float = DEADLINE_MARGIN_SECONDS,
+                 author_cost: float = None, history_path: str = COST_HISTORY_PATH,
+                 history: list[float] = None):
+        self.deadline = (None if remaining_seconds is None
+                         else time.monotonic() + remaining_seconds)
+        self.margin_seconds = margin_seconds
+        self.history_path = history_path
+        self.history = history if history is not None else load_cost_history(history_path)
+        self.author_cost = (author_cost
+                            or (median(self.history) if self.history else None)
+                            or DEFAULT_AUTHOR_COST_SECONDS)
+        self.started_at = {}
+        self.durations = []
+        self.not_admitted = []
+        self._lock = threading.Lock()
+
+    def get_time_left(self) -> float:
+        '''Returns the seconds left before the deadline, or None without one.'''
+        if self.deadline is None:
+            return None
+        return self.deadline - time.monotonic()
+
+    def admit(self, author_url: str) -> bool:
+        '''Starts an author if they are expected to finish before the deadline,
+        otherwise keeps them for the continuation token.'''
+        with self._lock:
+            time_left = self.get_time_left()
+            if time_left is not None and time_left - self.margin_seconds < self.author_cost:
+                self.not_admitted.append(author_url)
+                return False
+            self.started_at[author_url] = time.monotonic()
+            return True
+
+    def finish(self, author_url: str) -> None:
+        '''Records how long an admitted author took.'''
+        with self._lock:
+            started_at = self.started_at.pop(author_url, None)
+            if started_at is None:
+                return
+            duration = time.monotonic() - started_at
+            self.durations.append(duration)
+            self.author_cost += COST_SMOOTHING * (duration - self.author_cost)
+
+    def get_continuation(self) -> dict:
+        '''Returns the token for a follow-up invocation,
+        or None if every author was started.'''
+        with self._lock:
+            if not self.not_admitted:
+                return None
+            return {'author_urls': list(self.not_admitted),
+                    'author_cost_seconds': round(self.author_cost, 2)}
+
+    def save_history(self) -> None:
+        '''Adds this run's author times to the recent history in the history file.'''
+        if not self.history_path or not self.durations:
+            return
+        history = (self.history + self.durations)[-COST_HISTORY_SIZE:]
+        with open(self.history_path, 'w', encoding='utf-8') as history_file:
+            json.dump([round(duration, 3) for duration in history], history_file)
+
+    def get_stats(self) -> dict:
+        '''Returns the authors finished and left over, and the current estimate.'''
+        with self._lock:
+            return {'authors_finished': len(self.durations),
+                    'authors_not_admitted': len(self.not_admitted),
+                    'author_cost_seconds': round(self.author_cost, 2)}
+
+
+def create_scheduler(context=None, continuation: dict = None,
+                     history: list[float] = None) -> DeadlineScheduler:
+    '''Returns the scheduler for an invocation, carrying on the per-author
+    estimate from the continuation token if there is one, otherwise
+    starting from the given history of recent runs.'''
+    author_cost = continuation.get('author_cost_seconds') if continuation else None
+    return DeadlineScheduler(get_remaining_seconds(context), author_cost=author_cost,
+                             history=history)
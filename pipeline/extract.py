@@ -1,134 +1,240 @@
-'''This module explores extracting information from goodreads.com author pages.'''
+'''This module explores extracting information from goodreads.com author pages.
+Every field is read with the page specs in field_spec.py, the same ones the lxml
+engine in fast_extract.py uses.'''
+import os
 import time
-import urllib.request
-from urllib.error import URLError
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Iterator
+import requests
 from bs4 import BeautifulSoup
+from http_session import get_page
+from page_cache import load_page_cache
+from snapshot_store import load_snapshot_store
+from rate_limit import load_rate_limiter
+from resilience import load_resilient_fetcher
+from run_memo import load_run_memo
+from field_spec import (ScrapingError, BOOKS_LIST_LIMIT_URL_PARAMETERS, AUTHOR_PAGE_SPEC,
+                        BOOK_LIST_PAGE_SPEC, BOOK_LIST_ROW_SPEC, BOOK_PAGE_SPEC, read_soup_field)
+
+BOOK_FETCH_WORKERS = int(os.environ.get('BOOK_FETCH_WORKERS', '1'))
+PAGE_CACHE = load_page_cache()
+SNAPSHOT_STORE = load_snapshot_store()
+RATE_LIMITER = load_rate_limiter()
+RESILIENT_FETCHER = load_resilient_fetcher()
+RUN_MEMO = load_run_memo()
+KNOWN_BOOKS = None
+BOOK_LIST_PAGINATED = os.environ.get('BOOK_LIST_PAGINATED', 'false').lower() == 'true'
+BOOK_LIST_PER_PAGE = int(os.environ.get('BOOK_LIST_PER_PAGE', '30'))
+BOOK_LIST_MAX_BOOKS = int(os.environ.get('BOOK_LIST_MAX_BOOKS', '300'))
+BOOK_PAGE_STREAMING = os.environ.get('BOOK_PAGE_STREAMING', 'false').lower() == 'true'
+
+
+def request_page(url: str, headers: dict = None, stream: bool = False) -> requests.Response:
+    '''Sends a GET request for the url through the shared session, retried with
+    backoff if retries are on, waiting for the rate limiter first if it is on.'''
+    def send() -> requests.Response:
+        if RATE_LIMITER is None:
+            return get_page(url, headers=headers, stream=stream)
+        return RATE_LIMITER.fetch(url, lambda: get_page(url, headers=headers, stream=stream))
+
+    if RESILIENT_FETCHER is None:
+        return send()
+    return RESILIENT_FETCHER.fetch(url, send)
+
+
+def download_html(url: str) -> str:
+    '''Returns the html for a given goodreads.com url, fetched
+    through the shared keep-alive session and the page cache if it is on.'''
+    try:
+        if PAGE_CACHE is not None:
+            return PAGE_CACHE.get_html(url, request_page)
+        response = request_page(url)
+        response.raise_for_status()
+        return response.content.decode('utf-8')
+    except requests.RequestException as error:
+        print(error)
+        raise ScrapingError(f"Unable to scrape {url}.")
+
 
-GOODREADS_BASE_URL = 'https://www.goodreads.com'
-BOOKS_LIST_LIMIT_URL_PARAMETERS = '?page=1&per_page=10'
+def fetch_html(url: str) -> str:
+    '''Returns the html for a given goodreads.com url. When snapshots are on, every
+    downloaded page is stored, and a replayed run is read back without the network.'''
+    if SNAPSHOT_STORE is None:
+        return download_html(url)
 
+    if SNAPSHOT_STORE.replaying:
+        try:
+            return SNAPSHOT_STORE.replay(url)
+        except (KeyError, OSError):
+            raise ScrapingError(f"No snapshot of {url} in the replayed run.")
 
-class ScrapingError(Exception):
-    pass
+    html = download_html(url)
+    SNAPSHOT_STORE.save(url, html)
+    return html
 
 
 def get_soup(url: str) -> BeautifulSoup:
     '''Returns a beautifulsoup HTML parser for a given goodreads.com url.'''
-    try:
-        with urllib.request.urlopen(url, timeout=5) as page:
-            html = page.read().decode('utf-8')
-            return BeautifulSoup(html, "lxml")
-    except URLError as error:
-        print(error.args[0])
-        raise ScrapingError(f"Unable to scrape {url}.")
+    return BeautifulSoup(fetch_html(url), "lxml")
 
 
 def get_authors_books_url(author_soup: BeautifulSoup) -> str:
     '''Gets the link to the author's books list from their goodreads profile'''
-    books_url = author_soup.find("a", href=lambda x: x and '/author/list' in x)
-    return GOODREADS_BASE_URL + books_url.get('href') + BOOKS_LIST_LIMIT_URL_PARAMETERS
+    return read_soup_field(AUTHOR_PAGE_SPEC, 'books_url', author_soup)
+
+
+def get_authors_books_list_url(author_page: dict) -> str:
+    '''Gets the link to the author's books list without any page parameters
+    from their parsed author page'''
+    return author_page['books_url'].removesuffix(BOOKS_LIST_LIMIT_URL_PARAMETERS)
+
+
+def get_book_list_page_url(books_list_url: str, page: int) -> str:
+    '''Gets the link to a single page of an author's books list'''
+    return f'{books_list_url}?page={page}&per_page={BOOK_LIST_PER_PAGE}'
 
 
 def get_author_name(author_soup: BeautifulSoup) -> dict:
     '''gets author name from the soup for the author goodreads page'''
-    author_name = author_soup.find("h1", class_="authorName").text
-    return author_name.strip()
+    return read_soup_field(AUTHOR_PAGE_SPEC, 'author_name', author_soup)
 
 
 def get_author_follower_count(author_soup: BeautifulSoup) -> str:
     '''Gets the authors follower count from their goodreads author page soup '''
-    follower_count = author_soup.find(
-        "div", class_="h2Container gradientHeaderContainer")
-    follower_count = follower_count.find("h2", class_="brownBackground").text
-
-    start_index = follower_count.rfind('(')+1
-    end_index = len(follower_count)-1
-    return follower_count[start_index:end_index]
+    return read_soup_field(AUTHOR_PAGE_SPEC, 'goodreads_followers', author_soup)
 
 
 def get_author_aggregate_data(author_soup: BeautifulSoup) -> dict:
     '''Uses the soup from the author page to get aggregate 
     values about the author such as average ratings for all books.'''
-    aggregate_contents = author_soup.find("div", class_="hreview-aggregate")
-    average_rating = aggregate_contents.find("span", class_="average").text
-    rating_count = aggregate_contents.find("span", class_="votes").text.strip()
-    review_count = aggregate_contents.find("span", class_="count").text.strip()
-    followers = get_author_follower_count(author_soup)
-    return {
-        'average_rating': average_rating,
-        'rating_count': rating_count,
-        'review_count': review_count,
-        'goodreads_followers': followers
-    }
+    return AUTHOR_PAGE_SPEC.select('average_rating', 'rating_count', 'review_count',
+                                   'goodreads_followers').parse_soup(author_soup)
 
 
 def get_book_small_image_url(book_container_soup: BeautifulSoup) -> str:
     '''Gets the url from the soup of an individual 
     book container from the author's book list '''
-    return book_container_soup.find('img', class_='bookCover').get('src')
+    return read_soup_field(BOOK_LIST_ROW_SPEC, 'small_image_url', book_container_soup)
 
 
 def get_book_title(book_container_soup: BeautifulSoup) -> str:
     '''Gets the book title from the soup of an individual 
     book container from the author's book list '''
-    return book_container_soup.find('span', itemprop="name").text
-
-
-def slice_book_average_rating(aggregate_text: str) -> str:
-    '''Gets a book's average rating from the aggregate data's grey 
-    text from a single book html container in author's books list pages '''
-    slice_index = aggregate_text.find('avg')
-    return aggregate_text[:slice_index-1]
-
-
-def slice_book_rating_count(aggregate_text: str) -> str:
-    '''Gets a book's rating count from the aggregate data's grey 
-    text from a single book html container in author's books list pages '''
-    start_slice_index = aggregate_text.find('—')+2
-    end_slice_index = aggregate_text.rfind('r')-1
-    return aggregate_text[start_slice_index:end_slice_index]
+    return read_soup_field(BOOK_LIST_ROW_SPEC, 'book_title', book_container_soup)
 
 
 def get_book_aggregate_data(book_container_soup: BeautifulSoup) -> dict:
     '''Given a book card's html in the goodreads author's book list,
       scrape all aggregate data for the given book'''
-    average_book_rating_and_rating_count = book_container_soup.find(
-        'span', class_='minirating').text
-    return {
-        'average_rating': slice_book_average_rating(average_book_rating_and_rating_count),
-        'rating_count': slice_book_rating_count(average_book_rating_and_rating_count)
-    }
+    return BOOK_LIST_ROW_SPEC.select('average_rating', 'rating_count').parse_soup(
+        book_container_soup)
 
 
 def get_year_published(book_container_soup: BeautifulSoup) -> dict:
     '''gets year published from a html container 
     for a book from the book list html'''
-    year_published = book_container_soup.find(
-        'span', class_='greyText smallText uitext').text
-    return year_published.split()[-4]  # magic number?
+    return read_soup_field(BOOK_LIST_ROW_SPEC, 'year_published', book_container_soup)
 
 
 def get_individual_book_data(book_container_soup: BeautifulSoup) -> dict:
     '''Gets information about an individual book from its container in the authors
     book list page and the book's individual page.'''
-    book_url = get_book_url(book_container_soup)
-    book_page_soup = get_soup(book_url)
-    book_data = {
-        'book_title': get_book_title(book_container_soup),
-        'book_url_path': book_url,
-        'big_image_url': get_book_big_image_url(book_page_soup),
-        'small_image_url': get_book_small_image_url(book_container_soup),
-        'review_count': get_book_review_count(book_page_soup),
-        'year_published': get_year_published(book_container_soup)
+    book_list_row = get_book_list_row(book_container_soup)
+    book_url = book_list_row['book_url_path']
+    if KNOWN_BOOKS is not None:
+        known_book_page_data = KNOWN_BOOKS.get_book_page_data(
+            book_url, book_list_row['rating_count'])
+        if known_book_page_data is not None:
+            return combine_book_row(book_list_row, known_book_page_data)
+    if RUN_MEMO is not None:
+        book_page_data = RUN_MEMO.get('book_page', book_url,
+                                      lambda: fetch_book_page_data(book_url))
+        return combine_book_row(book_list_row, book_page_data)
+    return combine_book_row(book_list_row, fetch_book_page_data(book_url))
+
+
+def fetch_book_page_data(book_url: str) -> dict:
+    '''Fetches a book's page and reads its big image url and review count,
+    streaming the page when that is turned on.'''
+    if can_stream_book_pages():
+        from fast_extract import stream_book_page  # pylint: disable=import-outside-toplevel
+        return stream_book_page(book_url)
+    return get_book_page_data(get_soup(book_url))
+
+
+def can_stream_book_pages() -> bool:
+    '''Book pages are only streamed when turned on and when the full html isn't
+    needed for the page cache or a snapshot.'''
+    return BOOK_PAGE_STREAMING and PAGE_CACHE is None and SNAPSHOT_STORE is None
+
+
+def format_book_data(book_container_soup: BeautifulSoup,
+                     book_page_soup: BeautifulSoup) -> dict:
+    '''Combines a book's container in the author's book list page
+    with its already fetched book page into a single book dictionary.'''
+    return combine_book_data(book_container_soup, get_book_page_data(book_page_soup))
+
+
+def combine_book_data(book_container_soup: BeautifulSoup, book_page_data: dict) -> dict:
+    '''Combines a book's container in the author's book list page with the
+    big image url and review count read from its book page.'''
+    return combine_book_row(get_book_list_row(book_container_soup), book_page_data)
+
+
+def get_book_list_row(book_container_soup: BeautifulSoup) -> dict:
+    '''Reads every field of a book's container in the author's book list page at once.'''
+    return BOOK_LIST_ROW_SPEC.parse_soup(book_container_soup)
+
+
+def combine_book_row(book_list_row: dict, book_page_data: dict) -> dict:
+    '''Combines a book's parsed row in the book list with the
+    big image url and review count read from its book page.'''
+    return {
+        'book_title': book_list_row['book_title'],
+        'book_url_path': book_list_row['book_url_path'],
+        'big_image_url': book_page_data['big_image_url'],
+        'small_image_url': book_list_row['small_image_url'],
+        'review_count': book_page_data['review_count'],
+        'year_published': book_list_row['year_published'],
+        'average_rating': book_list_row['average_rating'],
+        'rating_count': book_list_row['rating_count'],
+        'book_page_fetched': book_page_data.get('book_page_fetched', True)
     }
-    aggregate_data: dict = get_book_aggregate_data(book_container_soup)
-    book_data.update(aggregate_data)
-    return book_data
 
 
-def get_authors_books(books_list_soup: BeautifulSoup) -> list[dict]:
-    '''gets a list of all books in a author's goodreads book list'''
-    scraped_books = books_list_soup.find_all("tr")
+def get_authors_books_concurrently(scraped_books: list, max_workers: int,
+                                   scrape_book: Callable[..., dict] = None) -> list[dict]:
+    '''Fetches the individual book pages for the given book list containers
+    on a bounded thread pool. Books are returned in list order, and a book
+    whose page can't be scraped is skipped rather than failing the author.'''
+    scrape_book = scrape_book or get_individual_book_data
+    formatted_books = []
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = [executor.submit(scrape_book, book)
+                   for book in scraped_books]
+        for future in futures:
+            try:
+                formatted_books.append(future.result())
+                print("Book scraped")
+            except ScrapingError as error:
+                print(f"Skipping book: {error}")
+    return formatted_books
+
+
+def get_authors_books(books_list_soup: BeautifulSoup,
+                      max_workers: int = None) -> list[dict]:
+    '''gets a list of all books in a author's goodreads book list.
+    Book pages are fetched concurrently when max_workers is more than 1.'''
+    return scrape_books(books_list_soup.find_all("tr"), max_workers)
+
+
+def scrape_books(scraped_books: list, max_workers: int = None) -> list[dict]:
+    '''Fetches the individual book pages for the given book list containers.'''
+    if max_workers is None:
+        max_workers = BOOK_FETCH_WORKERS
+    if max_workers > 1:
+        return get_authors_books_concurrently(scraped_books, max_workers)
+
     formatted_books = []
     for book in scraped_books:
         formatted_books.append(get_individual_book_data(book))
@@ -136,44 +242,110 @@ def get_authors_books(books_list_soup: BeautifulSoup) -> list[dict]:
     return formatted_books
 
 
+def iter_book_list_pages(books_list_url: str, first_page_soup: BeautifulSoup,
+                         max_books: int = None) -> Iterator[list]:
+    '''Yields the new book containers on each page of an author's books list,
+    only fetching the next page once the previous one has been used. Stops at
+    the first page with no books that haven't been seen already, or once
+    max_books books have been yielded.'''
+    if max_books is None:
+        max_books = BOOK_LIST_MAX_BOOKS
+    seen_book_urls = set()
+    page, page_soup = 1, first_page_soup
+    while True:
+        new_books = []
+        for book_container in page_soup.find_all("tr"):
+            book_url = get_book_url(book_container)
+            if book_url not in seen_book_urls and len(seen_book_urls) < max_books:
+                seen_book_urls.add(book_url)
+                new_books.append(book_container)
+        if not new_books:
+            return
+        yield new_books
+        if len(seen_book_urls) >= max_books:
+            return
+
+        page += 1
+        try:
+            page_soup = get_soup(get_book_list_page_url(books_list_url, page))
+        except ScrapingError as error:
+            print(f"Stopping book list at page {page}: {error}")
+            return
+
+
+def iter_authors_books(books_list_url: str, first_page_soup: BeautifulSoup,
+                       max_books: int = None, max_workers: int = None) -> Iterator[dict]:
+    '''Yields every book in an author's paginated books list,
+    scraping each page's books as soon as the page has been fetched.'''
+    for book_containers in iter_book_list_pages(books_list_url, first_page_soup, max_books):
+        yield from scrape_books(book_containers, max_workers)
+
+
 def get_shelved_books_count(books_list_soup: BeautifulSoup) -> str:
     '''Returns the shelved count for all of an author's books.'''
-    shelved_count = books_list_soup.find('div', class_='leftContainer')
-    shelved_count = shelved_count.find_next('div').text
-    return shelved_count.split()[-2]
+    return read_soup_field(BOOK_LIST_PAGE_SPEC, 'shelved_count', books_list_soup)
 
 
 def get_author_image(author_soup: BeautifulSoup) -> dict:
     '''Gets the author image from the author's goodread page.'''
-    return author_soup.find('img', itemprop="image").get('src')
+    return read_soup_field(AUTHOR_PAGE_SPEC, 'author_image_url', author_soup)
 
 
-def get_authors_books_measurement_data(author_soup: BeautifulSoup) -> dict:
+def get_authors_books_measurement_data(author_soup: BeautifulSoup,
+                                       paginated: bool = None) -> dict:
     '''Gets data from the author's book list page, including book information,
-    shelved books count and the author's image.'''
-    books_url = get_authors_books_url(author_soup)
-    books_soup = get_soup(books_url)
+    shelved books count and the author's image. In paginated mode 'books' is a
+    generator that walks every page of the author's books list as it is used.'''
+    return get_books_measurement_data(parse_author_page(author_soup), paginated)
+
+
+def get_books_measurement_data(author_page: dict, paginated: bool = None) -> dict:
+    '''Gets the book measurement data of an author from their parsed author page.'''
+    if paginated is None:
+        paginated = BOOK_LIST_PAGINATED
+    if not paginated:
+        books_soup = get_soup(author_page['books_url'])
+        return format_books_measurement_data(
+            author_page, get_shelved_books_count(books_soup), get_authors_books(books_soup))
 
-    books_data = {'shelved_count': get_shelved_books_count(books_soup),
-                  'author_image_url': get_author_image(author_soup),
-                  'books': get_authors_books(books_soup)}
-    return books_data
+    books_list_url = get_authors_books_list_url(author_page)
+    books_soup = get_soup(get_book_list_page_url(books_list_url, 1))
+    return format_books_measurement_data(
+        author_page, get_shelved_books_count(books_soup),
+        iter_authors_books(books_list_url, books_soup))
+
+
+def format_books_measurement_data(author_page: dict, shelved_count: str,
+                                  books: list[dict] | Iterator[dict]) -> dict:
+    '''Combines the author's parsed author page, the shelved count from their
+    book list page and their scraped books into the book measurement data.'''
+    return {'shelved_count': shelved_count,
+            'author_image_url': author_page['author_image_url'],
+            'books': books}
+
+
+def parse_author_page(author_soup: BeautifulSoup) -> dict:
+    '''Reads every field of an author's goodreads page at once.'''
+    return AUTHOR_PAGE_SPEC.parse_soup(author_soup)
 
 
 def get_author_data(author_url: str) -> dict:
     '''Scrapes average_rating, rating_count and review_count
       for a given goodreads.com author url.'''
-    author_soup: BeautifulSoup = get_soup(author_url)
+    author_page = parse_author_page(get_soup(author_url))
+    books_data: dict = get_books_measurement_data(author_page)
+    return format_author_data(author_url, author_page, books_data)
 
-    author_name = get_author_name(author_soup)
 
-    aggregate_data: dict = get_author_aggregate_data(author_soup)
-    books_data: dict = get_authors_books_measurement_data(author_soup)
+def format_author_data(author_url: str, author_page: dict, books_data: dict) -> dict:
+    '''Combines the parsed author page with the author's book measurement
+    data into the dictionary passed on to transform.py'''
     author_data = {
-        'author_name': author_name,
+        'author_name': author_page['author_name'],
         'author_url': author_url
     }
-    author_data.update(aggregate_data)
+    author_data.update({field: author_page[field] for field in
+                        ('average_rating', 'rating_count', 'review_count', 'goodreads_followers')})
     author_data.update(books_data)
     return author_data
 
@@ -181,24 +353,22 @@ def get_author_data(author_url: str) -> dict:
 def get_book_url(book_list_container_soup: BeautifulSoup) -> str:
     '''Gets book url from the soup of an html container for a book
     in a book list page'''
-    book_url_path = book_list_container_soup.find('a', itemprop='url')
-    book_url_path = book_url_path.get('href')
-    return GOODREADS_BASE_URL + book_url_path
+    return read_soup_field(BOOK_LIST_ROW_SPEC, 'book_url_path', book_list_container_soup)
 
 
 def get_book_big_image_url(book_soup: BeautifulSoup) -> str:
     '''gets a big image from the html of a given book page'''
-    image_url = book_soup.find('div', class_='BookCover__image')
-    return image_url.find('img').get('src')
+    return read_soup_field(BOOK_PAGE_SPEC, 'big_image_url', book_soup)
 
 
 def get_book_review_count(book_soup: BeautifulSoup) -> str:
     '''gets the review count of a book in the html of a given book page'''
-    review_count = book_soup.find(
-        'div', class_='RatingStatistics__meta').get('aria-label')
-    slice_index_start = review_count.rfind('d')+2
-    slice_index_end = review_count.rfind('reviews')-1
-    return review_count[slice_index_start:slice_index_end]
+    return read_soup_field(BOOK_PAGE_SPEC, 'review_count', book_soup)
+
+
+def get_book_page_data(book_soup: BeautifulSoup) -> dict:
+    '''gets the big image url and review count from the html of a given book page'''
+    return BOOK_PAGE_SPEC.parse_soup(book_soup)
 
 
 if __name__ == '__main__':
@@ -0,0 +1,161 @@
+'''This module is a faster alternative to the BeautifulSoup functions in extract.py.
+Pages are parsed straight into lxml trees and read in a single pass with the
+same field specs in field_spec.py that extract.py reads BeautifulSoup trees with,
+and book pages are only parsed as far as the two fields that are needed.'''
+import codecs
+import threading
+from typing import Iterable
+import requests
+from bs4 import BeautifulSoup
+from lxml import etree
+import extract
+from extract import ScrapingError
+from field_spec import AUTHOR_PAGE_SPEC, BOOK_LIST_PAGE_SPEC, BOOK_PAGE_SPEC
+
+BOOK_PAGE_CHUNK_SIZE = 16 * 1024
+HTML_PARSER = etree.HTMLParser()
+
+_STREAM_STATS = {'pages_streamed': 0, 'stopped_early': 0, 'full_parses': 0,
+                 'bytes_read': 0}
+_STREAM_STATS_LOCK = threading.Lock()
+
+
+def parse_html(html: str) -> etree.Element:
+    '''Parses a page's html into an lxml tree.'''
+    return etree.fromstring(html, HTML_PARSER)
+
+
+def parse_author_page(html: str) -> dict:
+    '''Returns the author fields from the html of an author's goodreads page,
+    including the url of their book list.'''
+    return AUTHOR_PAGE_SPEC.parse_tree(parse_html(html))
+
+
+def parse_book_list_page(html: str) -> dict:
+    '''Returns the shelved count and every book container
+    from the html of an author's book list page.'''
+    return BOOK_LIST_PAGE_SPEC.parse_tree(parse_html(html))
+
+
+def parse_book_page_chunks(chunks: Iterable) -> dict:
+    '''Parses a book page chunk by chunk, stopping as soon as the cover
+    image and review count have been found, so the rest of the page is
+    never parsed. Chunks can be str or bytes.'''
+    parser = etree.HTMLPullParser(events=('start', 'end'))
+
+    def events():
+        for chunk in chunks:
+            parser.feed(chunk)
+            yield from parser.read_events()
+
+    return BOOK_PAGE_SPEC.parse(events())
+
+
+def parse_book_page(html: str) -> dict:
+    '''Returns the big cover image and review count from a book page's html.'''
+    return parse_book_page_chunks(
+        html[start:start + BOOK_PAGE_CHUNK_SIZE]
+        for start in range(0, len(html), BOOK_PAGE_CHUNK_SIZE))
+
+
+def count_streamed_page(stopped_early: bool, full_parse: bool, bytes_read: int) -> None:
+    '''Adds a streamed book page to the stream statistics.'''
+    with _STREAM_STATS_LOCK:
+        _STREAM_STATS['pages_streamed'] += 1
+        _STREAM_STATS['stopped_early'] += stopped_early
+        _STREAM_STATS['full_parses'] += full_parse
+        _STREAM_STATS['bytes_read'] += bytes_read
+
+
+def get_stream_stats() -> dict:
+    '''Returns how many book pages were streamed, how many of them stopped
+    reading early or needed a full parse, and the body bytes read in total.'''
+    with _STREAM_STATS_LOCK:
+        return dict(_STREAM_STATS)
+
+
+def parse_full_book_page(html: str) -> dict:
+    '''Parses a whole book page with BeautifulSoup, for when
+    streaming didn't find both fields.'''
+    return extract.get_book_page_data(BeautifulSoup(html, "lxml"))
+
+
+def stream_book_page(url: str) -> dict:
+    '''Returns the big cover image and review count of a book page, parsing the
+    response as it arrives and closing it as soon as both have been found, so
+    the rest of the body is never downloaded. Falls back to a full parse of the
+    whole page if streaming doesn't find them.'''
+    chunks_read, decoder = [], codecs.getincrementaldecoder('utf-8')()
+    body_finished = False
+
+    def decode(body: Iterable) -> Iterable:
+        nonlocal body_finished
+        for chunk in body:
+            chunks_read.append(chunk)
+            yield decoder.decode(chunk)
+        body_finished = True
+
+    try:
+        with extract.request_page(url, stream=True) as response:
+            response.raise_for_status()
+            body = response.iter_content(BOOK_PAGE_CHUNK_SIZE)
+            try:
+                book_page = parse_book_page_chunks(decode(body))
+                count_streamed_page(not body_finished, False, sum(map(len, chunks_read)))
+                return book_page
+            except ScrapingError:
+                chunks_read.extend(body)
+    except requests.RequestException as error:
+        print(error)
+        raise ScrapingError(f"Unable to scrape {url}.")
+
+    count_streamed_page(False, True, sum(map(len, chunks_read)))
+    return parse_full_book_page(b''.join(chunks_read).decode('utf-8'))
+
+
+def get_book_page(url: str) -> dict:
+    '''Returns the big cover image and review count of a book page,
+    streamed if streaming book pages is turned on.'''
+    if extract.can_stream_book_pages():
+        return stream_book_page(url)
+    return parse_book_page(extract.fetch_html(url))
+
+
+def get_individual_book_data(book_list_row: dict) -> dict:
+    '''Fetches a book's page and combines it with its book list fields,
+    reusing the stored book page values of a known book if they are fresh
+    and a book page already parsed in this run.'''
+    book_page = None
+    if extract.KNOWN_BOOKS is not None:
+        book_page = extract.KNOWN_BOOKS.get_book_page_data(
+            book_list_row['book_url_path'], book_list_row['rating_count'])
+    if book_page is None and extract.RUN_MEMO is not None:
+        book_url = book_list_row['book_url_path']
+        book_page = extract.RUN_MEMO.get('book_page', book_url,
+                                         lambda: get_book_page(book_url))
+    if book_page is None:
+        book_page = get_book_page(book_list_row['book_url_path'])
+    return extract.combine_book_row(book_list_row, book_page)
+
+
+def get_author_data(author_url: str) -> dict:
+    '''The lxml equivalent of extract.get_author_data, returning the same dictionary.'''
+    author_page = parse_author_page(extract.fetch_html(author_url))
+    book_list = parse_book_list_page(extract.fetch_html(author_page['books_url']))
+
+    if extract.BOOK_FETCH_WORKERS > 1:
+        books = extract.get_authors_books_concurrently(
+            book_list['books'], extract.BOOK_FETCH_WORKERS, get_individual_book_data)
+    else:
+        books = [get_individual_book_data(row) for row in book_list['books']]
+
+    return format_author_data(author_url, author_page, book_list, books)
+
+
+def format_author_data(author_url: str, author_page: dict, book_list: dict,
+                       books: list[dict]) -> dict:
+    '''Combines an author's parsed author and book list pages with their books
+    into the dictionary extract.get_author_data returns.'''
+    books_data = extract.format_books_measurement_data(
+        author_page, book_list['shelved_count'], books)
+    return extract.format_author_data(author_url, author_page, books_data)
@@ -0,0 +1,262 @@
+'''This module declares, for each type of goodreads page, which element every field
+is read from and the regex that cleans it. The specs are compiled once at import
+and each one is run in a single pass over a page's start/end parse events, which
+can come from an lxml tree, an lxml pull parser or a BeautifulSoup tree, so the
+BeautifulSoup functions in extract.py and the lxml engine read the same fields.'''
+import os
+import re
+from typing import Iterable, Iterator
+from bs4 import Tag
+from lxml import etree
+
+GOODREADS_BASE_URL = os.environ.get('GOODREADS_BASE_URL', 'https://www.goodreads.com')
+BOOKS_LIST_LIMIT_URL_PARAMETERS = '?page=1&per_page=10'
+TEXT = 'text'
+ELEMENT_TEXT = etree.XPath('string()')
+
+
+class ScrapingError(Exception):
+    '''Raised when a page can't be fetched or is missing a field it should have.'''
+
+
+def get_tag_name(element) -> str:
+    '''Returns the tag of an lxml element or a BeautifulSoup tag.'''
+    return element.name if isinstance(element, Tag) else element.tag
+
+
+def get_attribute(element, name: str) -> str:
+    '''Returns an attribute of an lxml element or a BeautifulSoup tag as it is
+    written in the html, as BeautifulSoup splits the class attribute into a list.'''
+    value = element.get(name)
+    return ' '.join(value) if isinstance(value, list) else value
+
+
+def get_text(element) -> str:
+    '''Returns all the text inside an lxml element or a BeautifulSoup tag.'''
+    return element.get_text() if isinstance(element, Tag) else ELEMENT_TEXT(element)
+
+
+def soup_events(tag: Tag) -> Iterator[tuple[str, Tag]]:
+    '''Yields the start and end parse events of every tag inside a BeautifulSoup
+    tree in document order, like etree.iterwalk does for an lxml tree.'''
+    for child in tag.children:
+        if isinstance(child, Tag):
+            yield 'start', child
+            yield from soup_events(child)
+            yield 'end', child
+
+
+class Field:
+    '''A field read from the first element matching tag, class_name and attributes.
+    class_name matches a single class, or the exact class attribute if it has a space.
+    Attribute values are matched exactly, or searched if they are compiled regexes.
+    The raw text or attribute is cleaned with the first group of pattern and then
+    put into template, where {base_url} is GOODREADS_BASE_URL. A field can be limited
+    to elements inside the first `within` scope element, or to elements anywhere
+    `after` it.'''
+
+    def __init__(self, tag: str, class_name: str = None, attributes: dict = None,
+                 read: str = TEXT, pattern: str = None, template: str = '{}',
+                 within: str = None, after: str = None):
+        self.tag = tag
+        self.class_name = class_name
+        self.attributes = attributes or {}
+        self.read = read
+        self.pattern = re.compile(pattern, re.S) if pattern else None
+        self.template = template
+        self.within = within
+        self.after = after
+
+    def matches(self, element) -> bool:
+        '''Checks whether an element is the one this field is read from.'''
+        if get_tag_name(element) != self.tag:
+            return False
+        if self.class_name:
+            element_class = get_attribute(element, 'class') or ''
+            if ' ' in self.class_name:
+                if element_class != self.class_name:
+                    return False
+            elif self.class_name not in element_class.split():
+                return False
+        for name, expected in self.attributes.items():
+            value = get_attribute(element, name)
+            if value is None:
+                return False
+            if isinstance(expected, re.Pattern):
+                if not expected.search(value):
+                    return False
+            elif value != expected:
+                return False
+        return True
+
+    def read_value(self, element) -> str:
+        '''Reads and cleans the field's value from its element.'''
+        value = get_text(element) if self.read == TEXT else get_attribute(element, self.read)
+        if self.pattern:
+            match = self.pattern.match(value or '')
+            if not match:
+                raise ScrapingError(f"Unexpected value {value!r} in page.")
+            value = match.group(1)
+        return self.template.format(value, base_url=GOODREADS_BASE_URL)
+
+
+class PageSpec:
+    '''The fields of one type of page, with the scope elements they are found
+    relative to, and optionally a spec for every repeated row in the page.'''
+
+    def __init__(self, fields: dict, scopes: dict = None,
+                 row_tag: str = None, row_spec: 'PageSpec' = None):
+        self.fields = fields
+        self.scopes = scopes or {}
+        self.row_tag = row_tag
+        self.row_spec = row_spec
+
+    def parse(self, events: Iterable) -> dict:
+        '''Reads every field from a stream of (event, element) parse events,
+        stopping early once all fields are read if the page has no rows.'''
+        state = SpecState(self)
+        for event, element in events:
+            state.handle(event, element)
+            if state.is_complete() and self.row_spec is None:
+                break
+        return state.get_values()
+
+    def parse_tree(self, tree: etree.Element) -> dict:
+        '''Reads every field from an already parsed page.'''
+        return self.parse(etree.iterwalk(tree, events=('start', 'end')))
+
+    def parse_soup(self, soup: Tag) -> dict:
+        '''Reads every field from a page, or part of one, parsed by BeautifulSoup.'''
+        return self.parse(soup_events(soup))
+
+    def select(self, *names: str) -> 'PageSpec':
+        '''Returns a spec for only some of the fields, without the rows,
+        which stops reading a page as soon as those fields are found.'''
+        return PageSpec({name: self.fields[name] for name in names}, self.scopes)
+
+
+def read_soup_field(spec: PageSpec, name: str, soup: Tag) -> str:
+    '''Reads a single field of a spec from a BeautifulSoup page.'''
+    return spec.select(name).parse_soup(soup)[name]
+
+
+class SpecState:
+    '''The progress of a single pass of a PageSpec over a page.'''
+
+    def __init__(self, spec: PageSpec):
+        self.spec = spec
+        self.values = {}
+        self.unread_text = {}
+        self.scope_elements = {}
+        self.closed_scopes = set()
+        self.rows = []
+        self.row_element, self.row_state = None, None
+
+    def handle(self, event: str, element: etree.Element) -> None:
+        '''Updates the scopes, rows and field values for one parse event.'''
+        if self.row_state is not None:
+            if event == 'end' and element is self.row_element:
+                self.rows.append(self.row_state.get_values())
+                self.row_element, self.row_state = None, None
+            else:
+                self.row_state.handle(event, element)
+            return
+
+        if event == 'end':
+            for name, value_element in list(self.unread_text.items()):
+                if value_element is element:
+                    self.values[name] = self.spec.fields[name].read_value(element)
+                    del self.unread_text[name]
+            for name, scope_element in self.scope_elements.items():
+                if scope_element is element:
+                    self.closed_scopes.add(name)
+            return
+
+        if self.spec.row_spec is not None and get_tag_name(element) == self.spec.row_tag:
+            self.row_element, self.row_state = element, SpecState(self.spec.row_spec)
+            return
+
+        for name, scope in self.spec.scopes.items():
+            if name not in self.scope_elements and scope.matches(element):
+                self.scope_elements[name] = element
+        for name, field in self.spec.fields.items():
+            if name in self.values or name in self.unread_text:
+                continue
+            if self.is_in_scope(field, element) and field.matches(element):
+                if field.read == TEXT:
+                    self.unread_text[name] = element
+                else:
+                    self.values[name] = field.read_value(element)
+
+    def is_in_scope(self, field: Field, element: etree.Element) -> bool:
+        '''Checks an element is inside or after the scope a field needs.'''
+        if field.within:
+            return (field.within in self.scope_elements
+                    and field.within not in self.closed_scopes
+                    and self.scope_elements[field.within] is not element)
+        if field.after:
+            return (field.after in self.scope_elements
+                    and self.scope_elements[field.after] is not element)
+        return True
+
+    def is_complete(self) -> bool:
+        '''Checks every field has been read.'''
+        return len(self.values) == len(self.spec.fields)
+
+    def get_values(self) -> dict:
+        '''Returns the field values, raising a ScrapingError if any are missing.'''
+        missing = [name for name in self.spec.fields if name not in self.values]
+        if missing:
+            raise ScrapingError(f"Unable to find {', '.join(missing)} in page.")
+        values = dict(self.values)
+        if self.spec.row_spec is not None:
+            values['books'] = self.rows
+        return values
+
+
+STRIPPED = r'\s*(.*?)\s*\Z'
+
+AUTHOR_PAGE_SPEC = PageSpec(
+    scopes={
+        'aggregate': Field('div', 'hreview-aggregate'),
+        'followers_header': Field('div', 'h2Container gradientHeaderContainer')
+    },
+    fields={
+        'author_name': Field('h1', 'authorName', pattern=STRIPPED),
+        'average_rating': Field('span', 'average', within='aggregate'),
+        'rating_count': Field('span', 'votes', within='aggregate', pattern=STRIPPED),
+        'review_count': Field('span', 'count', within='aggregate', pattern=STRIPPED),
+        'goodreads_followers': Field('h2', 'brownBackground', within='followers_header',
+                                     pattern=r'.*\((.*).\Z'),
+        'author_image_url': Field('img', attributes={'itemprop': 'image'}, read='src'),
+        'books_url': Field('a', attributes={'href': re.compile('/author/list')}, read='href',
+                           template='{base_url}{}' + BOOKS_LIST_LIMIT_URL_PARAMETERS)
+    })
+
+BOOK_LIST_ROW_SPEC = PageSpec(
+    fields={
+        'book_title': Field('span', attributes={'itemprop': 'name'}),
+        'book_url_path': Field('a', attributes={'itemprop': 'url'}, read='href',
+                               template='{base_url}{}'),
+        'small_image_url': Field('img', 'bookCover', read='src'),
+        'year_published': Field('span', 'greyText smallText uitext',
+                                pattern=r'(?:.*\s)?(\S+)(?:\s+\S+){3}\s*\Z'),
+        'average_rating': Field('span', 'minirating', pattern=r'(.*?).avg'),
+        'rating_count': Field('span', 'minirating', pattern=r'.*?—.(.*).r[^r]*\Z')
+    })
+
+BOOK_LIST_PAGE_SPEC = PageSpec(
+    scopes={'left_container': Field('div', 'leftContainer')},
+    fields={
+        'shelved_count': Field('div', after='left_container',
+                               pattern=r'(?:.*\s)?(\S+)\s+\S+\s*\Z')
+    },
+    row_tag='tr', row_spec=BOOK_LIST_ROW_SPEC)
+
+BOOK_PAGE_SPEC = PageSpec(
+    scopes={'cover': Field('div', 'BookCover__image')},
+    fields={
+        'big_image_url': Field('img', within='cover', read='src'),
+        'review_count': Field('div', 'RatingStatistics__meta', read='aria-label',
+                              pattern=r'.*d.(.*).reviews[^d]*\Z')
+    })
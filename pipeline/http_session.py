@@ -0,0 +1,70 @@
+'''This module keeps a single pooled, keep-alive HTTP session that every request
+to goodreads.com goes through, so connections are reused between pages.'''
+import os
+import threading
+import requests
+from requests.adapters import HTTPAdapter
+
+HTTP_POOL_SIZE = int(os.environ.get('HTTP_POOL_SIZE', '32'))
+REQUEST_TIMEOUT = 5
+SESSION_HEADERS = {
+    'Accept-Encoding': 'gzip, deflate',
+    'Connection': 'keep-alive'
+}
+
+_SESSION = None
+_SESSION_LOCK = threading.Lock()
+
+
+def create_session(pool_size: int = HTTP_POOL_SIZE) -> requests.Session:
+    '''Creates a session whose connection pool can hold pool_size
+    open connections per host.'''
+    session = requests.Session()
+    session.headers.update(SESSION_HEADERS)
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_size)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
+
+def get_session() -> requests.Session:
+    '''Returns the shared session, creating it on first use.'''
+    global _SESSION  # pylint: disable=global-statement
+    with _SESSION_LOCK:
+        if _SESSION is None:
+            _SESSION = create_session()
+        return _SESSION
+
+
+def reset_session() -> None:
+    '''Closes the shared session and its pooled connections.'''
+    global _SESSION  # pylint: disable=global-statement
+    with _SESSION_LOCK:
+        if _SESSION is not None:
+            _SESSION.close()
+        _SESSION = None
+
+
+def get_page(url: str, headers: dict = None, stream: bool = False) -> requests.Response:
+    '''Sends a GET request for the url through the shared session.'''
+    return get_session().get(url, headers=headers, timeout=REQUEST_TIMEOUT,
+                             stream=stream)
+
+
+def get_connection_stats() -> dict:
+    '''Returns how many requests have been sent through the shared session
+    and how many of them reused an already open connection.'''
+    request_count, connection_count = 0, 0
+    if _SESSION is not None:
+        for adapter in set(_SESSION.adapters.values()):
+            pools = adapter.poolmanager.pools
+            for pool_key in pools.keys():
+                pool = pools.get(pool_key)
+                if pool is not None:
+                    request_count += pool.num_requests
+                    connection_count += pool.num_connections
+    return {
+        'requests': request_count,
+        'connections_opened': connection_count,
+        'connections_reused': max(request_count - connection_count, 0)
+    }
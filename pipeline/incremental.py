@@ -0,0 +1,96 @@
+'''This module lets extraction skip the book page of a book that is already in the
+database. Only the big image and review count come from the book page, so a
+known book reuses the values of its last fetched book page until they are too old
+or its rating count on the book list has moved too far since that fetch. A reused
+page is measured with book_page_fetched false, so skipping it doesn't reset either.'''
+import os
+import threading
+from datetime import datetime, timedelta
+import pandas as pd
+import psycopg2
+
+INCREMENTAL_BOOKS = os.environ.get('INCREMENTAL_BOOKS', 'false').lower() == 'true'
+REVIEW_COUNT_MAX_AGE_DAYS = float(os.environ.get('REVIEW_COUNT_MAX_AGE_DAYS', '7'))
+RATING_COUNT_CHANGE = float(os.environ.get('RATING_COUNT_CHANGE', '0.01'))
+
+KNOWN_BOOKS_QUERY = '''
+SELECT DISTINCT ON (b.book_url_path)
+    b.book_url_path, b.big_image_url,
+    bm.review_count, bm.rating_count, bm.date_recorded
+FROM author AS a
+JOIN book AS b ON b.author_id = a.author_id
+JOIN book_measurement AS bm ON bm.book_id = b.book_id
+WHERE a.author_url = ANY(%(author_urls)s)
+AND bm.book_page_fetched
+AND bm.date_recorded >= %(fetched_since)s
+ORDER BY b.book_url_path, bm.date_recorded DESC'''
+
+
+def parse_count(count: str) -> int:
+    '''Returns a scraped count such as "8,712,345" as an int, or None.'''
+    try:
+        return int(str(count).replace(',', ''))
+    except ValueError:
+        return None
+
+
+class KnownBooks:
+    '''The values of the last fetched book page of every known book.'''
+
+    def __init__(self, books: list[dict], max_age_days: float = REVIEW_COUNT_MAX_AGE_DAYS,
+                 rating_count_change: float = RATING_COUNT_CHANGE):
+        self.books = {book['book_url_path']: book for book in books}
+        self.max_age_days = max_age_days
+        self.rating_count_change = rating_count_change
+        self.stats = {'book_pages_skipped': 0, 'book_pages_fetched': 0}
+        self._lock = threading.Lock()
+
+    def _count(self, stat: str) -> None:
+        with self._lock:
+            self.stats[stat] += 1
+
+    def is_fresh(self, known_book: dict, rating_count: str, now: datetime) -> bool:
+        '''Checks a known book's page was fetched recently enough and its rating
+        count hasn't moved past the threshold since that fetch.'''
+        if pd.isna(known_book['date_recorded']) or pd.isna(known_book['review_count']):
+            return False
+        age = now - pd.Timestamp(known_book['date_recorded']).to_pydatetime()
+        if age.total_seconds() > self.max_age_days * 86400:
+            return False
+
+        current_rating_count = parse_count(rating_count)
+        if current_rating_count is None or pd.isna(known_book['rating_count']):
+            return False
+        known_rating_count = int(known_book['rating_count'])
+        change = abs(current_rating_count - known_rating_count) / max(known_rating_count, 1)
+        return change <= self.rating_count_change
+
+    def get_book_page_data(self, book_url: str, rating_count: str,
+                           now: datetime = None) -> dict:
+        '''Returns the stored big image and review count of a book if they can be
+        reused, or None if its book page needs to be fetched.'''
+        known_book = self.books.get(book_url)
+        if known_book is None or not self.is_fresh(known_book, rating_count,
+                                                   now or datetime.now()):
+            self._count('book_pages_fetched')
+            return None
+        self._count('book_pages_skipped')
+        return {'big_image_url': known_book['big_image_url'],
+                'review_count': f"{int(known_book['review_count']):,}",
+                'book_page_fetched': False}
+
+    def get_stats(self) -> dict:
+        '''Returns how many book pages were skipped and fetched.'''
+        with self._lock:
+            return dict(self.stats)
+
+
+def load_known_books(conn: psycopg2.connect, author_urls: list[str],
+                     now: datetime = None) -> KnownBooks:
+    '''Returns the books of the given authors with the measurement of their last
+    fetched book page. Only pages fetched within the maximum age are read, as older
+    ones have to be fetched again anyway, which keeps the query to recent partitions.'''
+    fetched_since = (now or datetime.now()) - timedelta(days=REVIEW_COUNT_MAX_AGE_DAYS)
+    books_df = pd.read_sql(KNOWN_BOOKS_QUERY, conn, params={
+        'author_urls': list(author_urls), 'fetched_since': fetched_since})
+    return KnownBooks(books_df.to_dict(orient='records'))
@@ -1,9 +1,13 @@
 '''This module loads data provided by transform.py to the RDS database'''
 
+import io
 import os
+import csv
 import sys
+from typing import Callable
 import pandas as pd
 import psycopg2
+from psycopg2.extras import execute_values
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -13,6 +17,11 @@ DB_PASSWORD = os.environ.get("DB_PASSWORD")
 DB_PORT = os.environ.get("DB_PORT")
 DB_NAME = os.environ.get("DB_NAME")
 DB_HOST = os.environ.get("DB_HOST")
+BULK_LOAD = os.environ.get("BULK_LOAD", "false").lower() == "true"
+BULK_LOAD_PAGE_SIZE = int(os.environ.get("BULK_LOAD_PAGE_SIZE", "1000"))
+COPY_MEASUREMENTS = os.environ.get("COPY_MEASUREMENTS", "false").lower() == "true"
+COPY_FLUSH_ROWS = int(os.environ.get("COPY_FLUSH_ROWS", "10000"))
+MERGE_LOAD = os.environ.get("MERGE_LOAD", "false").lower() == "true"
 COLUMN_NAMES_IN_TABLES = {
     'book': ["author_id", "book_title", 'year_published',
              "small_image_url",
@@ -23,8 +32,14 @@ COLUMN_NAMES_IN_TABLES = {
                            "review_count"],
     'book_measurement': ['book_id',
                          'rating_count', 'average_rating',
-                         'review_count']
+                         'review_count', 'book_page_fetched']
 }
+# The measurement tables are partitioned by month, so the index that keeps a single
+# measurement per day is on each partition and only an insert into the partition
+# itself can name it as a conflict target
+MEASUREMENT_TABLES = ('author_measurement', 'book_measurement')
+# A book is identified by its author and url, as in the unique_author_book constraint
+BOOK_KEY_COLUMNS = ['author_id', 'book_url_path']
 
 
 def connect_to_database(db_name: str, db_username: str,
@@ -86,6 +101,21 @@ def author_match(author: dict, database_author: dict) -> bool:
     return False
 
 
+def get_book_key(book: dict) -> tuple:
+    """Returns the columns that identify a book, as in the unique_author_book constraint"""
+    return tuple(book[column] for column in BOOK_KEY_COLUMNS)
+
+
+def get_changed_books(new_values: list[dict], database_values: list[dict]) -> list[dict]:
+    """Returns the books already in the database whose details have changed"""
+    database_books = {get_book_key(database_book): database_book
+                      for database_book in database_values}
+    return get_unique_rows([new_book for new_book in new_values
+                            if get_book_key(new_book) in database_books
+                            and new_book != database_books[get_book_key(new_book)]],
+                           BOOK_KEY_COLUMNS)
+
+
 def get_new_authors_or_books(new_values: list[dict],
                              database_values: list[dict], table_name: str,
                              conn: psycopg2.connect) -> list[tuple]:
@@ -95,8 +125,10 @@ def get_new_authors_or_books(new_values: list[dict],
     are also considered (changed author_image_url)
     """
     if table_name == 'book':
-        return [new_book for new_book in new_values
-                if new_book not in database_values]
+        database_keys = {get_book_key(database_book) for database_book in database_values}
+        return get_unique_rows([new_book for new_book in new_values
+                                if get_book_key(new_book) not in database_keys],
+                               BOOK_KEY_COLUMNS)
 
     new_authors = []
     for author in new_values:
@@ -159,6 +191,10 @@ def upload_new_values_to_database(values_to_upload: list[tuple], conn: psycopg2.
     query = f'''
     INSERT INTO {table_name} ({', '.join(column_names)})'''
     query += column_count_dict[len(column_names)]
+    if table_name in MEASUREMENT_TABLES:
+        # Measurements are only recorded once per day, so re-running an author never duplicates them
+        query += '''
+    ON CONFLICT DO NOTHING'''
 
     result_message =\
         f'''Successfully inserted {len(values_to_upload)} new {table_name}s into the database.'''
@@ -173,6 +209,28 @@ def upload_new_values_to_database(values_to_upload: list[tuple], conn: psycopg2.
         cursor.close()
 
 
+def update_books_in_database(books: list[dict], conn: psycopg2.connect,
+                             column_names: list[str]) -> None:
+    """Updates the details of books already in the database in place,
+    matching each on its author id and url"""
+    updated_columns = [column for column in column_names if column not in BOOK_KEY_COLUMNS]
+    query = f'''
+    UPDATE book SET {', '.join(f'{column} = %s' for column in updated_columns)}
+    WHERE author_id = %s AND book_url_path = %s'''
+    values_to_update = format_values_to_upload(books, updated_columns + BOOK_KEY_COLUMNS)
+
+    cursor = conn.cursor()
+    try:
+        cursor.executemany(query, values_to_update)
+        conn.commit()
+        print(f'Successfully updated {len(values_to_update)} changed books in the database.')
+    except Exception as e:
+        print(f"Error updating books in database: {e}")
+        sys.exit()
+    finally:
+        cursor.close()
+
+
 def get_author_id(author: dict, conn: psycopg2.connect) -> int:
     """Returns an author id for a given author passed in"""
     query = '''
@@ -229,6 +287,11 @@ def load_book_or_author_data_into_table(cleaned_data: list[dict], table_name: st
     new_filtered_data = get_values_to_upload(
         formatted_values_for_comparison[0], table_name,
         conn, formatted_values_for_comparison[1])
+    if table_name == 'book':
+        new_books, database_books = formatted_values_for_comparison
+        changed_books = get_changed_books(new_books, database_books)
+        if changed_books:
+            update_books_in_database(changed_books, conn, column_names)
 
     if new_filtered_data:
         formatted_values = format_values_to_upload(
@@ -249,20 +312,27 @@ def load_measurements_into_table(cleaned_data: list[dict],
 
 
 def load_to_database(author_data: list[dict], connection: psycopg2.connect,
-                     column_names: dict) -> None:
-    """Loads all the tables in the database with the relevant data in order"""
+                     column_names: dict, replace_measurements: bool = False) -> None:
+    """Loads all the tables in the database with the relevant data in order.
+    With replace_measurements, as when replaying a stored run, measurements
+    overwrite any already recorded on their day, which only the bulk load can do"""
+    if replace_measurements:
+        bulk_load_to_database(author_data, connection, column_names,
+                              replace_measurements=True)
+        return
+    if MERGE_LOAD:
+        merge_load_to_database(author_data, connection, column_names)
+        return
+    if BULK_LOAD:
+        bulk_load_to_database(author_data, connection, column_names)
+        return
+
     # author table
     load_book_or_author_data_into_table(
         author_data, 'author', column_names['author'], connection)
 
     for author in author_data:
         author_id = get_author_id(author, connection)
-        for book in author['books']:
-            book['author_id'] = author_id
-
-        # book table
-        load_book_or_author_data_into_table(
-            author['books'], 'book', column_names['book'], connection, author_id)
 
         # author measurement table
         author['author_id'] = author_id
@@ -270,14 +340,310 @@ def load_to_database(author_data: list[dict], connection: psycopg2.connect,
             [author], connection, 'author_measurement',
             column_names['author_measurement'])
 
-        # book_measurement table
-        for book in author['books']:
-            book_id = get_book_id(book, connection)
-            book['book_id'] = book_id
+        load_books_to_database(author['books'], author_id, connection, column_names)
+
+
+def load_books_to_database(books: list[dict], author_id: int,
+                           connection: psycopg2.connect, column_names: dict) -> None:
+    """Loads a batch of an already loaded author's books into the book
+    and book_measurement tables"""
+    if MERGE_LOAD:
+        merge_load_books_to_database(books, author_id, connection, column_names)
+        return
+    if BULK_LOAD:
+        bulk_load_books_to_database(books, author_id, connection, column_names)
+        return
+
+    for book in books:
+        book['author_id'] = author_id
+
+    # book table
+    load_book_or_author_data_into_table(
+        books, 'book', column_names['book'], connection, author_id)
+
+    # book_measurement table
+    for book in books:
+        book_id = get_book_id(book, connection)
+        book['book_id'] = book_id
+
+        load_measurements_into_table(
+            [book], connection, 'book_measurement',
+            column_names['book_measurement'])
+
+
+def get_unique_rows(rows: list[dict], key_columns: list[str]) -> list[dict]:
+    """Returns the rows with only the last of any that share the same key,
+    as an upsert can't change the same row twice in one statement"""
+    unique_rows = {}
+    for row in rows:
+        unique_rows[tuple(row[column] for column in key_columns)] = row
+    return list(unique_rows.values())
+
+
+def upsert_authors(authors: list[dict], cursor, column_names: list[str]) -> dict:
+    """Inserts any new authors and updates the image of existing ones in a single
+    statement, returning the id of every author keyed by their url"""
+    query = f'''
+    INSERT INTO author ({', '.join(column_names)}) VALUES %s
+    ON CONFLICT (author_url) DO UPDATE SET author_image_url = EXCLUDED.author_image_url
+    RETURNING author_url, author_id'''
+    rows = execute_values(
+        cursor, query,
+        format_values_to_upload(get_unique_rows(authors, ['author_url']), column_names),
+        page_size=BULK_LOAD_PAGE_SIZE, fetch=True)
+    return dict(rows)
+
+
+def upsert_books(books: list[dict], cursor, column_names: list[str]) -> dict:
+    """Inserts any new books and updates the details of existing ones in a single
+    statement, returning the id of every book keyed by its author id and url"""
+    if not books:
+        return {}
+    updated_columns = [column for column in column_names
+                       if column not in BOOK_KEY_COLUMNS]
+    query = f'''
+    INSERT INTO book ({', '.join(column_names)}) VALUES %s
+    ON CONFLICT (author_id, book_url_path) DO UPDATE SET
+    {', '.join(f'{column} = EXCLUDED.{column}' for column in updated_columns)}
+    RETURNING author_id, book_url_path, book_id'''
+    rows = execute_values(
+        cursor, query,
+        format_values_to_upload(get_unique_rows(books, BOOK_KEY_COLUMNS),
+                                column_names),
+        page_size=BULK_LOAD_PAGE_SIZE, fetch=True)
+    return {(author_id, book_url_path): book_id for author_id, book_url_path, book_id in rows}
+
+
+def get_measurement_partition(table_name: str, date_recorded) -> str:
+    """Returns the name of the monthly partition a measurement recorded on the
+    given date goes in, as named by create_measurement_partition in schema.sql"""
+    return f"{table_name}_{str(date_recorded)[:7].replace('-', '_')}"
+
+
+def upsert_measurements(measurements: list[dict], cursor, table_name: str,
+                        column_names: list[str]) -> None:
+    """Inserts measurements into their monthly partitions with one statement each,
+    overwriting any recorded on the same day. The partition's index on the day is
+    the conflict target, which the partitioned table itself doesn't have"""
+    key_column = table_name.replace('_measurement', '_id')
+    partitions = {}
+    for measurement in measurements:
+        partition = partitions.setdefault(
+            get_measurement_partition(table_name, measurement['date_recorded']), {})
+        # A statement can't update the same row twice, so the last one of a day wins
+        partition[(measurement[key_column], str(measurement['date_recorded'])[:10])] = measurement
+
+    updated_columns = [column for column in column_names if column != key_column]
+    for partition_name, partition in partitions.items():
+        query = f'''
+    INSERT INTO {partition_name} ({', '.join(column_names)}) VALUES %s
+    ON CONFLICT ({key_column}, (CAST(date_recorded AS DATE))) DO UPDATE SET
+    {', '.join(f'{column} = EXCLUDED.{column}' for column in updated_columns)}'''
+        execute_values(cursor, query,
+                       format_values_to_upload(list(partition.values()), column_names),
+                       page_size=BULK_LOAD_PAGE_SIZE)
+
+
+def insert_measurements(measurements: list[dict], cursor, table_name: str,
+                        column_names: list[str], replace_measurements: bool = False) -> None:
+    """Inserts every measurement for a table in a single statement,
+    skipping any already recorded today, or overwriting them with replace_measurements"""
+    if not measurements:
+        return
+    if replace_measurements:
+        upsert_measurements(measurements, cursor, table_name, column_names)
+        return
+    if COPY_MEASUREMENTS:
+        copy_measurements(measurements, cursor, table_name, column_names)
+        return
+    query = f'''
+    INSERT INTO {table_name} ({', '.join(column_names)}) VALUES %s
+    ON CONFLICT DO NOTHING'''
+    execute_values(cursor, query, format_values_to_upload(measurements, column_names),
+                   page_size=BULK_LOAD_PAGE_SIZE)
+
+
+def copy_rows(rows: list[dict], cursor, table_name: str, column_names: list[str]) -> None:
+    """Writes the rows as CSV to an in-memory buffer and sends it with one COPY"""
+    buffer = io.StringIO()
+    csv.writer(buffer).writerows(format_values_to_upload(rows, column_names))
+    buffer.seek(0)
+    cursor.copy_expert(
+        f'COPY {table_name} ({", ".join(column_names)}) FROM STDIN WITH (FORMAT csv)', buffer)
+
+
+def copy_measurements(measurements: list[dict], cursor, table_name: str,
+                      column_names: list[str], flush_rows: int = None) -> None:
+    """Streams measurements through COPY into a temporary staging table,
+    flush_rows at a time, moving each flush into the table with one insert
+    that skips any already recorded today, which COPY alone can't do"""
+    flush_rows = flush_rows or COPY_FLUSH_ROWS
+    staging_table = f'{table_name}_copy'
+    columns = ', '.join(column_names)
+    cursor.execute(f'''
+    CREATE TEMP TABLE IF NOT EXISTS {staging_table} ON COMMIT DELETE ROWS
+    AS SELECT {columns} FROM {table_name} WITH NO DATA''')
+
+    for first_row in range(0, len(measurements), flush_rows):
+        copy_rows(measurements[first_row:first_row + flush_rows], cursor,
+                  staging_table, column_names)
+        cursor.execute(f'''
+    INSERT INTO {table_name} ({columns}) SELECT {columns} FROM {staging_table}
+    ON CONFLICT DO NOTHING;
+    TRUNCATE {staging_table}''')
+
+
+def bulk_load_books(books: list[dict], cursor, column_names: dict,
+                    replace_measurements: bool = False) -> None:
+    """Upserts books that already have their author id, then inserts their measurements"""
+    book_ids = upsert_books(books, cursor, column_names['book'])
+    for book in books:
+        book['book_id'] = book_ids[(book['author_id'], book['book_url_path'])]
+    insert_measurements(books, cursor, 'book_measurement', column_names['book_measurement'],
+                        replace_measurements)
+
+
+def commit_bulk_load(connection: psycopg2.connect, load: Callable) -> None:
+    """Runs a bulk load on a new cursor and commits it,
+    rolling it all back if any statement fails"""
+    cursor = connection.cursor()
+    try:
+        load(cursor)
+        connection.commit()
+    except psycopg2.Error as e:
+        connection.rollback()
+        print(f"Error bulk loading into the database: {e}")
+        raise
+    finally:
+        cursor.close()
+
 
-            load_measurements_into_table(
-                [book], connection, 'book_measurement',
-                column_names['book_measurement'])
+def bulk_load_to_database(author_data: list[dict], connection: psycopg2.connect,
+                          column_names: dict, replace_measurements: bool = False) -> None:
+    """Loads a batch of authors with a fixed number of statements, however many
+    books they have: one upsert each for the author and book tables, whose
+    returned ids replace the per row id lookups, and one insert each for
+    the measurement tables, all committed together"""
+    def load(cursor) -> None:
+        author_ids = upsert_authors(author_data, cursor, column_names['author'])
+        books = []
+        for author in author_data:
+            author['author_id'] = author_ids[author['author_url']]
+            for book in author['books']:
+                book['author_id'] = author['author_id']
+                books.append(book)
+        insert_measurements(author_data, cursor, 'author_measurement',
+                            column_names['author_measurement'], replace_measurements)
+        bulk_load_books(books, cursor, column_names, replace_measurements)
+
+    commit_bulk_load(connection, load)
+    print(f"Successfully bulk loaded {len(author_data)} authors into the database.")
+
+
+def bulk_load_books_to_database(books: list[dict], author_id: int,
+                                connection: psycopg2.connect, column_names: dict) -> None:
+    """Loads a batch of an already loaded author's books with one upsert
+    and one measurement insert"""
+    for book in books:
+        book['author_id'] = author_id
+    commit_bulk_load(connection, lambda cursor: bulk_load_books(books, cursor, column_names))
+
+
+def create_staging_table(cursor, staging_table: str, tables: str,
+                         column_names: list[str]) -> None:
+    """Creates an empty temporary table with the given columns of the joined tables,
+    dropped when the transaction ends"""
+    cursor.execute(f'''
+    CREATE TEMP TABLE {staging_table} ON COMMIT DROP
+    AS SELECT {', '.join(column_names)} FROM {tables} WITH NO DATA''')
+
+
+def get_changed_columns_condition(table_name: str, column_names: list[str]) -> str:
+    """Returns the condition for an upsert to only update rows whose columns changed"""
+    return (f"({', '.join(f'{table_name}.{column}' for column in column_names)}) "
+            f"IS DISTINCT FROM ({', '.join(f'EXCLUDED.{column}' for column in column_names)})")
+
+
+def merge_authors(author_data: list[dict], cursor, column_names: dict) -> dict:
+    """Copies the authors and their measurements into a staging table, merges them
+    into the author table, inserts their measurements and returns every author's
+    id keyed by their url"""
+    author_columns = column_names['author']
+    measurement_columns = [column for column in column_names['author_measurement']
+                           if column != 'author_id']
+    create_staging_table(cursor, 'author_stage',
+                         'author JOIN author_measurement USING (author_id)',
+                         author_columns + measurement_columns)
+    copy_rows(author_data, cursor, 'author_stage', author_columns + measurement_columns)
+
+    cursor.execute(f'''
+    INSERT INTO author ({', '.join(author_columns)})
+    SELECT DISTINCT ON (author_url) {', '.join(author_columns)} FROM author_stage
+    ON CONFLICT (author_url) DO UPDATE SET author_image_url = EXCLUDED.author_image_url
+    WHERE {get_changed_columns_condition('author', ['author_image_url'])}''')
+    cursor.execute(f'''
+    INSERT INTO author_measurement ({', '.join(column_names['author_measurement'])})
+    SELECT {', '.join(column_names['author_measurement'])}
+    FROM author_stage JOIN author USING (author_url)
+    ON CONFLICT DO NOTHING''')
+    cursor.execute('''
+    SELECT author_url, author_id FROM author
+    WHERE author_url IN (SELECT author_url FROM author_stage)''')
+    return dict(cursor.fetchall())
+
+
+def merge_books(books: list[dict], cursor, column_names: dict) -> None:
+    """Copies books that already have their author id, and their measurements, into
+    a staging table, merges them into the book table and inserts their measurements"""
+    if not books:
+        return
+    book_columns = column_names['book']
+    measurement_columns = [column for column in column_names['book_measurement']
+                           if column != 'book_id']
+    updated_columns = [column for column in book_columns
+                       if column not in BOOK_KEY_COLUMNS]
+    create_staging_table(cursor, 'book_stage', 'book JOIN book_measurement USING (book_id)',
+                         book_columns + measurement_columns)
+    copy_rows(books, cursor, 'book_stage', book_columns + measurement_columns)
+
+    cursor.execute(f'''
+    INSERT INTO book ({', '.join(book_columns)})
+    SELECT DISTINCT ON (author_id, book_url_path) {', '.join(book_columns)} FROM book_stage
+    ON CONFLICT (author_id, book_url_path) DO UPDATE SET
+    {', '.join(f'{column} = EXCLUDED.{column}' for column in updated_columns)}
+    WHERE {get_changed_columns_condition('book', updated_columns)}''')
+    cursor.execute(f'''
+    INSERT INTO book_measurement ({', '.join(column_names['book_measurement'])})
+    SELECT {', '.join(column_names['book_measurement'])}
+    FROM book_stage JOIN book USING (author_id, book_url_path)
+    ON CONFLICT DO NOTHING''')
+
+
+def merge_load_to_database(author_data: list[dict], connection: psycopg2.connect,
+                           column_names: dict) -> None:
+    """Loads a batch of authors by copying them and their books into temporary
+    staging tables and merging those into every table with set-based statements,
+    in one transaction, instead of comparing them with the database in Python"""
+    def load(cursor) -> None:
+        author_ids = merge_authors(author_data, cursor, column_names)
+        books = []
+        for author in author_data:
+            author['author_id'] = author_ids[author['author_url']]
+            for book in author['books']:
+                book['author_id'] = author['author_id']
+                books.append(book)
+        merge_books(books, cursor, column_names)
+
+    commit_bulk_load(connection, load)
+    print(f"Successfully merged {len(author_data)} authors into the database.")
+
+
+def merge_load_books_to_database(books: list[dict], author_id: int,
+                                 connection: psycopg2.connect, column_names: dict) -> None:
+    """Loads a batch of an already loaded author's books through a staging table"""
+    for book in books:
+        book['author_id'] = author_id
+    commit_bulk_load(connection, lambda cursor: merge_books(books, cursor, column_names))
 
 
 def main() -> None:
@@ -307,7 +673,8 @@ def main() -> None:
                'year_published': 2008,
                'average_rating': 4.34,
                'rating_count': 9365720,
-               'book_url_path': 'https://www.goodreads.com/book/show/6148028-catching-fire'
+               'book_url_path': 'https://www.goodreads.com/book/show/6148028-catching-fire',
+               'book_page_fetched': True
                },
               {
                   'book_title': 'Catching Fire (The Hunger Games, #2)',
@@ -319,7 +686,8 @@ def main() -> None:
                   'year_published': 2009,
                   'average_rating': 4.34,
                   'rating_count': 3882544,
-                  'book_url_path': 'https://www.goodreads.com/book/show/7260188-mockingjay'
+                  'book_url_path': 'https://www.goodreads.com/book/show/7260188-mockingjay',
+                  'book_page_fetched': True
               }
           ]}
          ]
@@ -0,0 +1,245 @@
+'''A local stand-in for goodreads.com, for load testing the pipeline without
+hitting the real site. It serves the saved test pages, templated for any number
+of synthetic authors and books, with configurable latency, server errors and
+429 Too Many Requests responses. Point the pipeline at it with
+GOODREADS_BASE_URL, e.g. `python mock_goodreads.py --authors 100`.'''
+import re
+import time
+import random
+import argparse
+import threading
+from os import path
+from functools import lru_cache
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlsplit, parse_qs
+from bs4 import BeautifulSoup
+
+FIRST_AUTHOR_ID = 900000
+TEMPLATE_AUTHOR_ID = '153394'
+TEMPLATE_AUTHOR_SLUG = 'Suzanne_Collins'
+TEMPLATE_AUTHOR_NAME = 'Suzanne Collins'
+ROWS_PLACEHOLDER = '@@BOOK_ROWS@@'
+AUTHOR_PATH_PATTERN = re.compile(r'^/author/(show|list)/(\d+)')
+BOOK_PATH_PATTERN = re.compile(r'/book/show/\d+')
+
+
+def read_test_html(filename: str) -> str:
+    '''Reads one of the saved goodreads pages used by the tests.'''
+    with open(path.join(path.dirname(__file__), filename), 'r', encoding='utf-8') as html_file:
+        return html_file.read()
+
+
+def get_author_url_path(author_index: int) -> str:
+    '''Returns the author page path of a synthetic author.'''
+    return f'/author/show/{FIRST_AUTHOR_ID + author_index}.Mock_Author_{author_index}'
+
+
+def split_book_list(html: str) -> tuple[str, list[str]]:
+    '''Splits the test book list into a page with a placeholder where
+    the book rows go, and the html of each row.'''
+    books_soup = BeautifulSoup(html, 'lxml')
+    rows = books_soup.find_all('tr')
+    table = rows[0].parent
+    row_html = [str(row) for row in rows]
+    for row in rows:
+        row.decompose()
+    table.append(books_soup.new_string(ROWS_PLACEHOLDER))
+    return str(books_soup), row_html
+
+
+class MockSite:
+    '''Renders the pages of a synthetic goodreads with a number of authors,
+    each with books_per_author books.'''
+
+    def __init__(self, authors: int, books_per_author: int):
+        self.authors = authors
+        self.books_per_author = books_per_author
+        self.author_template = read_test_html('test_author_page.html')
+        self.book_list_template, self.book_rows = split_book_list(
+            read_test_html('test_book_list.html'))
+        self.book_page = read_test_html('test_book_page.html')
+
+    def personalise(self, html: str, author_index: int) -> str:
+        '''Swaps the test author for a synthetic one.'''
+        return (html.replace(TEMPLATE_AUTHOR_ID, str(FIRST_AUTHOR_ID + author_index))
+                .replace(TEMPLATE_AUTHOR_SLUG, f'Mock_Author_{author_index}')
+                .replace(TEMPLATE_AUTHOR_NAME, f'Mock Author {author_index}'))
+
+    @lru_cache(maxsize=1024)
+    def get_author_page(self, author_index: int) -> str:
+        '''Returns the author page of a synthetic author.'''
+        return self.personalise(self.author_template, author_index)
+
+    def get_book_row(self, author_index: int, book_index: int) -> str:
+        '''Returns a book list row with a book id unique to the author.'''
+        row = self.book_rows[book_index % len(self.book_rows)]
+        book_id = (FIRST_AUTHOR_ID + author_index) * 10000 + book_index
+        return BOOK_PATH_PATTERN.sub(f'/book/show/{book_id}', row)
+
+    @lru_cache(maxsize=1024)
+    def get_book_list_page(self, author_index: int, page: int, per_page: int) -> str:
+        '''Returns one page of a synthetic author's book list.'''
+        first_book = (page - 1) * per_page
+        rows = [self.get_book_row(author_index, book_index) for book_index in
+                range(first_book, min(first_book + per_page, self.books_per_author))]
+        return self.personalise(
+            self.book_list_template.replace(ROWS_PLACEHOLDER, ''.join(rows)), author_index)
+
+    def render(self, url: str) -> str:
+        '''Returns the html for a url on the mock site, or None if it doesn't exist.'''
+        parts = urlsplit(url)
+        if parts.path.startswith('/book/show/'):
+            return self.book_page
+        author_path = AUTHOR_PATH_PATTERN.match(parts.path)
+        if not author_path:
+            return None
+        author_index = int(author_path.group(2)) - FIRST_AUTHOR_ID
+        if not 0 <= author_index < self.authors:
+            return None
+        if author_path.group(1) == 'show':
+            return self.get_author_page(author_index)
+        query = parse_qs(parts.query)
+        return self.get_book_list_page(author_index, int(query.get('page', ['1'])[0]),
+                                       int(query.get('per_page', ['30'])[0]))
+
+
+class MockGoodreadsServer:
+    '''Serves a MockSite on a local port from a background thread.
+    Each request waits latency seconds (give or take jitter), then fails with a
+    503 with probability error_rate or a 429 with probability throttle_rate.'''
+
+    def __init__(self, authors: int = 10, books_per_author: int = 10,
+                 latency: float = 0.0, jitter: float = 0.0, error_rate: float = 0.0,
+                 throttle_rate: float = 0.0, port: int = 0, seed: int = None):
+        self.site = MockSite(authors, books_per_author)
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.throttle_rate = throttle_rate
+        self.port = port
+        self.random = random.Random(seed)
+        self.stats = {'requests': 0, 'errors': 0, 'throttled': 0, 'not_found': 0}
+        self._lock = threading.Lock()
+        self._server = None
+
+    @property
+    def base_url(self) -> str:
+        '''The url to set GOODREADS_BASE_URL to.'''
+        return f'http://127.0.0.1:{self._server.server_address[1]}'
+
+    def get_author_urls(self) -> list[str]:
+        '''Returns the author page url of every synthetic author.'''
+        return [self.base_url + get_author_url_path(author_index)
+                for author_index in range(self.site.authors)]
+
+    def _count(self, stat: str) -> None:
+        with self._lock:
+            self.stats[stat] += 1
+
+    def _roll(self) -> float:
+        with self._lock:
+            return self.random.random()
+
+    def respond(self, request: BaseHTTPRequestHandler) -> None:
+        '''Answers a single GET request.'''
+        self._count('requests')
+        if self.latency or self.jitter:
+            time.sleep(max(self.latency + self.jitter * (2 * self._roll() - 1), 0))
+        roll = self._roll()
+        if roll < self.throttle_rate:
+            self._count('throttled')
+            request.send_response(429)
+            request.send_header('Retry-After', '1')
+            request.send_header('Content-Length', '0')
+            request.end_headers()
+            return
+        if roll < self.throttle_rate + self.error_rate:
+            self._count('errors')
+            request.send_response(503)
+            request.send_header('Content-Length', '0')
+            request.end_headers()
+            return
+
+        html = self.site.render(request.path)
+        if html is None:
+            self._count('not_found')
+            request.send_response(404)
+            request.send_header('Content-Length', '0')
+            request.end_headers()
+            return
+        body = html.encode('utf-8')
+        request.send_response(200)
+        request.send_header('Content-Type', 'text/html; charset=utf-8')
+        request.send_header('Content-Length', str(len(body)))
+        request.end_headers()
+        request.wfile.write(body)
+
+    def start(self) -> 'MockGoodreadsServer':
+        '''Starts serving in a background thread.'''
+        mock_server = self
+
+        class MockGoodreadsHandler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def do_GET(self):
+                mock_server.respond(self)
+
+            def log_message(self, format, *args):
+                pass
+
+        self._server = ThreadingHTTPServer(('127.0.0.1', self.port), MockGoodreadsHandler)
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self) -> None:
+        '''Stops the server and closes its socket.'''
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self) -> 'MockGoodreadsServer':
+        return self.start()
+
+    def __exit__(self, *exc_info) -> None:
+        self.stop()
+
+    def get_stats(self) -> dict:
+        '''Returns the requests served and how many were failed on purpose.'''
+        with self._lock:
+            return dict(self.stats)
+
+
+def add_mock_site_arguments(parser: argparse.ArgumentParser) -> None:
+    '''Adds the mock site and fault injection options to a parser.'''
+    parser.add_argument('--authors', type=int, default=10)
+    parser.add_argument('--books', type=int, default=10, help='books per author')
+    parser.add_argument('--latency', type=float, default=0.05, help='seconds per request')
+    parser.add_argument('--jitter', type=float, default=0.02, help='+/- seconds of latency')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='share of 503s')
+    parser.add_argument('--throttle-rate', type=float, default=0.0, help='share of 429s')
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--seed', type=int, default=None)
+
+
+def get_arguments(argv: list[str] = None) -> argparse.Namespace:
+    '''Parses the mock site and fault injection options.'''
+    parser = argparse.ArgumentParser(description=__doc__)
+    add_mock_site_arguments(parser)
+    return parser.parse_args(argv)
+
+
+def create_server(arguments: argparse.Namespace) -> MockGoodreadsServer:
+    '''Creates a server from the parsed command line options.'''
+    return MockGoodreadsServer(arguments.authors, arguments.books, arguments.latency,
+                               arguments.jitter, arguments.error_rate,
+                               arguments.throttle_rate, arguments.port, arguments.seed)
+
+
+if __name__ == '__main__':
+    with create_server(get_arguments()) as server:
+        print(f"Serving {server.site.authors} mock authors on {server.base_url}")
+        print(f"e.g. {server.get_author_urls()[0]}")
+        try:
+            threading.Event().wait()
+        except KeyboardInterrupt:
+            print(f"Stopped: {server.get_stats()}")
@@ -0,0 +1,169 @@
+'''This module keeps an on-disk cache of fetched goodreads.com pages, revalidated
+with ETag/Last-Modified so unchanged pages come back as 304 Not Modified.'''
+import os
+import re
+import json
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Callable
+import requests
+
+PAGE_CACHE_DIR = os.environ.get('PAGE_CACHE_DIR')
+PAGE_CACHE_MAX_MB = int(os.environ.get('PAGE_CACHE_MAX_MB', '256'))
+MAX_AGE_PATTERN = re.compile(r'max-age=(\d+)')
+
+
+def get_cache_key(url: str) -> str:
+    '''Returns the file name used for a url in the cache directory.'''
+    return hashlib.sha256(url.encode('utf-8')).hexdigest()
+
+
+def get_expiry_time(headers: dict) -> float:
+    '''Returns the time a response stays fresh until, based on its
+    Cache-Control max-age. Pages without one have to be revalidated.'''
+    cache_control = headers.get('Cache-Control', '')
+    if 'no-cache' in cache_control or 'no-store' in cache_control:
+        return 0
+    max_age = MAX_AGE_PATTERN.search(cache_control)
+    if max_age and int(max_age.group(1)) > 0:
+        return time.time() + int(max_age.group(1))
+    return 0
+
+
+class PageCache:
+    '''A size-bounded, least recently used cache of page bodies and
+    their validators, stored as files in cache_dir.'''
+
+    def __init__(self, cache_dir: str, max_bytes: int):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.stats = {'hits': 0, 'misses': 0, 'not_modified': 0, 'evictions': 0}
+        self._lock = threading.Lock()
+        self._sizes = OrderedDict()
+        os.makedirs(cache_dir, exist_ok=True)
+        self._load_index()
+
+    def _path(self, key: str, extension: str) -> str:
+        return os.path.join(self.cache_dir, f'{key}.{extension}')
+
+    def _load_index(self) -> None:
+        '''Rebuilds the LRU order from the entries already on disk,
+        least recently used first.'''
+        entries = []
+        for file_name in os.listdir(self.cache_dir):
+            if file_name.endswith('.json'):
+                path = os.path.join(self.cache_dir, file_name)
+                with open(path, 'r', encoding='utf-8') as meta_file:
+                    size = json.load(meta_file)['size']
+                entries.append((os.path.getmtime(path), file_name[:-5], size))
+        for _, key, size in sorted(entries):
+            self._sizes[key] = size
+
+    def _write(self, path: str, content: str) -> None:
+        temp_path = f'{path}.{threading.get_ident()}.tmp'
+        with open(temp_path, 'w', encoding='utf-8') as cache_file:
+            cache_file.write(content)
+        os.replace(temp_path, path)
+
+    def lookup(self, url: str) -> dict:
+        '''Returns the cached entry for a url, or None if it isn't cached.'''
+        key = get_cache_key(url)
+        with self._lock:
+            if key not in self._sizes:
+                return None
+            try:
+                with open(self._path(key, 'json'), 'r', encoding='utf-8') as meta_file:
+                    entry = json.load(meta_file)
+                with open(self._path(key, 'html'), 'r', encoding='utf-8') as body_file:
+                    entry['html'] = body_file.read()
+            except (OSError, ValueError):
+                self._sizes.pop(key)
+                return None
+            self._sizes.move_to_end(key)
+            os.utime(self._path(key, 'json'))
+        return entry
+
+    def store(self, url: str, html: str, headers: dict) -> None:
+        '''Stores a page with its validators, evicting the least
+        recently used pages if the cache is over its size limit.'''
+        etag = headers.get('ETag')
+        last_modified = headers.get('Last-Modified')
+        expires_at = get_expiry_time(headers)
+        if not etag and not last_modified and not expires_at:
+            return
+
+        key = get_cache_key(url)
+        entry = {'url': url, 'etag': etag, 'last_modified': last_modified,
+                 'expires_at': expires_at, 'size': len(html.encode('utf-8'))}
+        with self._lock:
+            self._write(self._path(key, 'html'), html)
+            self._write(self._path(key, 'json'), json.dumps(entry))
+            self._sizes[key] = entry['size']
+            self._sizes.move_to_end(key)
+            self._evict()
+
+    def refresh(self, url: str, headers: dict) -> None:
+        '''Updates how long a revalidated page stays fresh.'''
+        key = get_cache_key(url)
+        expires_at = get_expiry_time(headers)
+        with self._lock:
+            path = self._path(key, 'json')
+            if key in self._sizes and os.path.exists(path):
+                with open(path, 'r', encoding='utf-8') as meta_file:
+                    entry = json.load(meta_file)
+                entry['expires_at'] = expires_at
+                self._write(path, json.dumps(entry))
+
+    def _evict(self) -> None:
+        while self._sizes and sum(self._sizes.values()) > self.max_bytes:
+            key, _ = self._sizes.popitem(last=False)
+            for extension in ('json', 'html'):
+                if os.path.exists(self._path(key, extension)):
+                    os.remove(self._path(key, extension))
+            self.stats['evictions'] += 1
+
+    def _count(self, stat: str) -> None:
+        with self._lock:
+            self.stats[stat] += 1
+
+    def get_html(self, url: str,
+                 get_page: Callable[..., requests.Response]) -> str:
+        '''Returns the html for a url, from the cache while it is fresh, otherwise
+        with a conditional GET that reuses the cached body on 304 Not Modified.'''
+        entry = self.lookup(url)
+        headers = {}
+        if entry:
+            if entry['expires_at'] > time.time():
+                self._count('hits')
+                return entry['html']
+            if entry['etag']:
+                headers['If-None-Match'] = entry['etag']
+            if entry['last_modified']:
+                headers['If-Modified-Since'] = entry['last_modified']
+
+        response = get_page(url, headers=headers)
+        if entry and response.status_code == 304:
+            self._count('not_modified')
+            self.refresh(url, response.headers)
+            return entry['html']
+
+        response.raise_for_status()
+        html = response.content.decode('utf-8')
+        self._count('misses')
+        self.store(url, html, response.headers)
+        return html
+
+    def get_stats(self) -> dict:
+        '''Returns the hit, miss, 304 and eviction counters.'''
+        with self._lock:
+            return dict(self.stats)
+
+
+def load_page_cache() -> PageCache:
+    '''Returns the page cache configured by PAGE_CACHE_DIR,
+    or None if the cache hasn't been turned on.'''
+    if not PAGE_CACHE_DIR:
+        return None
+    return PageCache(PAGE_CACHE_DIR, PAGE_CACHE_MAX_MB * 1024 * 1024)
@@ -0,0 +1,241 @@
+'''This module splits extraction into two stages, so parsing no longer competes with
+fetching for the GIL. Threads download the raw html of each page, and a pool of
+worker processes parses it into plain dictionaries with the page specs in
+field_spec.py. The stages are joined by bounded queues, so fetching waits for the
+parsers to catch up instead of holding every downloaded page in memory.'''
+import os
+import time
+import queue
+import logging
+import threading
+from concurrent.futures import ProcessPoolExecutor, Future
+from typing import Callable
+from bs4 import BeautifulSoup
+import extract
+from extract import combine_book_row
+from fast_extract import format_author_data
+from field_spec import BOOK_LIST_PAGE_SPEC
+
+PARSE_WORKERS = int(os.environ.get('PARSE_WORKERS', str(os.cpu_count() or 1)))
+PARSE_FETCH_WORKERS = int(os.environ.get('PARSE_FETCH_WORKERS', '16'))
+PARSE_QUEUE_SIZE = int(os.environ.get('PARSE_QUEUE_SIZE', '32'))
+PARSE_AUTHORS_IN_FLIGHT = int(os.environ.get('PARSE_AUTHORS_IN_FLIGHT', '8'))
+
+AUTHOR_PAGE = 'author_page'
+BOOK_LIST_PAGE = 'book_list_page'
+BOOK_PAGE = 'book_page'
+
+
+def parse_author_page(html: str) -> dict:
+    '''Reads every field of an author page at once with the page spec extract.py uses.'''
+    return extract.parse_author_page(BeautifulSoup(html, "lxml"))
+
+
+def parse_book_list_page(html: str) -> dict:
+    '''Reads the shelved count and every book row of a book list page at once.'''
+    return BOOK_LIST_PAGE_SPEC.parse_soup(BeautifulSoup(html, "lxml"))
+
+
+def parse_book_page(html: str) -> dict:
+    '''Parses a book page with the page spec extract.py uses.'''
+    return extract.get_book_page_data(BeautifulSoup(html, "lxml"))
+
+
+PAGE_PARSERS = {AUTHOR_PAGE: parse_author_page,
+                BOOK_LIST_PAGE: parse_book_list_page,
+                BOOK_PAGE: parse_book_page}
+
+
+def parse_page(page_type: str, html: str) -> dict:
+    '''Parses a page of the given type. Runs in a parser process, and
+    does nothing without a page type so the processes can be started early.'''
+    if page_type is None:
+        return None
+    return PAGE_PARSERS[page_type](html)
+
+
+class ParsePipeline:
+    '''Fetch threads feeding a process pool of parsers. Pages are submitted to a
+    bounded fetch queue, and a fetched page waits for a free parse slot before it
+    is handed to a parser, so both stages are held back when the one after is full.
+    Parsed pages, and pages that failed, come back in the order they finish.'''
+
+    def __init__(self, fetch_workers: int = None, parse_workers: int = None,
+                 queue_size: int = None, fetch: Callable[[str], str] = None):
+        self.fetch_workers = fetch_workers or PARSE_FETCH_WORKERS
+        self.parse_workers = parse_workers or PARSE_WORKERS
+        queue_size = queue_size or PARSE_QUEUE_SIZE
+        self.fetch = fetch or extract.fetch_html
+        self.fetch_queue = queue.Queue(maxsize=queue_size)
+        self.parse_slots = threading.BoundedSemaphore(queue_size)
+        self.results = queue.Queue()
+        self.stats = {'pages_fetched': 0, 'pages_parsed': 0, 'pages_failed': 0,
+                      'parse_wait_seconds': 0.0}
+        self._lock = threading.Lock()
+        self._executor = None
+        self._threads = []
+
+    def __enter__(self) -> 'ParsePipeline':
+        # The parser processes are started before the fetch threads,
+        # so they aren't forked from a process with threads running.
+        self._executor = ProcessPoolExecutor(max_workers=self.parse_workers)
+        self._executor.submit(parse_page, None, None).exception()
+        self._threads = [threading.Thread(target=self._fetch_worker, daemon=True)
+                         for _ in range(self.fetch_workers)]
+        for thread in self._threads:
+            thread.start()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        for _ in self._threads:
+            self.fetch_queue.put(None)
+        for thread in self._threads:
+            thread.join()
+        self._executor.shutdown(cancel_futures=True)
+
+    def _count(self, stat: str, amount: float = 1) -> None:
+        with self._lock:
+            self.stats[stat] += amount
+
+    def submit(self, page_type: str, url: str, tag) -> None:
+        '''Queues a page to be fetched and parsed, waiting while the queue is full.
+        The tag is handed back with the page's result.'''
+        self.fetch_queue.put((page_type, url, tag))
+
+    def get_result(self) -> tuple:
+        '''Waits for the next page to finish, returning its tag,
+        its parsed dictionary and the error if it failed.'''
+        return self.results.get()
+
+    def _fetch_worker(self) -> None:
+        while True:
+            page = self.fetch_queue.get()
+            if page is None:
+                return
+            page_type, url, tag = page
+            try:
+                html = self.fetch(url)
+            # Every failure is handed back, or the author waiting on the page never finishes
+            except Exception as error:  # pylint: disable=broad-exception-caught
+                self._count('pages_failed')
+                self.results.put((tag, None, error))
+                continue
+            self._count('pages_fetched')
+
+            waiting_since = time.monotonic()
+            self.parse_slots.acquire()
+            self._count('parse_wait_seconds', time.monotonic() - waiting_since)
+            future = self._executor.submit(parse_page, page_type, html)
+            future.add_done_callback(lambda future, tag=tag: self._parsed(tag, future))
+
+    def _parsed(self, tag, future: Future) -> None:
+        self.parse_slots.release()
+        try:
+            parsed_page = future.result()
+        except Exception as error:  # pylint: disable=broad-exception-caught
+            self._count('pages_failed')
+            self.results.put((tag, None, error))
+            return
+        self._count('pages_parsed')
+        self.results.put((tag, parsed_page, None))
+
+    def get_stats(self) -> dict:
+        '''Returns the pages fetched, parsed and failed, and the seconds fetch
+        threads spent waiting for a free parser.'''
+        with self._lock:
+            stats = dict(self.stats)
+        stats['parse_wait_seconds'] = round(stats['parse_wait_seconds'], 3)
+        return stats
+
+
+def run_parse_pool(author_urls: list[str], on_author: Callable[[dict], None],
+                   log: logging.Logger, on_failure: Callable[[str], None] = None,
+                   admit: Callable[[str], bool] = None, authors_in_flight: int = None,
+                   pipeline: ParsePipeline = None) -> dict:
+    '''Extracts every author through the fetch and parse stages, with up to
+    authors_in_flight authors in progress at once. Each finished author is passed
+    to on_author and each author that couldn't be scraped to on_failure, both on
+    this thread, so they can safely share a connection. An author is only
+    started if admit, when given, returns True for their url. Book pages in the
+    run memo aren't fetched again, though two authors waiting on the same
+    book page at once both fetch it, as pages are fetched without blocking.'''
+    authors_in_flight = authors_in_flight or PARSE_AUTHORS_IN_FLIGHT
+    pipeline = pipeline or ParsePipeline()
+    stats = {'authors_extracted': 0, 'authors_failed': 0}
+    remaining_authors = iter(enumerate(author_urls))
+    authors = {}
+
+    def start_next_author() -> None:
+        for author_index, author_url in remaining_authors:
+            if admit is None or admit(author_url):
+                authors[author_index] = {'author_url': author_url}
+                pipeline.submit(AUTHOR_PAGE, author_url, (author_index, AUTHOR_PAGE, None))
+                return
+
+    def end_author(author_index: int, author: dict = None) -> None:
+        author_url = authors.pop(author_index)['author_url']
+        if author is None:
+            stats['authors_failed'] += 1
+            if on_failure is not None:
+                on_failure(author_url)
+        else:
+            stats['authors_extracted'] += 1
+            on_author(author)
+        start_next_author()
+
+    def finish_if_done(author_index: int) -> None:
+        state = authors[author_index]
+        if state['pending_books'] == 0:
+            end_author(author_index, format_author_data(
+                state['author_url'], state['author_page'], state['book_list'],
+                [book for book in state['books'] if book is not None]))
+
+    def start_books(author_index: int) -> None:
+        state = authors[author_index]
+        book_rows = state['book_list']['books']
+        state['books'] = [None] * len(book_rows)
+        state['pending_books'] = 0
+        for book_index, book_row in enumerate(book_rows):
+            book_page = None
+            if extract.KNOWN_BOOKS is not None:
+                book_page = extract.KNOWN_BOOKS.get_book_page_data(
+                    book_row['book_url_path'], book_row['rating_count'])
+            if book_page is None and extract.RUN_MEMO is not None:
+                book_page = extract.RUN_MEMO.peek(BOOK_PAGE, book_row['book_url_path'])
+            if book_page is not None:
+                state['books'][book_index] = combine_book_row(book_row, book_page)
+                continue
+            state['pending_books'] += 1
+            pipeline.submit(BOOK_PAGE, book_row['book_url_path'],
+                            (author_index, BOOK_PAGE, book_index))
+        finish_if_done(author_index)
+
+    with pipeline:
+        for _ in range(authors_in_flight):
+            start_next_author()
+        while authors:
+            (author_index, page_type, book_index), parsed_page, error = pipeline.get_result()
+            state = authors[author_index]
+            if page_type == BOOK_PAGE:
+                if error is None:
+                    book_row = state['book_list']['books'][book_index]
+                    if extract.RUN_MEMO is not None:
+                        extract.RUN_MEMO.put(BOOK_PAGE, book_row['book_url_path'], parsed_page)
+                    state['books'][book_index] = combine_book_row(book_row, parsed_page)
+                else:
+                    print(f"Skipping book: {error}")
+                state['pending_books'] -= 1
+                finish_if_done(author_index)
+            elif error is not None:
+                log.error("Unable to scrape data for %s: %s", state['author_url'], error)
+                end_author(author_index)
+            elif page_type == AUTHOR_PAGE:
+                state['author_page'] = parsed_page
+                pipeline.submit(BOOK_LIST_PAGE, parsed_page['books_url'],
+                                (author_index, BOOK_LIST_PAGE, None))
+            else:
+                state['book_list'] = parsed_page
+                start_books(author_index)
+
+    stats.update(pipeline.get_stats())
+    return stats
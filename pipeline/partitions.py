@@ -0,0 +1,141 @@
+'''This module manages the monthly partitions of author_measurement and book_measurement.
+Partitions are created for the coming months before any measurement needs them, and
+partitions older than the retention period are detached into an archive schema, so
+queries, vacuums and index maintenance only ever deal with recent months. Archived
+partitions can still be queried, or attached again, from the archive schema.'''
+import os
+import re
+import logging
+from datetime import date
+import psycopg2
+from load import (connect_to_database, MEASUREMENT_TABLES,
+                  DB_NAME, DB_USERNAME, DB_PASSWORD, DB_HOST, DB_PORT)
+
+PARTITION_MAINTENANCE = os.environ.get('PARTITION_MAINTENANCE', 'true').lower() == 'true'
+PARTITION_MONTHS_AHEAD = int(os.environ.get('PARTITION_MONTHS_AHEAD', '3'))
+PARTITION_RETAIN_MONTHS = int(os.environ.get('PARTITION_RETAIN_MONTHS', '0'))
+PARTITION_ARCHIVE_SCHEMA = os.environ.get('PARTITION_ARCHIVE_SCHEMA', 'measurement_archive')
+PARTITION_NAME_PATTERN = re.compile(r'_(\d{4})_(\d{2})$')
+
+
+def add_months(month: date, months: int) -> date:
+    '''Returns the first day of the month a number of months after the given one.'''
+    month_index = month.year * 12 + month.month - 1 + months
+    return date(month_index // 12, month_index % 12 + 1, 1)
+
+
+def create_partitions(conn: psycopg2.connect, months: list[date]) -> list[str]:
+    '''Creates the partition of every measurement table for each month,
+    if it doesn't exist yet, returning the names of the partitions.'''
+    partition_names = []
+    with conn.cursor() as cursor:
+        for table_name in MEASUREMENT_TABLES:
+            for month in sorted(set(months)):
+                cursor.execute('SELECT create_measurement_partition(%s, %s)',
+                               (table_name, month))
+                partition_names.append(cursor.fetchone()[0])
+    conn.commit()
+    return partition_names
+
+
+def create_future_partitions(conn: psycopg2.connect, months_ahead: int = None,
+                             today: date = None) -> list[str]:
+    '''Creates the partitions for this month and the months_ahead months after it.'''
+    months_ahead = PARTITION_MONTHS_AHEAD if months_ahead is None else months_ahead
+    this_month = (today or date.today()).replace(day=1)
+    return create_partitions(conn, [add_months(this_month, months)
+                                    for months in range(months_ahead + 1)])
+
+
+def create_partitions_for_dates(conn: psycopg2.connect, dates: list[str]) -> list[str]:
+    '''Creates the partitions that measurements recorded on the given
+    ISO dates will go in, such as those of a replayed run.'''
+    return create_partitions(conn, [date.fromisoformat(recorded[:10]).replace(day=1)
+                                    for recorded in dates])
+
+
+def get_partitions(conn: psycopg2.connect, table_name: str) -> list[tuple[str, date]]:
+    '''Returns the name and month of every partition of a measurement table.'''
+    query = '''
+    SELECT child.relname FROM pg_inherits
+    JOIN pg_class AS child ON child.oid = pg_inherits.inhrelid
+    WHERE pg_inherits.inhparent = CAST(%s AS REGCLASS)
+    ORDER BY child.relname'''
+    with conn.cursor() as cursor:
+        cursor.execute(query, (table_name,))
+        partition_names = [row[0] for row in cursor.fetchall()]
+
+    partitions = []
+    for partition_name in partition_names:
+        month = PARTITION_NAME_PATTERN.search(partition_name)
+        if month:
+            partitions.append((partition_name,
+                               date(int(month.group(1)), int(month.group(2)), 1)))
+    return partitions
+
+
+def archive_old_partitions(conn: psycopg2.connect, retain_months: int = None,
+                           archive_schema: str = None, today: date = None) -> list[str]:
+    '''Detaches the partitions of months before the last retain_months months into
+    the archive schema, returning their names. Nothing is archived if retain_months is 0.'''
+    retain_months = PARTITION_RETAIN_MONTHS if retain_months is None else retain_months
+    archive_schema = archive_schema or PARTITION_ARCHIVE_SCHEMA
+    if retain_months <= 0:
+        return []
+    oldest_month = add_months((today or date.today()).replace(day=1), 1 - retain_months)
+
+    archived = []
+    for table_name in MEASUREMENT_TABLES:
+        for partition_name, month in get_partitions(conn, table_name):
+            if month >= oldest_month:
+                continue
+            with conn.cursor() as cursor:
+                cursor.execute(f'CREATE SCHEMA IF NOT EXISTS {archive_schema}')
+                cursor.execute(f'ALTER TABLE {table_name} DETACH PARTITION {partition_name}')
+                cursor.execute(f'ALTER TABLE {partition_name} SET SCHEMA {archive_schema}')
+            conn.commit()
+            archived.append(partition_name)
+    return archived
+
+
+def analyse_measurement_tables(conn: psycopg2.connect) -> None:
+    '''Refreshes the planner statistics of the partitioned tables themselves,
+    which autovacuum only ever gathers for each partition.'''
+    with conn.cursor() as cursor:
+        cursor.execute(f"ANALYZE {', '.join(MEASUREMENT_TABLES)}")
+    conn.commit()
+
+
+def run_partition_maintenance(conn: psycopg2.connect, log: logging.Logger,
+                              today: date = None) -> dict:
+    '''Creates the coming months' partitions and archives the expired ones, returning
+    the partitions ensured, newly created and archived. The planner statistics are only
+    refreshed when a partition was created or archived, as nothing else changes
+    the partitioned tables' shape. A failure is logged rather than raised, so it
+    never stops a run.'''
+    stats = {'partitions': [], 'created': [], 'archived': []}
+    try:
+        existing_partitions = {partition_name for table_name in MEASUREMENT_TABLES
+                               for partition_name, _ in get_partitions(conn, table_name)}
+        stats['partitions'] = create_future_partitions(conn, today=today)
+        stats['created'] = [partition_name for partition_name in stats['partitions']
+                            if partition_name not in existing_partitions]
+        stats['archived'] = archive_old_partitions(conn, today=today)
+        if stats['created'] or stats['archived']:
+            analyse_measurement_tables(conn)
+    except psycopg2.Error as error:
+        conn.rollback()
+        log.error("Unable to maintain the measurement partitions: %s", error)
+        stats['error'] = str(error)
+    log.info("Partition maintenance: %s partitions ensured, %s created, %s archived",
+             len(stats['partitions']), len(stats['created']), len(stats['archived']))
+    return stats
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO)
+    connection = connect_to_database(DB_NAME, DB_USERNAME, DB_PASSWORD, DB_HOST, DB_PORT)
+    try:
+        print(run_partition_maintenance(connection, logging.getLogger()))
+    finally:
+        connection.close()
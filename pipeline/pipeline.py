@@ -1,16 +1,36 @@
 """
-Script that combines the extraction of book/author data from multiple data sources, converts it to 
-a Pandas DataFrame, cleans the book/author data and then uploads the data to the PostgresSQL Database.
+Script that combines the extraction of book/author data from multiple data sources,
+converts it to a Pandas DataFrame, cleans the book/author data and then uploads the data
+to the PostgresSQL Database.
 """
 import warnings
 import os
 import logging
+from itertools import islice
+from typing import Callable
 import psycopg2
 import pandas as pd
 from dotenv import load_dotenv
+import extract
 from extract import get_author_data, ScrapingError
-from transform import clean_authors_info
-from load import connect_to_database, load_to_database, COLUMN_NAMES_IN_TABLES
+import fast_extract
+from transform import clean_authors_info, clean_books
+from load import (connect_to_database, load_to_database, load_books_to_database,
+                  COLUMN_NAMES_IN_TABLES)
+from crawl import run_crawl
+from parse_pool import run_parse_pool
+from staged import run_stages
+from http_session import get_connection_stats
+from replay import replay_runs
+from deadline import (DeadlineScheduler, create_scheduler, load_run_cost_history,
+                      save_run_costs)
+from incremental import INCREMENTAL_BOOKS, load_known_books
+from priority import PRIORITY_SCHEDULING, get_prioritised_author_urls
+from partitions import PARTITION_MAINTENANCE, run_partition_maintenance
+from shard import (SHARD_COUNT, SHARD_BACKEND, dispatch_shards, get_shard_events,
+                   get_shard_condition, summarise_shards)
+from checkpoint import (RunCheckpoint, create_run_id, start_run, finish_run,
+                        get_interrupted_run_id, EXTRACTED, TRANSFORMED, LOADED)
 
 
 load_dotenv()
@@ -19,30 +39,282 @@ DB_PASSWORD = os.environ.get("DB_PASSWORD")
 DB_PORT = os.environ.get("DB_PORT")
 DB_NAME = os.environ.get("DB_NAME")
 DB_HOST = os.environ.get("DB_HOST")
+PIPELINE_MODE = os.environ.get("PIPELINE_MODE", "serial")
+PARSER_ENGINE = os.environ.get("PARSER_ENGINE", "soup")
+UNPAGINATED_MODES = ("async", "parallel", "staged")
 
 
-def get_author_urls(conn: psycopg2.connect) -> list[str]:
+def get_author_urls(conn: psycopg2.connect, shard: int = None,
+                    shard_count: int = None) -> list[str]:
     """Queries the database for all author
-    returns list of dict of all authors in database"""
+    returns list of dict of all authors in database,
+    or only the authors in one shard when a shard is given.
+    With priority scheduling, only the authors due a refresh are returned,
+    highest priority first"""
 
-    query = 'SELECT author_url FROM author'
-    authors_df = pd.read_sql(query, conn)
+    if PRIORITY_SCHEDULING:
+        return get_prioritised_author_urls(conn, shard, shard_count)
+    if shard is None:
+        query = 'SELECT author_url FROM author'
+        authors_df = pd.read_sql(query, conn)
+    else:
+        shard_condition, shard_params = get_shard_condition('author_id', shard, shard_count)
+        query = f'SELECT author_url FROM author WHERE {shard_condition}'
+        authors_df = pd.read_sql(query, conn, params=shard_params)
     return authors_df.to_dict(orient='list')['author_url']
 
 
-def run_pipeline(author_url: str, conn: psycopg2.connect, log: logging.Logger) -> None:
-    """Runs main script where data is extracted, cleaned and uploaded to the database"""
+def mark_stage(checkpoint: RunCheckpoint, author_url: str, stage: str) -> None:
+    """Records the stage an author has reached, if the run is checkpointed"""
+    if checkpoint is not None:
+        checkpoint.mark(author_url, stage)
+
+
+def transform_and_load(raw_author_data: dict, conn: psycopg2.connect,
+                       log: logging.Logger, checkpoint: RunCheckpoint = None) -> None:
+    """Cleans an extracted author and uploads them to the database"""
+    author_url = raw_author_data['author_url']
+    mark_stage(checkpoint, author_url, EXTRACTED)
+    cleaned_author = clean_authors_info([raw_author_data], log)
+    mark_stage(checkpoint, author_url, TRANSFORMED)
+
+    load_to_database(
+        cleaned_author, conn, COLUMN_NAMES_IN_TABLES)
+    mark_stage(checkpoint, author_url, LOADED)
+    log.info("Successfully loaded data into the database.")
+
+
+def transform_and_load_paginated(raw_author_data: dict, conn: psycopg2.connect,
+                                 log: logging.Logger,
+                                 checkpoint: RunCheckpoint = None) -> bool:
+    """Cleans and uploads an author with their first page of books, then uploads
+    each following page of books as soon as it has been scraped. Returns False if
+    the author couldn't be cleaned. A later page that can't be scraped ends the
+    author's books there, and the author is still marked as loaded with the
+    pages before it"""
+    author_url = raw_author_data['author_url']
+    mark_stage(checkpoint, author_url, EXTRACTED)
+    books = iter(raw_author_data['books'])
+    raw_author_data['books'] = list(islice(books, extract.BOOK_LIST_PER_PAGE))
+    cleaned_author = clean_authors_info([raw_author_data], log)
+    if not cleaned_author:
+        log.error("Unable to clean data for %s.", author_url)
+        return False
+    mark_stage(checkpoint, author_url, TRANSFORMED)
+    load_to_database(cleaned_author, conn, COLUMN_NAMES_IN_TABLES)
+    books_loaded = len(cleaned_author[0]['books'])
+
+    author_id = cleaned_author[0]['author_id']
+    while True:
+        try:
+            raw_books = list(islice(books, extract.BOOK_LIST_PER_PAGE))
+        except ScrapingError as error:
+            log.error("Stopping %s's books after %s: %s", author_url, books_loaded, error)
+            break
+        if not raw_books:
+            break
+        cleaned_books = clean_books(raw_books, log)
+        load_books_to_database(cleaned_books, author_id, conn, COLUMN_NAMES_IN_TABLES)
+        books_loaded += len(cleaned_books)
+    mark_stage(checkpoint, author_url, LOADED)
+    log.info("Successfully loaded %s books into the database.", books_loaded)
+    return True
+
+
+def warn_if_unpaginated(mode: str, log: logging.Logger) -> bool:
+    """Logs a warning if BOOK_LIST_PAGINATED is on for a mode or parser that only
+    reads the first page of each author's book list, returning True if it did"""
+    if not extract.BOOK_LIST_PAGINATED:
+        return False
+    if mode in UNPAGINATED_MODES or PARSER_ENGINE == "lxml":
+        log.warning("BOOK_LIST_PAGINATED only applies to the serial mode with the soup "
+                    "parser, so the %s mode with the %s parser only reads the first "
+                    "page of each author's books", mode, PARSER_ENGINE)
+        return True
+    return False
+
+
+def extract_author(author_url: str) -> dict:
+    """Extracts an author with the parser chosen by PARSER_ENGINE"""
+    if PARSER_ENGINE == "lxml":
+        return fast_extract.get_author_data(author_url)
+    return get_author_data(author_url)
+
+
+def run_pipeline(author_url: str, conn: psycopg2.connect, log: logging.Logger,
+                 checkpoint: RunCheckpoint = None) -> bool:
+    """Runs main script where data is extracted, cleaned and uploaded to the database,
+    returning False if the author couldn't be scraped"""
     try:
-        raw_author_data = get_author_data(author_url)
+        raw_author_data = extract_author(author_url)
         log.info("Successfully extracted author data")
 
-        cleaned_author = clean_authors_info([raw_author_data], log)
-
-        load_to_database(
-            cleaned_author, conn, COLUMN_NAMES_IN_TABLES)
-        log.info("Successfully loaded data into the database.")
-    except ScrapingError as e:
+        if extract.BOOK_LIST_PAGINATED and PARSER_ENGINE != "lxml":
+            return transform_and_load_paginated(raw_author_data, conn, log, checkpoint)
+        transform_and_load(raw_author_data, conn, log, checkpoint)
+        return True
+    except ScrapingError:
         log.error(f"Unable to scrape data for {author_url}.")
+        return False
+
+
+def get_author_callbacks(conn: psycopg2.connect, log: logging.Logger,
+                         on_failure: Callable[[str], None] = None,
+                         scheduler: DeadlineScheduler = None,
+                         checkpoint: RunCheckpoint = None) -> tuple[Callable, Callable]:
+    """Returns the callbacks run as each concurrently extracted author finishes:
+    one that cleans and uploads the author, and one for an author that failed"""
+    def on_author(author: dict) -> None:
+        try:
+            transform_and_load(author, conn, log, checkpoint)
+        finally:
+            if scheduler is not None:
+                scheduler.finish(author['author_url'])
+
+    def on_author_failure(author_url: str) -> None:
+        if scheduler is not None:
+            scheduler.finish(author_url)
+        if on_failure is not None:
+            on_failure(author_url)
+
+    return on_author, on_author_failure
+
+
+def run_async_pipeline(author_urls: list[str], conn: psycopg2.connect,
+                       log: logging.Logger,
+                       on_failure: Callable[[str], None] = None,
+                       scheduler: DeadlineScheduler = None,
+                       checkpoint: RunCheckpoint = None) -> dict:
+    """Crawls all authors concurrently, cleaning and uploading
+    each author as soon as their crawl has finished. With a scheduler,
+    authors are only started while there is time left to finish them"""
+    on_author, on_author_failure = get_author_callbacks(conn, log, on_failure,
+                                                        scheduler, checkpoint)
+    stats = run_crawl(author_urls, on_author, log, on_failure=on_author_failure,
+                      admit=scheduler.admit if scheduler is not None else None)
+    log.info("Crawled %s authors (%s failed)",
+             stats['authors_crawled'], stats['authors_failed'])
+    return stats
+
+
+def run_parallel_pipeline(author_urls: list[str], conn: psycopg2.connect,
+                          log: logging.Logger,
+                          on_failure: Callable[[str], None] = None,
+                          scheduler: DeadlineScheduler = None,
+                          checkpoint: RunCheckpoint = None) -> dict:
+    """Fetches pages on threads and parses them on a process pool, cleaning and
+    uploading each author as soon as all of their pages have been parsed"""
+    on_author, on_author_failure = get_author_callbacks(conn, log, on_failure,
+                                                        scheduler, checkpoint)
+    stats = run_parse_pool(author_urls, on_author, log, on_failure=on_author_failure,
+                           admit=scheduler.admit if scheduler is not None else None)
+    log.info("Parse pool stats: %s", stats)
+    return stats
+
+
+def run_staged_pipeline(author_urls: list[str], conn: psycopg2.connect,
+                        log: logging.Logger,
+                        on_failure: Callable[[str], None] = None,
+                        scheduler: DeadlineScheduler = None,
+                        checkpoint: RunCheckpoint = None) -> dict:
+    """Scrapes, cleans and uploads authors in overlapping stages joined by bounded
+    queues, with a single loader thread uploading cleaned authors in batches.
+    Authors are checkpointed once their batch has been loaded. A failed batch is
+    only rolled back as a whole by the bulk and merge loaders, as the per row
+    loader commits as it goes"""
+    def on_loaded(author_url: str) -> None:
+        if scheduler is not None:
+            scheduler.finish(author_url)
+        mark_stage(checkpoint, author_url, LOADED)
+
+    def on_author_failure(author_url: str) -> None:
+        if scheduler is not None:
+            scheduler.finish(author_url)
+        if on_failure is not None:
+            on_failure(author_url)
+
+    def load(cleaned_authors: list[dict]) -> None:
+        try:
+            load_to_database(cleaned_authors, conn, COLUMN_NAMES_IN_TABLES)
+        except psycopg2.Error:
+            conn.rollback()
+            raise
+
+    stats = run_stages(author_urls, extract_author,
+                       lambda raw_authors: clean_authors_info(raw_authors, log),
+                       load, log, on_loaded=on_loaded, on_failure=on_author_failure,
+                       admit=scheduler.admit if scheduler is not None else None)
+    log.info("Staged pipeline stats: %s", stats)
+    return stats
+
+
+def run_scheduled_pipeline(author_urls: list[str], conn: psycopg2.connect,
+                           log: logging.Logger,
+                           scheduler: DeadlineScheduler = None,
+                           checkpoint: RunCheckpoint = None) -> list[str]:
+    """Runs the pipeline for each author in turn, only starting an author while the
+    scheduler has time left to finish them, and returns the authors that failed"""
+    failed_authors = []
+    for author_url in author_urls:
+        if scheduler is not None and not scheduler.admit(author_url):
+            continue
+        if not run_pipeline(author_url, conn, log, checkpoint):
+            failed_authors.append(author_url)
+        if scheduler is not None:
+            scheduler.finish(author_url)
+    return failed_authors
+
+
+def retry_deferred_authors(author_urls: list[str], conn: psycopg2.connect,
+                           log: logging.Logger,
+                           scheduler: DeadlineScheduler = None,
+                           checkpoint: RunCheckpoint = None) -> list[str]:
+    """Retries the authors that couldn't be scraped earlier in the run once each,
+    returning the urls of the authors that still failed"""
+    if not author_urls:
+        return []
+    log.info("Retrying %s deferred authors", len(author_urls))
+    still_failed = run_scheduled_pipeline(author_urls, conn, log, scheduler, checkpoint)
+    log.info("%s deferred authors retried, %s still failed",
+             len(author_urls), len(still_failed))
+    return still_failed
+
+
+def log_run_stats(log: logging.Logger) -> None:
+    """Logs the fetch statistics collected over the run"""
+    log.info("HTTP connection stats: %s", get_connection_stats())
+    if extract.PAGE_CACHE is not None:
+        log.info("Page cache stats: %s", extract.PAGE_CACHE.get_stats())
+    if extract.RATE_LIMITER is not None:
+        log.info("Rate limiter stats: %s", extract.RATE_LIMITER.get_stats())
+    if extract.RESILIENT_FETCHER is not None:
+        log.info("Fetch retry stats: %s", extract.RESILIENT_FETCHER.get_stats())
+    if extract.KNOWN_BOOKS is not None:
+        log.info("Incremental book stats: %s", extract.KNOWN_BOOKS.get_stats())
+    if extract.RUN_MEMO is not None:
+        log.info("Run memo stats: %s", extract.RUN_MEMO.get_stats())
+    if extract.can_stream_book_pages():
+        log.info("Book page stream stats: %s", fast_extract.get_stream_stats())
+
+
+def coordinate_run(conn: psycopg2.connect, log: logging.Logger, event: dict) -> dict:
+    """Splits the authors into shards that are run at once by local worker processes
+    or separate Lambda invocations, and gathers the stats from every shard"""
+    shard_count = int(event.get("shard_count", SHARD_COUNT))
+    backend = event.get("backend", SHARD_BACKEND)
+    run_id = event.get("run_id") or create_run_id()
+    start_run(conn, run_id)
+
+    shard_event = {"mode": event.get("shard_mode", "serial"), "run_id": run_id}
+    log.info("Dispatching %s shards of run %s to the %s backend", shard_count, run_id, backend)
+    responses = dispatch_shards(get_shard_events(shard_event, shard_count), backend, handler)
+    summary = summarise_shards(responses)
+    log.info("Shard stats: %s", summary)
+
+    if summary["shards_failed"] == 0 and not summary["continuations"]:
+        finish_run(conn, run_id)
+    return {"statusCode": 200 if summary["shards_failed"] == 0 else 500,
+            "stats": {"run_id": run_id, **summary}}
 
 
 def handler(event=None, context=None) -> dict:
@@ -59,11 +331,83 @@ def handler(event=None, context=None) -> dict:
             DB_NAME, DB_USERNAME, DB_PASSWORD, DB_HOST, DB_PORT)
         logger.info("Connected to database")
 
-        authors = get_author_urls(connection)
-        for author in authors:
-            run_pipeline(author, connection, logger)
+        event = event or {}
+        mode = event.get("mode", PIPELINE_MODE)
+        if PARTITION_MAINTENANCE and event.get("shard") is None:
+            run_partition_maintenance(connection, logger)
+        if mode == "replay":
+            replay_runs(connection, logger, event.get("run_ids"))
+            return {"statusCode": 200}
+        if mode == "coordinate":
+            return coordinate_run(connection, logger, event)
+
+        warn_if_unpaginated(mode, logger)
+        continuation = event.get("continuation") or {}
+        shard = {key: event.get(key, continuation.get(key))
+                 for key in ("shard", "shard_count")}
+        run_id = (event.get("run_id") or continuation.get("run_id")
+                  or get_interrupted_run_id(connection) or create_run_id())
+        start_run(connection, run_id)
+        checkpoint = RunCheckpoint(connection, run_id)
+        if continuation:
+            authors = continuation["author_urls"]
+        else:
+            authors = get_author_urls(connection, shard["shard"], shard["shard_count"])
+        authors = checkpoint.get_authors_to_run(authors)
+        logger.info("Running %s authors in run %s", len(authors), run_id)
+        scheduler = create_scheduler(context, continuation,
+                                     load_run_cost_history(connection))
+        if INCREMENTAL_BOOKS:
+            extract.KNOWN_BOOKS = load_known_books(connection, authors)
+        if extract.RUN_MEMO is not None:
+            extract.RUN_MEMO.clear()
+        if extract.RESILIENT_FETCHER is not None:
+            extract.RESILIENT_FETCHER.reset()
+
+        failed_authors = []
+        stage_stats = None
+        if mode == "async":
+            run_async_pipeline(authors, connection, logger, failed_authors.append,
+                               scheduler, checkpoint)
+        elif mode == "parallel":
+            run_parallel_pipeline(authors, connection, logger, failed_authors.append,
+                                  scheduler, checkpoint)
+        elif mode == "staged":
+            stage_stats = run_staged_pipeline(authors, connection, logger,
+                                              failed_authors.append, scheduler, checkpoint)
+        else:
+            failed_authors = run_scheduled_pipeline(authors, connection, logger,
+                                                    scheduler, checkpoint)
+        if extract.RESILIENT_FETCHER is not None:
+            failed_authors = retry_deferred_authors(failed_authors, connection, logger,
+                                                    scheduler, checkpoint)
+        log_run_stats(logger)
+        logger.info("Scheduler stats: %s", scheduler.get_stats())
+        scheduler.save_history()
+        save_run_costs(connection, run_id, scheduler.durations)
+        if extract.SNAPSHOT_STORE is not None:
+            extract.SNAPSHOT_STORE.write_manifest(run_id)
 
-        return {"statusCode": 200}
+        response = {"statusCode": 200,
+                    "stats": {"run_id": run_id, "authors": len(authors),
+                              "authors_finished": scheduler.get_stats()["authors_finished"],
+                              "authors_failed": len(failed_authors)}}
+        if extract.RUN_MEMO is not None:
+            response["stats"]["memo"] = extract.RUN_MEMO.get_stats()
+        if stage_stats is not None:
+            response["stats"].update({key: stage_stats[key]
+                                      for key in ("stages", "queues", "bottleneck")})
+        next_continuation = scheduler.get_continuation()
+        if next_continuation:
+            logger.info("Stopped before the deadline with %s authors left",
+                        len(next_continuation["author_urls"]))
+            next_continuation["run_id"] = run_id
+            if shard["shard"] is not None:
+                next_continuation.update(shard)
+            response["continuation"] = next_continuation
+        elif shard["shard"] is None:
+            finish_run(connection, run_id)
+        return response
 
     except Exception as e:
         logger.error("Error: %s", e)
@@ -0,0 +1,94 @@
+'''This module orders author refreshes by priority, so crawl capacity goes to the
+authors publishers actually follow. Each author is scored by their subscriber
+count, the time since their last measurement and how much their rating count
+has moved recently, and cold authors nobody subscribes to whose numbers haven't
+changed are only refreshed every few days.'''
+import os
+import math
+from datetime import datetime
+import pandas as pd
+import psycopg2
+from shard import get_shard_condition
+
+PRIORITY_SCHEDULING = os.environ.get('PRIORITY_SCHEDULING', 'false').lower() == 'true'
+COLD_REFRESH_DAYS = float(os.environ.get('COLD_REFRESH_DAYS', '7'))
+VOLATILITY_DAYS = int(os.environ.get('VOLATILITY_DAYS', '14'))
+COLD_VOLATILITY = 0.001
+NEVER_MEASURED_DAYS = 30
+SUBSCRIBER_WEIGHT = 1.0
+STALENESS_WEIGHT = 1.0
+VOLATILITY_WEIGHT = 100.0
+
+AUTHOR_PRIORITY_QUERY = '''
+SELECT a.author_id, a.author_url,
+    COALESCE(s.subscriber_count, 0) AS subscriber_count,
+    m.last_recorded,
+    COALESCE(m.volatility, 0) AS volatility
+FROM author AS a
+LEFT JOIN (
+    SELECT author_id, COUNT(*) AS subscriber_count
+    FROM author_assignment
+    GROUP BY author_id
+) AS s ON s.author_id = a.author_id
+LEFT JOIN (
+    SELECT author_id,
+        MAX(date_recorded) AS last_recorded,
+        (MAX(rating_count) FILTER (WHERE date_recorded >= NOW() - %(window)s * INTERVAL '1 day')
+         - MIN(rating_count) FILTER (WHERE date_recorded >= NOW() - %(window)s * INTERVAL '1 day'))::FLOAT
+        / NULLIF(MAX(rating_count) FILTER (
+            WHERE date_recorded >= NOW() - %(window)s * INTERVAL '1 day'), 0) AS volatility
+    FROM author_measurement
+    GROUP BY author_id
+) AS m ON m.author_id = a.author_id'''
+
+
+def get_days_since_measured(last_recorded, now: datetime) -> float:
+    '''Returns the days since an author was last measured,
+    treating an author that has never been measured as long overdue.'''
+    if pd.isna(last_recorded):
+        return NEVER_MEASURED_DAYS
+    return max((now - pd.Timestamp(last_recorded).to_pydatetime()).total_seconds(), 0) / 86400
+
+
+def is_cold(author: dict) -> bool:
+    '''An author is cold if no publisher subscribes to them and
+    their rating count has barely moved recently.'''
+    return author['subscriber_count'] == 0 and author['volatility'] < COLD_VOLATILITY
+
+
+def is_due(author: dict, now: datetime) -> bool:
+    '''Cold authors are refreshed every COLD_REFRESH_DAYS,
+    every other author on every run.'''
+    if not is_cold(author):
+        return True
+    return get_days_since_measured(author['last_recorded'], now) >= COLD_REFRESH_DAYS
+
+
+def score_author(author: dict, now: datetime) -> float:
+    '''Scores how much an author needs refreshing, higher first.'''
+    return (SUBSCRIBER_WEIGHT * math.log2(1 + author['subscriber_count'])
+            + STALENESS_WEIGHT * get_days_since_measured(author['last_recorded'], now)
+            + VOLATILITY_WEIGHT * author['volatility'])
+
+
+def get_author_priorities(conn: psycopg2.connect, shard: int = None,
+                          shard_count: int = None) -> list[dict]:
+    '''Returns each author's subscriber count, last measurement time and
+    recent volatility, for every author or just one shard.'''
+    query = AUTHOR_PRIORITY_QUERY
+    params = {'window': VOLATILITY_DAYS}
+    if shard is not None:
+        shard_condition, shard_params = get_shard_condition('a.author_id', shard, shard_count)
+        query += f'\nWHERE {shard_condition}'
+        params.update(shard_params)
+    return pd.read_sql(query, conn, params=params).to_dict(orient='records')
+
+
+def get_prioritised_author_urls(conn: psycopg2.connect, shard: int = None,
+                                shard_count: int = None, now: datetime = None) -> list[str]:
+    '''Returns the urls of the authors due a refresh, highest score first.'''
+    now = now or datetime.now()
+    authors = [author for author in get_author_priorities(conn, shard, shard_count)
+               if is_due(author, now)]
+    authors.sort(key=lambda author: score_author(author, now), reverse=True)
+    return [author['author_url'] for author in authors]
@@ -0,0 +1,190 @@
+'''This module limits how fast pages are requested from each host, with a token
+bucket for the request rate and AIMD (additive increase, multiplicative decrease)
+control of both the rate and the number of requests in flight. The limits grow
+while responses are healthy and halve on 429/5xx responses or latency spikes,
+so a crawl runs close to the fastest rate goodreads.com will accept.'''
+import os
+import time
+import threading
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Callable
+from urllib.parse import urlparse
+import requests
+
+RATE_LIMIT_RPS = os.environ.get('RATE_LIMIT_RPS')
+RATE_LIMIT_MAX_RPS = float(os.environ.get('RATE_LIMIT_MAX_RPS', '20'))
+RATE_LIMIT_MAX_IN_FLIGHT = int(os.environ.get('RATE_LIMIT_MAX_IN_FLIGHT', '32'))
+MIN_RATE = 0.2
+RATE_INCREASE = 0.1
+DECREASE_FACTOR = 0.5
+LATENCY_SPIKE_FACTOR = 3
+LATENCY_SMOOTHING = 0.2
+THROTTLE_STATUS_CODES = {429, 500, 502, 503, 504}
+
+
+def get_retry_after(retry_after: str) -> float:
+    '''Returns the seconds to wait from a Retry-After header,
+    which is either a number of seconds or an HTTP date.'''
+    if not retry_after:
+        return 0
+    try:
+        return max(float(retry_after), 0)
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(retry_after)
+    except (TypeError, ValueError):
+        return 0
+    if retry_at.tzinfo is None:
+        retry_at = retry_at.replace(tzinfo=timezone.utc)
+    return max((retry_at - datetime.now(timezone.utc)).total_seconds(), 0)
+
+
+class HostLimiter:
+    '''The token bucket and AIMD limits for a single host.'''
+
+    def __init__(self, rate: float, max_rate: float = RATE_LIMIT_MAX_RPS,
+                 max_in_flight: int = RATE_LIMIT_MAX_IN_FLIGHT):
+        self.rate = rate
+        self.max_rate = max_rate
+        self.max_in_flight = max_in_flight
+        self.concurrency = 1.0
+        self.in_flight = 0
+        self.tokens = 1.0
+        self.refilled_at = time.monotonic()
+        self.blocked_until = 0.0
+        self.decreased_at = 0.0
+        self.average_latency = None
+        self.stats = {'requests': 0, 'throttled': 0, 'latency_spikes': 0}
+        self._condition = threading.Condition()
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(self.tokens + (now - self.refilled_at) * self.rate,
+                          max(self.rate, 1.0))
+        self.refilled_at = now
+
+    def _get_wait(self, now: float) -> float:
+        '''Returns how long to wait before a request can be sent,
+        or None to wait until a request in flight finishes.'''
+        if now < self.blocked_until:
+            return self.blocked_until - now
+        if self.in_flight >= int(self.concurrency):
+            return None
+        if self.tokens < 1:
+            return (1 - self.tokens) / self.rate
+        return 0
+
+    def acquire(self) -> None:
+        '''Blocks until the rate and concurrency limits allow another request.'''
+        with self._condition:
+            while True:
+                now = time.monotonic()
+                self._refill(now)
+                wait = self._get_wait(now)
+                if wait is not None and wait <= 0:
+                    break
+                self._condition.wait(wait)
+            self.tokens -= 1
+            self.in_flight += 1
+
+    def release(self, status_code: int, latency: float, retry_after: str = None) -> None:
+        '''Records a finished request and adjusts the limits from its outcome.
+        A status_code of None means the request failed without a response.'''
+        with self._condition:
+            self.in_flight -= 1
+            self.stats['requests'] += 1
+            if status_code is None or status_code in THROTTLE_STATUS_CODES:
+                self.stats['throttled'] += 1
+                self.blocked_until = max(self.blocked_until,
+                                         time.monotonic() + get_retry_after(retry_after))
+                self._decrease()
+            elif self._is_latency_spike(latency):
+                self.stats['latency_spikes'] += 1
+                self._decrease()
+            else:
+                self._increase(latency)
+            self._condition.notify_all()
+
+    def _is_latency_spike(self, latency: float) -> bool:
+        return (self.average_latency is not None
+                and latency > self.average_latency * LATENCY_SPIKE_FACTOR)
+
+    def _increase(self, latency: float) -> None:
+        '''Additive increase, about one more request in flight per round of
+        healthy responses and RATE_INCREASE more requests a second per response.'''
+        if self.average_latency is None:
+            self.average_latency = latency
+        else:
+            self.average_latency += LATENCY_SMOOTHING * (latency - self.average_latency)
+        self.concurrency = min(self.concurrency + 1 / self.concurrency,
+                               float(self.max_in_flight))
+        self.rate = min(self.rate + RATE_INCREASE, self.max_rate)
+
+    def _decrease(self) -> None:
+        '''Multiplicative decrease, at most once per average latency so a burst
+        of failures from requests already in flight only counts once.'''
+        now = time.monotonic()
+        if now - self.decreased_at < (self.average_latency or 1.0):
+            return
+        self.decreased_at = now
+        self.concurrency = max(self.concurrency * DECREASE_FACTOR, 1.0)
+        self.rate = max(self.rate * DECREASE_FACTOR, MIN_RATE)
+
+    def get_stats(self) -> dict:
+        '''Returns the current limits and counts for the host.'''
+        with self._condition:
+            return {'rate': round(self.rate, 2),
+                    'concurrency_limit': int(self.concurrency),
+                    'in_flight': self.in_flight,
+                    **self.stats}
+
+
+class RateLimiter:
+    '''Keeps a HostLimiter for each host that pages are requested from.'''
+
+    def __init__(self, rate: float, max_rate: float = RATE_LIMIT_MAX_RPS,
+                 max_in_flight: int = RATE_LIMIT_MAX_IN_FLIGHT):
+        self.rate = rate
+        self.max_rate = max_rate
+        self.max_in_flight = max_in_flight
+        self.hosts = {}
+        self._lock = threading.Lock()
+
+    def get_host_limiter(self, url: str) -> HostLimiter:
+        '''Returns the limiter for the url's host, creating it on first use.'''
+        host = urlparse(url).netloc
+        with self._lock:
+            if host not in self.hosts:
+                self.hosts[host] = HostLimiter(self.rate, self.max_rate,
+                                               self.max_in_flight)
+            return self.hosts[host]
+
+    def fetch(self, url: str, send: Callable[[], requests.Response]) -> requests.Response:
+        '''Sends a request once the host's limits allow it,
+        then feeds its status and latency back into the limits.'''
+        host_limiter = self.get_host_limiter(url)
+        host_limiter.acquire()
+        start_time = time.monotonic()
+        try:
+            response = send()
+        except requests.RequestException:
+            host_limiter.release(None, time.monotonic() - start_time)
+            raise
+        host_limiter.release(response.status_code, time.monotonic() - start_time,
+                             response.headers.get('Retry-After'))
+        return response
+
+    def get_stats(self) -> dict:
+        '''Returns the current limits and counts for every host.'''
+        with self._lock:
+            hosts = dict(self.hosts)
+        return {host: host_limiter.get_stats() for host, host_limiter in hosts.items()}
+
+
+def load_rate_limiter() -> RateLimiter:
+    '''Returns the rate limiter configured by RATE_LIMIT_RPS,
+    or None if rate limiting hasn't been turned on.'''
+    if not RATE_LIMIT_RPS:
+        return None
+    return RateLimiter(float(RATE_LIMIT_RPS))
@@ -0,0 +1,102 @@
+'''This module replays runs stored in the snapshot store through extract, transform
+and load without touching the network, so history can be backfilled quickly
+after transform.py or load.py change.'''
+import os
+import logging
+from urllib.parse import urlparse
+from concurrent.futures import ProcessPoolExecutor
+import psycopg2
+import extract
+from extract import get_author_data, ScrapingError
+from transform import clean_authors_info
+from load import load_to_database, COLUMN_NAMES_IN_TABLES
+from snapshot_store import SnapshotStore, SNAPSHOT_DIR
+from partitions import PARTITION_MAINTENANCE, create_partitions_for_dates
+
+REPLAY_WORKERS = int(os.environ.get('REPLAY_WORKERS', str(os.cpu_count() or 1)))
+AUTHOR_PAGE_PATH = '/author/show/'
+
+_REPLAY_STORES = {}
+
+
+def get_replayed_author_urls(manifest: dict) -> list[str]:
+    '''Returns the author page urls fetched in a stored run.'''
+    return [url for url in manifest['pages']
+            if urlparse(url).path.startswith(AUTHOR_PAGE_PATH)]
+
+
+def use_replayed_run(snapshot_dir: str, run_id: str) -> None:
+    '''Points extract.py at a stored run in this process.'''
+    if (snapshot_dir, run_id) not in _REPLAY_STORES:
+        store = SnapshotStore(snapshot_dir)
+        store.start_replay(run_id)
+        _REPLAY_STORES[(snapshot_dir, run_id)] = store
+    extract.SNAPSHOT_STORE = _REPLAY_STORES[(snapshot_dir, run_id)]
+
+
+def replay_author(snapshot_dir: str, run_id: str, author_url: str) -> list[dict]:
+    '''Extracts and cleans a single author from a stored run,
+    returning an empty list if the run doesn't have all of their pages.'''
+    log = logging.getLogger()
+    use_replayed_run(snapshot_dir, run_id)
+    try:
+        return clean_authors_info([get_author_data(author_url)], log)
+    except ScrapingError as error:
+        log.error("Unable to replay %s from run %s: %s", author_url, run_id, error)
+        return []
+
+
+def get_column_names_with_date_recorded(column_names: dict) -> dict:
+    '''Adds date_recorded to the measurement columns, so replayed
+    measurements keep the date of the run they came from.'''
+    replay_column_names = dict(column_names)
+    for table_name in ('author_measurement', 'book_measurement'):
+        replay_column_names[table_name] = column_names[table_name] + [
+            'date_recorded']
+    return replay_column_names
+
+
+def set_date_recorded(author: dict, date_recorded: str) -> None:
+    '''Sets the date recorded for an author and all of their books.'''
+    author['date_recorded'] = date_recorded
+    for book in author['books']:
+        book['date_recorded'] = date_recorded
+
+
+def replay_runs(conn: psycopg2.connect, log: logging.Logger, run_ids: list[str] = None,
+                snapshot_dir: str = SNAPSHOT_DIR, workers: int = None) -> dict:
+    '''Replays the given stored runs (every stored run by default) oldest first.
+    Authors are extracted and cleaned across a process pool, then loaded here.'''
+    if not snapshot_dir:
+        raise ValueError("SNAPSHOT_DIR must be set to replay stored runs")
+
+    store = SnapshotStore(snapshot_dir)
+    tasks, recorded_at = [], {}
+    for run_id in run_ids or store.list_runs():
+        manifest = store.read_manifest(run_id)
+        recorded_at[run_id] = manifest['recorded_at']
+        tasks.extend((run_id, author_url)
+                     for author_url in get_replayed_author_urls(manifest))
+
+    if PARTITION_MAINTENANCE and recorded_at:
+        # Replayed measurements keep their date, which may be in a month with no partition
+        create_partitions_for_dates(conn, list(recorded_at.values()))
+    column_names = get_column_names_with_date_recorded(COLUMN_NAMES_IN_TABLES)
+    stats = {'runs_replayed': len(recorded_at), 'authors_loaded': 0, 'authors_failed': 0}
+    with ProcessPoolExecutor(max_workers=workers or REPLAY_WORKERS) as executor:
+        replayed_authors = executor.map(
+            replay_author, [snapshot_dir] * len(tasks),
+            [run_id for run_id, _ in tasks], [author_url for _, author_url in tasks])
+
+        for (run_id, _), cleaned_authors in zip(tasks, replayed_authors):
+            if not cleaned_authors:
+                stats['authors_failed'] += 1
+                continue
+            for author in cleaned_authors:
+                set_date_recorded(author, recorded_at[run_id])
+            load_to_database(cleaned_authors, conn, column_names, replace_measurements=True)
+            stats['authors_loaded'] += 1
+
+    log.info("Replayed %s runs: %s authors loaded, %s failed", stats['runs_replayed'],
+             stats['authors_loaded'], stats['authors_failed'])
+    return stats
@@ -0,0 +1,177 @@
+'''This module retries failed page fetches with jittered exponential backoff, limits
+the retries spent over a whole run, and keeps a circuit breaker for each host so
+fetches fail fast while goodreads.com is erroring instead of each waiting out its
+full timeout.'''
+import os
+import time
+import random
+import threading
+from collections import deque
+from typing import Callable
+from urllib.parse import urlparse
+import requests
+
+FETCH_MAX_RETRIES = os.environ.get('FETCH_MAX_RETRIES')
+FETCH_RETRY_BUDGET = int(os.environ.get('FETCH_RETRY_BUDGET', '100'))
+BACKOFF_BASE = float(os.environ.get('FETCH_BACKOFF_BASE', '0.5'))
+BACKOFF_MAX = float(os.environ.get('FETCH_BACKOFF_MAX', '8'))
+CIRCUIT_ERROR_RATE = float(os.environ.get('CIRCUIT_ERROR_RATE', '0.5'))
+CIRCUIT_WINDOW = int(os.environ.get('CIRCUIT_WINDOW', '20'))
+CIRCUIT_MIN_REQUESTS = int(os.environ.get('CIRCUIT_MIN_REQUESTS', '10'))
+CIRCUIT_COOLDOWN = float(os.environ.get('CIRCUIT_COOLDOWN', '30'))
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+
+
+class CircuitOpenError(requests.RequestException):
+    '''Raised instead of sending a request while a host's circuit is open.'''
+
+
+def get_backoff(attempt: int, base: float = BACKOFF_BASE,
+                maximum: float = BACKOFF_MAX) -> float:
+    '''Returns a random wait of up to base * 2^attempt seconds, capped at maximum,
+    so retries from many threads don't all land at the same time.'''
+    return random.uniform(0, min(maximum, base * 2 ** attempt))
+
+
+class CircuitBreaker:
+    '''Tracks the outcome of a host's most recent requests. The circuit opens once
+    the error rate over the window crosses error_rate, and after cooldown seconds
+    lets a single trial request through to decide whether to close again.'''
+
+    def __init__(self, error_rate: float = CIRCUIT_ERROR_RATE, window: int = CIRCUIT_WINDOW,
+                 min_requests: int = CIRCUIT_MIN_REQUESTS, cooldown: float = CIRCUIT_COOLDOWN):
+        self.error_rate = error_rate
+        self.min_requests = min_requests
+        self.cooldown = cooldown
+        self.outcomes = deque(maxlen=window)
+        self.opened_at = None
+        self.trial_in_flight = False
+        self.times_opened = 0
+        self._lock = threading.Lock()
+
+    @property
+    def is_open(self) -> bool:
+        '''True while requests to the host are being failed fast.'''
+        return self.opened_at is not None
+
+    def allow(self) -> bool:
+        '''Checks whether a request can be sent to the host right now.'''
+        with self._lock:
+            if self.opened_at is None:
+                return True
+            if self.trial_in_flight or time.monotonic() - self.opened_at < self.cooldown:
+                return False
+            self.trial_in_flight = True
+            return True
+
+    def record(self, succeeded: bool) -> None:
+        '''Records the outcome of a request, opening or closing the circuit.'''
+        with self._lock:
+            if self.opened_at is not None:
+                self.trial_in_flight = False
+                if succeeded:
+                    self.opened_at = None
+                    self.outcomes.clear()
+                else:
+                    self.opened_at = time.monotonic()
+                return
+
+            self.outcomes.append(succeeded)
+            failures = self.outcomes.count(False)
+            if (len(self.outcomes) >= self.min_requests
+                    and failures / len(self.outcomes) >= self.error_rate):
+                self.opened_at = time.monotonic()
+                self.times_opened += 1
+
+
+class ResilientFetcher:
+    '''Retries fetches that fail or come back with a 429/5xx status, while the
+    run's retry budget lasts and the host's circuit is closed.'''
+
+    def __init__(self, max_retries: int, retry_budget: int = FETCH_RETRY_BUDGET,
+                 sleep: Callable[[float], None] = time.sleep):
+        self.max_retries = max_retries
+        self.run_retry_budget = retry_budget
+        self.retry_budget = retry_budget
+        self.sleep = sleep
+        self.breakers = {}
+        self.stats = {'retries': 0, 'failed_fast': 0, 'budget_exhausted': 0}
+        self._lock = threading.Lock()
+
+    def reset(self) -> None:
+        '''Refills the retry budget and forgets every circuit and counter, ready for
+        the next run, as a warm Lambda container keeps the fetcher between runs.'''
+        with self._lock:
+            self.retry_budget = self.run_retry_budget
+            self.breakers = {}
+            self.stats = {'retries': 0, 'failed_fast': 0, 'budget_exhausted': 0}
+
+    def get_breaker(self, url: str) -> CircuitBreaker:
+        '''Returns the circuit breaker for the url's host, creating it on first use.'''
+        host = urlparse(url).netloc
+        with self._lock:
+            if host not in self.breakers:
+                self.breakers[host] = CircuitBreaker()
+            return self.breakers[host]
+
+    def _count(self, stat: str) -> None:
+        with self._lock:
+            self.stats[stat] += 1
+
+    def _spend_retry(self) -> bool:
+        '''Takes a retry from the run's budget, if any are left.'''
+        with self._lock:
+            if self.retry_budget <= 0:
+                self.stats['budget_exhausted'] += 1
+                return False
+            self.retry_budget -= 1
+            self.stats['retries'] += 1
+            return True
+
+    def fetch(self, url: str, send: Callable[[], requests.Response]) -> requests.Response:
+        '''Sends a request, retrying it with backoff if it fails. The last failed
+        response is returned as is, and the last request error is raised.'''
+        breaker = self.get_breaker(url)
+        attempt = 0
+        while True:
+            if not breaker.allow():
+                self._count('failed_fast')
+                raise CircuitOpenError(f"Circuit open for {urlparse(url).netloc}")
+            try:
+                response = send()
+                succeeded = response.status_code not in RETRY_STATUS_CODES
+                error = None
+            except requests.RequestException as request_error:
+                response, succeeded, error = None, False, request_error
+            breaker.record(succeeded)
+
+            if succeeded:
+                return response
+            if attempt >= self.max_retries or not self._spend_retry():
+                if error is not None:
+                    raise error
+                return response
+            if response is not None:
+                response.close()
+            self.sleep(get_backoff(attempt))
+            attempt += 1
+
+    def get_stats(self) -> dict:
+        '''Returns the retries used, the requests failed fast by an open circuit,
+        and the hosts whose circuit is open right now.'''
+        with self._lock:
+            stats = dict(self.stats)
+            breakers = dict(self.breakers)
+        stats['retry_budget_left'] = self.retry_budget
+        stats['open_circuits'] = [host for host, breaker in breakers.items()
+                                  if breaker.is_open]
+        stats['circuits_opened'] = sum(breaker.times_opened for breaker in breakers.values())
+        return stats
+
+
+def load_resilient_fetcher() -> ResilientFetcher:
+    '''Returns the fetcher configured by FETCH_MAX_RETRIES,
+    or None if retries haven't been turned on.'''
+    if not FETCH_MAX_RETRIES:
+        return None
+    return ResilientFetcher(int(FETCH_MAX_RETRIES))
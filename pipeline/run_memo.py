@@ -0,0 +1,115 @@
+'''This module memoises parsed pages for the length of a run, so a book that
+appears in several authors' lists (co-authored books, omnibus editions) is only
+fetched and parsed once. Results are keyed by a normalised url, so the same page
+reached through links with different slugs or tracking parameters is shared.'''
+import os
+import re
+import threading
+from collections import OrderedDict
+from typing import Callable
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+
+RUN_MEMO = os.environ.get('RUN_MEMO', 'false').lower() == 'true'
+RUN_MEMO_MAX_ENTRIES = int(os.environ.get('RUN_MEMO_MAX_ENTRIES', '4096'))
+IGNORED_QUERY_PARAMETERS = {'from_search', 'from_srp', 'qid', 'rank', 'ref', 'ac'}
+SHOW_PATH_PATTERN = re.compile(r'^/(author|book)/show/(\d+)')
+
+
+def normalise_url(url: str) -> str:
+    '''Returns the url in a canonical form: lower case host, no fragment or
+    tracking parameters, and author and book pages reduced to their goodreads id.'''
+    parts = urlsplit(url.strip())
+    path = parts.path.rstrip('/') or '/'
+    show_path = SHOW_PATH_PATTERN.match(path)
+    if show_path:
+        path = f'/{show_path.group(1)}/show/{show_path.group(2)}'
+    query = sorted((key, value) for key, value in parse_qsl(parts.query)
+                   if key not in IGNORED_QUERY_PARAMETERS)
+    return urlunsplit((parts.scheme.lower(), parts.netloc.lower(), path,
+                       urlencode(query), ''))
+
+
+class RunMemo:
+    '''A bounded, least recently used memo of parsed page results. Concurrent
+    lookups of the same page wait for the first one instead of fetching it again,
+    and failures aren't memoised so the page is tried again next time.'''
+
+    def __init__(self, max_entries: int = RUN_MEMO_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._in_flight = {}
+        self._stats = {}
+        self._lock = threading.Lock()
+
+    def _count(self, kind: str, stat: str) -> None:
+        kind_stats = self._stats.setdefault(
+            kind, {'hits': 0, 'misses': 0, 'evictions': 0})
+        kind_stats[stat] += 1
+
+    def get(self, kind: str, url: str, parse: Callable[[], dict]) -> dict:
+        '''Returns the memoised result of a page, or parses it and remembers it.'''
+        key = (kind, normalise_url(url))
+        while True:
+            with self._lock:
+                if key in self._entries:
+                    self._entries.move_to_end(key)
+                    self._count(kind, 'hits')
+                    return self._entries[key]
+                in_flight = self._in_flight.get(key)
+                if in_flight is None:
+                    in_flight = self._in_flight[key] = threading.Event()
+                    self._count(kind, 'misses')
+                    break
+            in_flight.wait()
+
+        try:
+            result = parse()
+            self.put(kind, url, result)
+            return result
+        finally:
+            with self._lock:
+                self._in_flight.pop(key).set()
+
+    def peek(self, kind: str, url: str) -> dict:
+        '''Returns the memoised result of a page, or None without waiting or parsing,
+        for callers that fetch and parse pages themselves and put the result after.'''
+        key = (kind, normalise_url(url))
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self._count(kind, 'hits')
+                return self._entries[key]
+            self._count(kind, 'misses')
+            return None
+
+    def put(self, kind: str, url: str, result: dict) -> None:
+        '''Remembers the parsed result of a page, evicting the least recently used.'''
+        with self._lock:
+            self._entries[(kind, normalise_url(url))] = result
+            while len(self._entries) > self.max_entries:
+                evicted_kind, _ = self._entries.popitem(last=False)[0]
+                self._count(evicted_kind, 'evictions')
+
+    def clear(self) -> None:
+        '''Forgets every result and counter, ready for the next run.'''
+        with self._lock:
+            self._entries.clear()
+            self._stats.clear()
+
+    def get_stats(self) -> dict:
+        '''Returns the hit, miss and eviction counts and the hit rate of each kind of page.'''
+        with self._lock:
+            stats = {}
+            for kind, kind_stats in self._stats.items():
+                lookups = kind_stats['hits'] + kind_stats['misses']
+                stats[kind] = {**kind_stats,
+                               'hit_rate': round(kind_stats['hits'] / lookups, 3)
+                               if lookups else 0.0}
+            return stats
+
+
+def load_run_memo() -> RunMemo:
+    '''Returns the run memo if RUN_MEMO is on, otherwise None.'''
+    if not RUN_MEMO:
+        return None
+    return RunMemo(RUN_MEMO_MAX_ENTRIES)
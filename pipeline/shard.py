@@ -0,0 +1,79 @@
+'''This module splits the author list into shards by author_id, so a run can be
+fanned out across worker processes or separate Lambda invocations, and gathers
+the stats returned by every shard.'''
+import os
+import json
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Callable
+
+SHARD_COUNT = int(os.environ.get('SHARD_COUNT', '4'))
+SHARD_BACKEND = os.environ.get('SHARD_BACKEND', 'local')
+SHARD_FUNCTION_NAME = os.environ.get('SHARD_FUNCTION_NAME')
+SHARD_BACKENDS = ('local', 'lambda')
+
+
+def get_shard_condition(author_id_column: str, shard: int,
+                        shard_count: int) -> tuple[str, dict]:
+    '''Returns the SQL condition keeping only one shard's authors, by their id in
+    author_id_column, and its parameters. An author's shard never changes between runs.'''
+    return (f'MOD({author_id_column}, %(shard_count)s) = %(shard)s',
+            {'shard': int(shard), 'shard_count': int(shard_count)})
+
+
+def get_shard_events(base_event: dict, shard_count: int) -> list[dict]:
+    '''Returns the handler event for every shard.'''
+    return [{**base_event, 'shard': shard, 'shard_count': shard_count}
+            for shard in range(shard_count)]
+
+
+def run_local_shards(events: list[dict], worker: Callable[[dict], dict]) -> list[dict]:
+    '''Runs every shard in its own worker process on this machine.'''
+    with ProcessPoolExecutor(max_workers=len(events)) as executor:
+        return list(executor.map(worker, events))
+
+
+def invoke_lambda_shard(event: dict, function_name: str = None) -> dict:
+    '''Runs a shard in a separate invocation of the pipeline Lambda
+    and returns its response.'''
+    import boto3  # pylint: disable=import-outside-toplevel
+    client = boto3.client('lambda')
+    response = client.invoke(FunctionName=function_name or SHARD_FUNCTION_NAME,
+                             InvocationType='RequestResponse',
+                             Payload=json.dumps(event).encode('utf-8'))
+    return json.loads(response['Payload'].read())
+
+
+def run_lambda_shards(events: list[dict], function_name: str = None) -> list[dict]:
+    '''Invokes every shard at once and waits for all of them to finish.'''
+    if not (function_name or SHARD_FUNCTION_NAME):
+        raise ValueError("SHARD_FUNCTION_NAME must be set to run shards on Lambda")
+    with ThreadPoolExecutor(max_workers=len(events)) as executor:
+        return list(executor.map(lambda event: invoke_lambda_shard(event, function_name),
+                                 events))
+
+
+def dispatch_shards(events: list[dict], backend: str,
+                    worker: Callable[[dict], dict]) -> list[dict]:
+    '''Runs every shard on the given backend, returning their responses in shard order.
+    worker runs a shard in a local process, so it must be a module level function.'''
+    if backend == 'local':
+        return run_local_shards(events, worker)
+    if backend == 'lambda':
+        return run_lambda_shards(events)
+    raise ValueError(f"Unknown shard backend {backend!r}, expected one of {SHARD_BACKENDS}")
+
+
+def summarise_shards(responses: list[dict]) -> dict:
+    '''Adds up the stats returned by every shard.'''
+    summary = {'shards': len(responses), 'shards_failed': 0, 'authors': 0,
+               'authors_finished': 0, 'authors_failed': 0, 'continuations': []}
+    for response in responses:
+        if response.get('statusCode') != 200:
+            summary['shards_failed'] += 1
+            continue
+        stats = response.get('stats', {})
+        for stat in ('authors', 'authors_finished', 'authors_failed'):
+            summary[stat] += stats.get(stat, 0)
+        if response.get('continuation'):
+            summary['continuations'].append(response['continuation'])
+    return summary
@@ -0,0 +1,105 @@
+'''This module stores the raw html of every fetched page as content-addressed,
+gzip-compressed snapshots, so past runs can be replayed without scraping again.'''
+import os
+import gzip
+import json
+import hashlib
+import threading
+from datetime import datetime
+
+SNAPSHOT_DIR = os.environ.get('SNAPSHOT_DIR')
+
+
+def get_digest(html: str) -> str:
+    '''Returns the content address of a page's html.'''
+    return hashlib.sha256(html.encode('utf-8')).hexdigest()
+
+
+class SnapshotStore:
+    '''Snapshots are kept in objects/ by digest, and each run writes a manifest
+    in runs/ mapping the urls it fetched to the digest of their html.'''
+
+    def __init__(self, root_dir: str):
+        self.root_dir = root_dir
+        self.run_pages = {}
+        self.replay_pages = None
+        self._lock = threading.Lock()
+        os.makedirs(os.path.join(root_dir, 'objects'), exist_ok=True)
+        os.makedirs(os.path.join(root_dir, 'runs'), exist_ok=True)
+
+    def _object_path(self, digest: str) -> str:
+        return os.path.join(self.root_dir, 'objects', digest[:2], f'{digest}.html.gz')
+
+    def _manifest_path(self, run_id: str) -> str:
+        return os.path.join(self.root_dir, 'runs', f'{run_id}.json')
+
+    @property
+    def replaying(self) -> bool:
+        '''True when pages are being served from a stored run.'''
+        return self.replay_pages is not None
+
+    def save(self, url: str, html: str) -> str:
+        '''Stores the html for a page fetched in this run, only writing
+        the snapshot if the same html hasn't been stored before.'''
+        digest = get_digest(html)
+        path = self._object_path(digest)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            temp_path = f'{path}.{threading.get_ident()}.tmp'
+            with gzip.open(temp_path, 'wt', encoding='utf-8') as snapshot:
+                snapshot.write(html)
+            os.replace(temp_path, path)
+        with self._lock:
+            self.run_pages[url] = digest
+        return digest
+
+    def load(self, digest: str) -> str:
+        '''Returns the html stored under a digest.'''
+        with gzip.open(self._object_path(digest), 'rt', encoding='utf-8') as snapshot:
+            return snapshot.read()
+
+    def write_manifest(self, run_id: str) -> str:
+        '''Writes the pages fetched in this run to the run's manifest, adding
+        to the pages already there if the run is being resumed.'''
+        with self._lock:
+            manifest = {'run_id': run_id,
+                        'recorded_at': datetime.now().isoformat(),
+                        'pages': dict(self.run_pages)}
+            self.run_pages = {}
+        if os.path.exists(self._manifest_path(run_id)):
+            previous_manifest = self.read_manifest(run_id)
+            manifest['recorded_at'] = previous_manifest['recorded_at']
+            manifest['pages'] = {**previous_manifest['pages'], **manifest['pages']}
+        with open(self._manifest_path(run_id), 'w', encoding='utf-8') as manifest_file:
+            json.dump(manifest, manifest_file)
+        return self._manifest_path(run_id)
+
+    def read_manifest(self, run_id: str) -> dict:
+        '''Returns the manifest of a stored run.'''
+        with open(self._manifest_path(run_id), 'r', encoding='utf-8') as manifest_file:
+            return json.load(manifest_file)
+
+    def list_runs(self) -> list[str]:
+        '''Returns the ids of every stored run, oldest first.'''
+        run_files = os.listdir(os.path.join(self.root_dir, 'runs'))
+        return sorted(file_name[:-5] for file_name in run_files
+                      if file_name.endswith('.json'))
+
+    def start_replay(self, run_id: str) -> dict:
+        '''Serves pages from a stored run instead of the network.'''
+        manifest = self.read_manifest(run_id)
+        self.replay_pages = manifest['pages']
+        return manifest
+
+    def replay(self, url: str) -> str:
+        '''Returns a page's html from the run being replayed,
+        raising a KeyError if the run never fetched the url.'''
+        return self.load(self.replay_pages[url])
+
+
+def load_snapshot_store() -> SnapshotStore:
+    '''Returns the snapshot store configured by SNAPSHOT_DIR,
+    or None if snapshots haven't been turned on.'''
+    if not SNAPSHOT_DIR:
+        return None
+    return SnapshotStore(SNAPSHOT_DIR)
@@ -0,0 +1,265 @@
+'''This module overlaps extract, transform and load, so the database isn't idle
+while authors are scraped and the network isn't idle while they are loaded.
+Scraper threads put raw authors on a bounded queue, a transform thread cleans
+them onto a second bounded queue, and a single loader thread uploads them in
+batches. Each stage records its throughput and each queue its depth, so the
+stage holding the run back can be seen in the run stats.'''
+import os
+import time
+import queue
+import logging
+import threading
+from typing import Callable
+
+STAGED_SCRAPERS = int(os.environ.get('STAGED_SCRAPERS', '4'))
+STAGED_QUEUE_SIZE = int(os.environ.get('STAGED_QUEUE_SIZE', '8'))
+LOAD_BATCH_SIZE = int(os.environ.get('LOAD_BATCH_SIZE', '10'))
+LOAD_BATCH_SECONDS = float(os.environ.get('LOAD_BATCH_SECONDS', '2'))
+DONE = object()
+
+
+class MeasuredQueue(queue.Queue):
+    '''A queue that records its depth and how long producers were held back
+    by it being full and consumers were kept waiting by it being empty.'''
+
+    def __init__(self, maxsize: int = 0):
+        super().__init__(maxsize)
+        self.metrics = {'puts': 0, 'max_depth': 0, 'total_depth': 0,
+                        'put_wait_seconds': 0.0, 'get_wait_seconds': 0.0}
+        self._metrics_lock = threading.Lock()
+
+    def put(self, item, block: bool = True, timeout: float = None) -> None:
+        started = time.monotonic()
+        super().put(item, block, timeout)
+        depth = self.qsize()
+        with self._metrics_lock:
+            self.metrics['puts'] += 1
+            self.metrics['max_depth'] = max(self.metrics['max_depth'], depth)
+            self.metrics['total_depth'] += depth
+            self.metrics['put_wait_seconds'] += time.monotonic() - started
+
+    def get(self, block: bool = True, timeout: float = None):
+        started = time.monotonic()
+        try:
+            return super().get(block, timeout)
+        finally:
+            with self._metrics_lock:
+                self.metrics['get_wait_seconds'] += time.monotonic() - started
+
+    def get_stats(self) -> dict:
+        '''Returns the largest and average depth seen on each put,
+        and the time spent waiting to put and to get.'''
+        with self._metrics_lock:
+            metrics = dict(self.metrics)
+        return {'max_depth': metrics['max_depth'],
+                'average_depth': round(metrics['total_depth'] / metrics['puts'], 2)
+                if metrics['puts'] else 0.0,
+                'put_wait_seconds': round(metrics['put_wait_seconds'], 3),
+                'get_wait_seconds': round(metrics['get_wait_seconds'], 3)}
+
+
+class StageMetrics:
+    '''Counts the authors a stage has handled and the time its workers were busy.'''
+
+    def __init__(self, workers: int = 1):
+        self.workers = workers
+        self.authors = 0
+        self.busy_seconds = 0.0
+        self._lock = threading.Lock()
+
+    def record(self, started: float, authors: int = 1) -> None:
+        '''Records authors handled since started, a time.monotonic() value.'''
+        with self._lock:
+            self.authors += authors
+            self.busy_seconds += time.monotonic() - started
+
+    def get_stats(self, elapsed_seconds: float) -> dict:
+        '''Returns the authors handled, the authors per busy second and the
+        share of the run the stage's workers were busy for.'''
+        with self._lock:
+            authors, busy_seconds = self.authors, self.busy_seconds
+        return {'authors': authors,
+                'busy_seconds': round(busy_seconds, 3),
+                'authors_per_second': round(authors * self.workers / busy_seconds, 2)
+                if busy_seconds else 0.0,
+                'utilisation': round(busy_seconds / (elapsed_seconds * self.workers), 3)
+                if elapsed_seconds else 0.0}
+
+
+def scrape_authors(author_queue: queue.Queue, raw_queue: MeasuredQueue,
+                   extract_author: Callable[[str], dict], metrics: StageMetrics,
+                   log: logging.Logger, admit: Callable[[str], bool] = None) -> None:
+    '''Scrapes authors until the author queue is empty, putting each raw author on
+    the raw queue, or None in its place if they couldn't be scraped.'''
+    while True:
+        try:
+            author_url = author_queue.get_nowait()
+        except queue.Empty:
+            return
+        if admit is not None and not admit(author_url):
+            continue
+        started = time.monotonic()
+        try:
+            raw_author = extract_author(author_url)
+        except Exception as error:
+            log.error("Unable to scrape data for %s: %s", author_url, error)
+            raw_author = None
+        metrics.record(started)
+        raw_queue.put((author_url, raw_author))
+
+
+def transform_authors(raw_queue: MeasuredQueue, clean_queue: MeasuredQueue,
+                      clean: Callable[[list[dict]], list[dict]], metrics: StageMetrics,
+                      log: logging.Logger) -> None:
+    '''Cleans each raw author onto the clean queue until the scrapers are done.'''
+    while True:
+        item = raw_queue.get()
+        if item is DONE:
+            clean_queue.put(DONE)
+            return
+        author_url, raw_author = item
+        cleaned_author = None
+        if raw_author is not None:
+            started = time.monotonic()
+            try:
+                cleaned_author = clean([raw_author])
+            except Exception as error:
+                log.error("Unable to clean data for %s: %s", author_url, error)
+            metrics.record(started)
+        clean_queue.put((author_url, cleaned_author))
+
+
+def load_authors(clean_queue: MeasuredQueue, load: Callable[[list[dict]], None],
+                 metrics: StageMetrics, log: logging.Logger,
+                 on_loaded: Callable[[str], None], on_failure: Callable[[str], None],
+                 batch_size: int, batch_seconds: float) -> int:
+    '''Uploads cleaned authors in batches of up to batch_size, or whatever has
+    arrived batch_seconds after the first author of the batch, returning the
+    number of batches. Runs every callback on this thread. If loading raises
+    something other than an Exception, such as the SystemExit of the per row
+    loader, every remaining author is failed without loading so the queues keep
+    draining, and it is raised again once the transform stage is done.'''
+    batches = 0
+    done = False
+    fatal_error = None
+    while not done:
+        batch_urls, batch = [], []
+        batch_deadline = None
+        while len(batch_urls) < batch_size:
+            timeout = None if batch_deadline is None else batch_deadline - time.monotonic()
+            if timeout is not None and timeout <= 0:
+                break
+            try:
+                item = clean_queue.get(timeout=timeout)
+            except queue.Empty:
+                break
+            if item is DONE:
+                done = True
+                break
+            author_url, cleaned_author = item
+            # An author that failed validation cleans to an empty list
+            if not cleaned_author:
+                on_failure(author_url)
+                continue
+            batch_urls.append(author_url)
+            batch.extend(cleaned_author)
+            if batch_deadline is None:
+                batch_deadline = time.monotonic() + batch_seconds
+
+        if not batch_urls:
+            continue
+        if fatal_error is not None:
+            for author_url in batch_urls:
+                on_failure(author_url)
+            continue
+        started = time.monotonic()
+        try:
+            load(batch)
+        except BaseException as error:  # pylint: disable=broad-exception-caught
+            log.error("Unable to load a batch of %s authors: %s", len(batch_urls), error)
+            for author_url in batch_urls:
+                on_failure(author_url)
+            if not isinstance(error, Exception):
+                fatal_error = error
+        else:
+            for author_url in batch_urls:
+                try:
+                    on_loaded(author_url)
+                except Exception as error:
+                    log.error("Unable to record %s as loaded: %s", author_url, error)
+        metrics.record(started, len(batch_urls))
+        batches += 1
+    if fatal_error is not None:
+        raise fatal_error
+    return batches
+
+
+def run_stages(author_urls: list[str], extract_author: Callable[[str], dict],
+               clean: Callable[[list[dict]], list[dict]],
+               load: Callable[[list[dict]], None], log: logging.Logger,
+               on_loaded: Callable[[str], None] = None,
+               on_failure: Callable[[str], None] = None,
+               admit: Callable[[str], bool] = None, scrapers: int = None,
+               queue_size: int = None, batch_size: int = None,
+               batch_seconds: float = None) -> dict:
+    '''Runs every author through the extract, transform and load stages at once,
+    returning the throughput of each stage and the depth of each queue.
+    The load stage, on_loaded and on_failure all run on the loader thread,
+    so they can safely share a connection. Anything the load stage raises that
+    isn't an Exception is raised again here once every stage has stopped.'''
+    scrapers = scrapers or STAGED_SCRAPERS
+    queue_size = queue_size or STAGED_QUEUE_SIZE
+    on_loaded = on_loaded or (lambda author_url: None)
+    on_failure = on_failure or (lambda author_url: None)
+
+    author_queue = queue.Queue()
+    for author_url in author_urls:
+        author_queue.put(author_url)
+    raw_queue, clean_queue = MeasuredQueue(queue_size), MeasuredQueue(queue_size)
+    metrics = {'extract': StageMetrics(scrapers), 'transform': StageMetrics(),
+               'load': StageMetrics()}
+    loaded, failed = [], []
+    batches, load_errors = [], []
+
+    def loaded_author(author_url: str) -> None:
+        loaded.append(author_url)
+        on_loaded(author_url)
+
+    def failed_author(author_url: str) -> None:
+        failed.append(author_url)
+        on_failure(author_url)
+
+    started = time.monotonic()
+    scraper_threads = [threading.Thread(target=scrape_authors, args=(
+        author_queue, raw_queue, extract_author, metrics['extract'], log, admit))
+        for _ in range(scrapers)]
+    transform_thread = threading.Thread(target=transform_authors, args=(
+        raw_queue, clean_queue, clean, metrics['transform'], log))
+    def run_loader() -> None:
+        try:
+            batches.append(load_authors(
+                clean_queue, load, metrics['load'], log, loaded_author, failed_author,
+                batch_size or LOAD_BATCH_SIZE,
+                LOAD_BATCH_SECONDS if batch_seconds is None else batch_seconds))
+        except BaseException as error:  # pylint: disable=broad-exception-caught
+            load_errors.append(error)
+
+    loader_thread = threading.Thread(target=run_loader)
+    for thread in scraper_threads + [transform_thread, loader_thread]:
+        thread.start()
+    for thread in scraper_threads:
+        thread.join()
+    raw_queue.put(DONE)
+    transform_thread.join()
+    loader_thread.join()
+    if load_errors:
+        raise load_errors[0]
+    elapsed_seconds = time.monotonic() - started
+
+    stages = {name: stage.get_stats(elapsed_seconds) for name, stage in metrics.items()}
+    return {'authors_loaded': len(loaded), 'authors_failed': len(failed),
+            'load_batches': batches[0] if batches else 0,
+            'elapsed_seconds': round(elapsed_seconds, 3),
+            'stages': stages,
+            'queues': {'raw': raw_queue.get_stats(), 'clean': clean_queue.get_stats()},
+            'bottleneck': max(stages, key=lambda name: stages[name]['utilisation'])}
@@ -0,0 +1,42 @@
+# pylint: skip-file
+from os import path
+from unittest.mock import MagicMock
+import psycopg2
+from check_migrations import get_migrations, check_migrations, RESULT_CHECKS
+
+
+def test_get_migrations_starts_at_the_given_version():
+    versions = [path.basename(migration)[:3] for migration in get_migrations('002')]
+    assert versions[0] == '002'
+    assert versions == sorted(versions)
+    assert '001' not in versions
+
+
+def test_migration_002_keeps_one_measurement_a_day():
+    with open(get_migrations('002')[0], encoding='utf-8') as migration_file:
+        migration = migration_file.read()
+    assert migration.count('SELECT DISTINCT ON') == 2
+    assert migration.count('date_recorded DESC') == 2
+
+
+def test_check_migrations_applies_migrations_in_a_rolled_back_scratch_schema(capsys):
+    conn = MagicMock()
+    cursor = conn.cursor.return_value.__enter__.return_value
+    cursor.fetchone.side_effect = [(True,)] * (len(RESULT_CHECKS) - 1) + [(False,)]
+    failures = check_migrations(conn, get_migrations('002'), 2, 3, 4)
+    queries = [call.args[0] for call in cursor.execute.call_args_list]
+    assert queries[0] == 'CREATE SCHEMA migration_check'
+    assert queries[1] == 'SET LOCAL search_path TO migration_check'
+    assert any('ALTER TABLE book_measurement RENAME' in query for query in queries)
+    assert failures == [list(RESULT_CHECKS)[-1]]
+    assert conn.rollback.call_count == 1
+    assert 'Applied 002_partition_measurements.sql' in capsys.readouterr().out
+
+
+def test_check_migrations_reports_a_migration_that_fails():
+    conn = MagicMock()
+    cursor = conn.cursor.return_value.__enter__.return_value
+    cursor.execute.side_effect = [None] * 7 + [psycopg2.Error('could not create unique index')]
+    failures = check_migrations(conn, get_migrations('002'), 2, 3, 4)
+    assert failures == ['unable to apply the migrations: could not create unique index']
+    assert conn.rollback.call_count == 1
@@ -0,0 +1,57 @@
+# pylint: skip-file
+from unittest.mock import MagicMock
+from check_query_plans import get_scans, get_sequential_scans, check_query_plans, HOT_QUERIES, \
+    get_unpruned_tables
+
+INDEX_PLAN = {'Node Type': 'Nested Loop', 'Plans': [
+    {'Node Type': 'Index Scan', 'Relation Name': 'book'},
+    {'Node Type': 'Bitmap Heap Scan', 'Relation Name': 'book_measurement', 'Plans': [
+        {'Node Type': 'Bitmap Index Scan', 'Index Name': 'book_measurement_book_recorded'}]}]}
+SEQUENTIAL_PLAN = {'Node Type': 'Hash Join', 'Plans': [
+    {'Node Type': 'Seq Scan', 'Relation Name': 'book_measurement'},
+    {'Node Type': 'Hash', 'Plans': [{'Node Type': 'Seq Scan', 'Relation Name': 'pipeline_run'}]}]}
+
+
+def test_get_scans_walks_the_whole_plan():
+    assert get_scans(INDEX_PLAN) == [('Index Scan', 'book'),
+                                     ('Bitmap Heap Scan', 'book_measurement')]
+
+
+def test_get_sequential_scans_only_reports_checked_tables():
+    assert get_sequential_scans(INDEX_PLAN) == []
+    assert get_sequential_scans(SEQUENTIAL_PLAN) == ['book_measurement']
+
+
+def test_check_query_plans_explains_every_query_and_rolls_back(capsys):
+    conn = MagicMock()
+    cursor = conn.cursor.return_value.__enter__.return_value
+    cursor.description = [('author_id',), ('author_name',)]
+    cursor.fetchone.side_effect = [(1, 'Plan Check Author 1')] + \
+        [([{'Plan': INDEX_PLAN}],)] * len(HOT_QUERIES)
+    sequential_scans = check_query_plans(conn, 10, 2, 3)
+    queries = [call.args[0] for call in cursor.execute.call_args_list]
+    assert 'create_measurement_partition' in queries[0]
+    assert 'INSERT INTO book_measurement' in queries[4]
+    assert sum(query.startswith('EXPLAIN (FORMAT JSON)') for query in queries) == len(HOT_QUERIES)
+    assert cursor.execute.call_args.args[1] == {'author_id': 1, 'author_name': 'Plan Check Author 1'}
+    assert sequential_scans == {name: [] for name in HOT_QUERIES}
+    assert conn.rollback.call_count == 1
+    assert 'Index Scan on book' in capsys.readouterr().out
+
+
+def test_partitions_count_as_their_table():
+    plan = {'Node Type': 'Append', 'Plans': [
+        {'Node Type': 'Seq Scan', 'Relation Name': 'book_measurement_2026_09'},
+        {'Node Type': 'Index Scan', 'Relation Name': 'book_measurement_2026_10'}]}
+    assert get_sequential_scans(plan) == ['book_measurement_2026_09']
+
+
+def test_get_unpruned_tables_flags_recent_queries_reading_old_partitions():
+    plan = {'Node Type': 'Append', 'Plans': [
+        {'Node Type': 'Index Scan', 'Relation Name': f'book_measurement_2026_{month:02}'}
+        for month in range(1, 11)]}
+    assert get_unpruned_tables('recent book measurements', plan) == \
+        ['book_measurement (10 partitions)']
+    assert get_unpruned_tables('recent book measurements', {
+        'Node Type': 'Append', 'Plans': plan['Plans'][-2:]}) == []
+    assert get_unpruned_tables('books by author', plan) == []
@@ -0,0 +1,53 @@
+# pylint: skip-file
+import pandas as pd
+from unittest.mock import MagicMock, patch
+import checkpoint
+from checkpoint import RunCheckpoint
+
+AUTHOR_URL = 'https://www.goodreads.com/author/show/153394'
+OTHER_AUTHOR_URL = 'https://www.goodreads.com/author/show/1077326'
+AUTHORS_DF = pd.DataFrame({'author_id': [1, 2], 'author_url': [AUTHOR_URL, OTHER_AUTHOR_URL]})
+
+
+@patch('checkpoint.pd.read_sql')
+def test_get_authors_to_run_skips_loaded_authors(mock_read_sql):
+    mock_read_sql.side_effect = [AUTHORS_DF, pd.DataFrame({'author_url': [AUTHOR_URL]})]
+    run_checkpoint = RunCheckpoint(MagicMock(), '2025-05-01T090000')
+    assert run_checkpoint.get_authors_to_run([AUTHOR_URL, OTHER_AUTHOR_URL]) == [OTHER_AUTHOR_URL]
+    assert mock_read_sql.call_args.kwargs['params'] == ('2025-05-01T090000', 'loaded')
+
+
+@patch('checkpoint.pd.read_sql', return_value=AUTHORS_DF)
+def test_mark_upserts_author_stage(mock_read_sql):
+    conn = MagicMock()
+    run_checkpoint = RunCheckpoint(conn, 'run')
+    run_checkpoint.mark(OTHER_AUTHOR_URL, checkpoint.TRANSFORMED)
+    cursor = conn.cursor.return_value.__enter__.return_value
+    query, params = cursor.execute.call_args.args
+    assert 'ON CONFLICT (run_id, author_id)' in query
+    assert params == ('run', 2, 'transformed')
+    conn.commit.assert_called_once()
+
+
+@patch('checkpoint.pd.read_sql', return_value=AUTHORS_DF)
+def test_mark_ignores_unknown_author(mock_read_sql):
+    conn = MagicMock()
+    RunCheckpoint(conn, 'run').mark('https://www.goodreads.com/author/show/9', checkpoint.LOADED)
+    conn.commit.assert_not_called()
+
+
+@patch('checkpoint.pd.read_sql')
+def test_get_interrupted_run_id(mock_read_sql):
+    mock_read_sql.return_value = pd.DataFrame({'run_id': ['2025-05-01T090000']})
+    assert checkpoint.get_interrupted_run_id(MagicMock()) == '2025-05-01T090000'
+    mock_read_sql.return_value = pd.DataFrame({'run_id': []})
+    assert checkpoint.get_interrupted_run_id(MagicMock()) is None
+
+
+@patch('checkpoint.pd.read_sql', return_value=pd.DataFrame({'run_id': []}))
+def test_get_interrupted_run_id_looks_back_by_the_hour(mock_read_sql):
+    checkpoint.get_interrupted_run_id(MagicMock(), window_hours=6)
+    query = mock_read_sql.call_args.args[0]
+    assert 'CURRENT_DATE' not in query
+    assert "CURRENT_TIMESTAMP - %s * INTERVAL '1 hour'" in query
+    assert mock_read_sql.call_args.kwargs['params'] == (6,)
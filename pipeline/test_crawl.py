@@ -0,0 +1,75 @@
+# pylint: skip-file
+import logging
+import pytest
+from os import path
+from bs4 import BeautifulSoup
+from unittest.mock import patch
+import extract
+import crawl
+
+log = logging.getLogger()
+AUTHOR_URL = 'https://www.goodreads.com/author/show/153394.Suzanne_Collins'
+
+
+def get_soup_from_file(filename: str) -> BeautifulSoup:
+    with open(path.join(path.dirname(__file__), filename), 'r', encoding="utf-8") as f:
+        return BeautifulSoup(f.read(), "lxml")
+
+
+@pytest.fixture(scope='module')
+def fake_get_soup():
+    '''Returns the test html for each type of goodreads page by url'''
+    pages = {'/author/show/': get_soup_from_file('test_author_page.html'),
+             '/author/list/': get_soup_from_file('test_book_list.html'),
+             '/book/show/': get_soup_from_file('test_book_page.html')}
+
+    def get_soup(url):
+        for url_path, soup in pages.items():
+            if url_path in url:
+                return soup
+        raise extract.ScrapingError(f"Unable to scrape {url}.")
+    return get_soup
+
+
+def test_crawl_author_matches_get_author_data(fake_get_soup):
+    with patch('extract.get_soup', side_effect=fake_get_soup):
+        expected = extract.get_author_data(AUTHOR_URL)
+        crawled = []
+        stats = crawl.run_crawl([AUTHOR_URL], crawled.append, log, concurrency=4)
+    assert stats == {'authors_crawled': 1, 'authors_failed': 0}
+    assert crawled == [expected]
+
+
+def test_crawl_authors_counts_failed_authors(fake_get_soup):
+    author_urls = [AUTHOR_URL, 'https://www.goodreads.com/unknown', AUTHOR_URL]
+    with patch('extract.get_soup', side_effect=fake_get_soup):
+        crawled = []
+        failed = []
+        stats = crawl.run_crawl(author_urls, crawled.append, log, concurrency=4,
+                                on_failure=failed.append)
+    assert stats == {'authors_crawled': 2, 'authors_failed': 1}
+    assert len(crawled) == 2
+    assert failed == ['https://www.goodreads.com/unknown']
+
+
+def test_crawl_book_skips_unscrapable_book_page(fake_get_soup):
+    def failing_book_pages(url):
+        if '/book/show/' in url:
+            raise extract.ScrapingError(f"Unable to scrape {url}.")
+        return fake_get_soup(url)
+
+    with patch('extract.get_soup', side_effect=failing_book_pages):
+        crawled = []
+        crawl.run_crawl([AUTHOR_URL], crawled.append, log, concurrency=4)
+    assert crawled[0]['books'] == []
+    assert crawled[0]['author_name'] == 'Suzanne Collins'
+
+
+def test_crawl_authors_skips_authors_not_admitted(fake_get_soup):
+    author_urls = [AUTHOR_URL, AUTHOR_URL + '?skip']
+    with patch('extract.get_soup', side_effect=fake_get_soup):
+        crawled = []
+        stats = crawl.run_crawl(author_urls, crawled.append, log, concurrency=4,
+                                admit=lambda author_url: 'skip' not in author_url)
+    assert stats == {'authors_crawled': 1, 'authors_failed': 0}
+    assert [author['author_url'] for author in crawled] == [AUTHOR_URL]
@@ -0,0 +1,99 @@
+# pylint: skip-file
+import json
+from unittest.mock import MagicMock, patch
+import pandas as pd
+import deadline
+from deadline import (DeadlineScheduler, create_scheduler, get_remaining_seconds,
+                      load_run_cost_history, save_run_costs)
+from pipeline import get_author_callbacks
+
+AUTHOR_URL = 'https://www.goodreads.com/author/show/153394.Suzanne_Collins'
+
+
+def test_get_remaining_seconds_from_lambda_context():
+    context = MagicMock()
+    context.get_remaining_time_in_millis.return_value = 90000
+    assert get_remaining_seconds(context) == 90
+
+
+def test_get_remaining_seconds_without_deadline(monkeypatch):
+    monkeypatch.setattr(deadline, 'RUN_DEADLINE_SECONDS', None)
+    assert get_remaining_seconds(None) is None
+    monkeypatch.setattr(deadline, 'RUN_DEADLINE_SECONDS', '600')
+    assert get_remaining_seconds(None) == 600
+
+
+def test_scheduler_without_deadline_admits_everyone():
+    scheduler = DeadlineScheduler(None, history_path=None)
+    assert all(scheduler.admit(f'{AUTHOR_URL}{i}') for i in range(100))
+    assert scheduler.get_continuation() is None
+
+
+def test_scheduler_stops_admitting_before_deadline():
+    scheduler = DeadlineScheduler(100, margin_seconds=30, author_cost=40, history_path=None)
+    assert scheduler.admit(AUTHOR_URL)
+    scheduler.author_cost = 80
+    assert not scheduler.admit(AUTHOR_URL + '2')
+    assert not scheduler.admit(AUTHOR_URL + '3')
+    assert scheduler.get_continuation() == {
+        'author_urls': [AUTHOR_URL + '2', AUTHOR_URL + '3'],
+        'author_cost_seconds': 80}
+
+
+def test_scheduler_updates_cost_from_finished_authors():
+    scheduler = DeadlineScheduler(None, author_cost=10, history_path=None)
+    scheduler.admit(AUTHOR_URL)
+    scheduler.finish(AUTHOR_URL)
+    assert scheduler.author_cost < 10
+    assert scheduler.get_stats()['authors_finished'] == 1
+
+
+def test_scheduler_uses_and_saves_cost_history(tmp_path):
+    history_path = tmp_path / 'author_costs.json'
+    history_path.write_text(json.dumps([4, 5, 6]))
+    scheduler = DeadlineScheduler(None, history_path=str(history_path))
+    assert scheduler.author_cost == 5
+
+    scheduler.admit(AUTHOR_URL)
+    scheduler.finish(AUTHOR_URL)
+    scheduler.save_history()
+    assert len(json.loads(history_path.read_text())) == 4
+
+
+def test_create_scheduler_carries_on_continuation_cost():
+    scheduler = create_scheduler(None, {'author_urls': [AUTHOR_URL],
+                                        'author_cost_seconds': 12.5})
+    assert scheduler.author_cost == 12.5
+
+
+def test_scheduler_starts_from_given_history():
+    scheduler = DeadlineScheduler(None, history_path=None, history=[2, 30, 4])
+    assert scheduler.author_cost == 4
+
+
+def test_run_cost_history_is_read_from_and_added_to_pipeline_run():
+    conn = MagicMock()
+    with patch('deadline.pd.read_sql',
+               return_value=pd.DataFrame({'seconds': [3.0, 5.0]})) as read_sql:
+        assert load_run_cost_history(conn, 2) == [3, 5]
+    assert read_sql.call_args.kwargs['params'] == (2,)
+
+    save_run_costs(conn, 'run-1', [1.23456, 2])
+    cursor = conn.cursor.return_value.__enter__.return_value
+    assert 'author_seconds' in cursor.execute.call_args.args[0]
+    assert cursor.execute.call_args.args[1] == ([1.235, 2], 'run-1')
+    assert conn.commit.call_count == 1
+
+
+def test_author_finishes_after_loading():
+    scheduler = DeadlineScheduler(None, author_cost=10, history_path=None)
+    scheduler.admit(AUTHOR_URL)
+    finished_while_loading = []
+
+    def transform_and_load(*args):
+        finished_while_loading.append(scheduler.get_stats()['authors_finished'])
+    with patch('pipeline.transform_and_load', side_effect=transform_and_load):
+        on_author, _ = get_author_callbacks(MagicMock(), MagicMock(), scheduler=scheduler)
+        on_author({'author_url': AUTHOR_URL})
+    assert finished_while_loading == [0]
+    assert scheduler.get_stats()['authors_finished'] == 1
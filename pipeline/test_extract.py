@@ -3,6 +3,7 @@ import pytest
 from os import path
 from bs4 import BeautifulSoup
 from unittest.mock import patch
+import requests
 import extract
 
 
@@ -127,5 +128,112 @@ def test_get_individual_book_data(patch_get_soup, mock_book_list_page_container_
         'rating_count': '9,369,265',
         'review_count': '238,122',
         'small_image_url': 'https://i.gr-assets.com/images/S/compressed.photo.goodreads.com/books/1586722975i/2767052._SX50_.jpg',
-        'year_published': '2008'
+        'year_published': '2008',
+        'book_page_fetched': True
     }
+
+
+@patch('extract.get_soup')
+def test_get_authors_books_concurrently_keeps_list_order(patch_get_soup, mock_book_list_page_soup, mock_book_page_soup):
+    '''Tests the thread pool mode of 'get_authors_books' returns
+    the books in the same order as the book list html'''
+    patch_get_soup.return_value = mock_book_page_soup
+    serial = extract.get_authors_books(mock_book_list_page_soup, max_workers=1)
+    concurrent = extract.get_authors_books(
+        mock_book_list_page_soup, max_workers=4)
+    assert concurrent == serial
+    assert len(concurrent) == len(mock_book_list_page_soup.find_all("tr"))
+
+
+@patch('extract.get_soup')
+def test_get_authors_books_concurrently_skips_failed_books(patch_get_soup, mock_book_list_page_soup, mock_book_page_soup):
+    '''Tests a book page that can't be scraped is dropped without
+    failing the rest of the author's books'''
+    def fake_get_soup(url):
+        if url.endswith('6148028-catching-fire'):
+            raise extract.ScrapingError(f"Unable to scrape {url}.")
+        return mock_book_page_soup
+
+    patch_get_soup.side_effect = fake_get_soup
+    result = extract.get_authors_books(mock_book_list_page_soup, max_workers=4)
+    titles = [book['book_title'] for book in result]
+    assert len(result) == len(mock_book_list_page_soup.find_all("tr")) - 1
+    assert titles[0] == 'The Hunger Games (The Hunger Games, #1)'
+    assert 'Catching Fire (The Hunger Games, #2)' not in titles
+
+
+@patch('extract.get_page')
+def test_get_soup_parses_fetched_html(patch_get_page):
+    '''Tests 'get_soup' parses the html returned by the shared session'''
+    patch_get_page.return_value.content = '<h1 class="authorName">Suzanne Collins</h1>'.encode(
+        'utf-8')
+    result = extract.get_soup('https://www.goodreads.com/author/show/153394')
+    assert extract.get_author_name(result) == 'Suzanne Collins'
+
+
+@patch('extract.get_page')
+def test_get_soup_raises_scraping_error(patch_get_page):
+    '''Tests 'get_soup' raises a ScrapingError when the page can't be fetched'''
+    patch_get_page.side_effect = requests.ConnectionError('connection refused')
+    with pytest.raises(extract.ScrapingError):
+        extract.get_soup('https://www.goodreads.com/author/show/153394')
+
+
+def make_book_list_page(book_list_soup: BeautifulSoup, rows: slice) -> BeautifulSoup:
+    '''Builds a book list page holding only the given rows of the test book list.'''
+    page = BeautifulSoup(book_list_soup.decode(), 'lxml')
+    containers = page.find_all('tr')
+    for index, book_container in enumerate(containers):
+        if index not in range(len(containers))[rows]:
+            book_container.decompose()
+    return page
+
+
+@patch('extract.get_individual_book_data', side_effect=extract.get_book_url)
+@patch('extract.get_soup')
+def test_iter_authors_books_walks_pages_until_no_new_books(
+        patch_get_soup, patch_get_book_data, mock_book_list_page_soup):
+    '''Tests later pages are fetched lazily and the walk stops at a page with no new books'''
+    first_page = make_book_list_page(mock_book_list_page_soup, slice(0, 3))
+    patch_get_soup.side_effect = [
+        make_book_list_page(mock_book_list_page_soup, slice(2, 5)),
+        make_book_list_page(mock_book_list_page_soup, slice(3, 5))]
+
+    books = extract.iter_authors_books(
+        'https://www.goodreads.com/author/list/153394', first_page, max_books=100, max_workers=1)
+    first_books = [next(books) for _ in range(3)]
+    assert patch_get_soup.call_count == 0
+
+    all_books = first_books + list(books)
+    expected_urls = [extract.get_book_url(container)
+                     for container in mock_book_list_page_soup.find_all('tr')[:5]]
+    assert all_books == expected_urls
+    assert patch_get_soup.call_args_list[0].args == (
+        'https://www.goodreads.com/author/list/153394?page=2&per_page=30',)
+    assert patch_get_soup.call_count == 2
+
+
+@patch('extract.get_individual_book_data', side_effect=extract.get_book_url)
+@patch('extract.get_soup')
+def test_iter_authors_books_stops_at_max_books(
+        patch_get_soup, patch_get_book_data, mock_book_list_page_soup):
+    '''Tests the walk stops once the max books have been yielded'''
+    first_page = make_book_list_page(mock_book_list_page_soup, slice(0, 3))
+    patch_get_soup.return_value = make_book_list_page(mock_book_list_page_soup, slice(3, 6))
+
+    books = list(extract.iter_authors_books(
+        'https://www.goodreads.com/author/list/153394', first_page, max_books=4, max_workers=1))
+    assert len(books) == 4
+    assert patch_get_soup.call_count == 1
+
+
+@patch('extract.get_soup')
+def test_get_authors_books_measurement_data_paginated(
+        patch_get_soup, mock_author_page_soup, mock_book_list_page_soup):
+    '''Tests paginated mode returns the books as a generator without fetching any book pages'''
+    patch_get_soup.return_value = mock_book_list_page_soup
+    result = extract.get_authors_books_measurement_data(mock_author_page_soup, paginated=True)
+    assert result['shelved_count'] == extract.get_shelved_books_count(mock_book_list_page_soup)
+    assert not isinstance(result['books'], list)
+    assert patch_get_soup.call_count == 1
+    assert patch_get_soup.call_args.args[0].endswith('?page=1&per_page=30')
@@ -0,0 +1,146 @@
+# pylint: skip-file
+import threading
+import pytest
+from os import path
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from bs4 import BeautifulSoup
+from unittest.mock import patch
+import extract
+import fast_extract
+import http_session
+from benchmark_parsers import soup_author_page, soup_book_list_page, soup_book_page
+
+AUTHOR_URL = 'https://www.goodreads.com/author/show/153394.Suzanne_Collins'
+
+
+def read_test_html(filename: str) -> str:
+    with open(path.join(path.dirname(__file__), filename), 'r', encoding="utf-8") as f:
+        return f.read()
+
+
+@pytest.fixture(scope='module')
+def test_pages():
+    return {'author': read_test_html('test_author_page.html'),
+            'book_list': read_test_html('test_book_list.html'),
+            'book': read_test_html('test_book_page.html')}
+
+
+def test_parse_author_page_matches_soup(test_pages):
+    result = fast_extract.parse_author_page(test_pages['author'])
+    assert result == soup_author_page(test_pages['author'])
+    assert result['goodreads_followers'] == '112,779'
+
+
+def test_parse_book_list_page_matches_soup(test_pages):
+    result = fast_extract.parse_book_list_page(test_pages['book_list'])
+    assert result == soup_book_list_page(test_pages['book_list'])
+    assert len(result['books']) == 49
+
+
+def test_parse_book_page_matches_soup(test_pages):
+    result = fast_extract.parse_book_page(test_pages['book'])
+    assert result == soup_book_page(test_pages['book'])
+    assert result == {
+        'big_image_url': 'https://images-na.ssl-images-amazon.com/images/S/compressed.photo.goodreads.com/books/1586722975i/2767052.jpg',
+        'review_count': '238,122'}
+
+
+def test_parse_book_page_chunks_stops_early(test_pages):
+    '''Only the chunks up to the review count should ever be read'''
+    html = test_pages['book']
+    chunks_read = []
+
+    def chunks():
+        for start in range(0, len(html), 16 * 1024):
+            chunks_read.append(start)
+            yield html[start:start + 16 * 1024]
+
+    fast_extract.parse_book_page_chunks(chunks())
+    assert len(chunks_read) < len(html) // (16 * 1024) // 4
+
+
+def test_parse_book_page_missing_fields():
+    with pytest.raises(extract.ScrapingError):
+        fast_extract.parse_book_page('<html><body><div>No book here</div></body></html>')
+
+
+def test_parse_author_page_missing_fields():
+    with pytest.raises(extract.ScrapingError):
+        fast_extract.parse_author_page('<html><body><h1>Not an author</h1></body></html>')
+
+
+def test_get_author_data_matches_extract(test_pages):
+    book_list_soup = BeautifulSoup(test_pages['book_list'], 'lxml')
+    for book_container in book_list_soup.find_all('tr')[3:]:
+        book_container.decompose()
+
+    def fake_fetch_html(url):
+        if '/author/show/' in url:
+            return test_pages['author']
+        if '/author/list/' in url:
+            return book_list_soup.decode()
+        return test_pages['book']
+
+    with patch('extract.fetch_html', side_effect=fake_fetch_html):
+        assert fast_extract.get_author_data(AUTHOR_URL) == extract.get_author_data(AUTHOR_URL)
+
+
+@pytest.fixture
+def book_page_server(test_pages):
+    pages = {'/book/show/1': test_pages['book'].encode('utf-8'),
+             '/book/show/2': b'<html><body><div>No book here</div></body></html>'}
+
+    class BookPageHandler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def do_GET(self):
+            body = pages[self.path]
+            self.send_response(200)
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            try:
+                self.wfile.write(body)
+            except (BrokenPipeError, ConnectionResetError):
+                pass
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), BookPageHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    http_session.reset_session()
+    yield f'http://127.0.0.1:{server.server_address[1]}'
+    http_session.reset_session()
+    server.shutdown()
+    server.server_close()
+
+
+def test_stream_book_page_stops_reading_early(book_page_server, test_pages):
+    stats_before = fast_extract.get_stream_stats()
+    result = fast_extract.stream_book_page(book_page_server + '/book/show/1')
+    assert result == soup_book_page(test_pages['book'])
+
+    stats = fast_extract.get_stream_stats()
+    assert stats['stopped_early'] == stats_before['stopped_early'] + 1
+    bytes_read = stats['bytes_read'] - stats_before['bytes_read']
+    assert bytes_read < len(test_pages['book'].encode('utf-8')) // 4
+
+
+def test_stream_book_page_falls_back_to_full_parse(book_page_server):
+    stats_before = fast_extract.get_stream_stats()
+    with pytest.raises(extract.ScrapingError):
+        fast_extract.stream_book_page(book_page_server + '/book/show/2')
+    stats = fast_extract.get_stream_stats()
+    assert stats['full_parses'] == stats_before['full_parses'] + 1
+
+
+def test_get_individual_book_data_streams_when_turned_on(test_pages):
+    book_container = BeautifulSoup(test_pages['book_list'], 'lxml').find('tr')
+    book_page = soup_book_page(test_pages['book'])
+    with patch('extract.BOOK_PAGE_STREAMING', True), \
+            patch('fast_extract.stream_book_page', return_value=book_page) as stream, \
+            patch('extract.get_soup', return_value=BeautifulSoup(test_pages['book'], 'lxml')):
+        streamed = extract.get_individual_book_data(book_container)
+        stream.assert_called_once()
+    with patch('extract.get_soup', return_value=BeautifulSoup(test_pages['book'], 'lxml')):
+        assert streamed == extract.get_individual_book_data(book_container)
@@ -0,0 +1,85 @@
+# pylint: skip-file
+import pytest
+from bs4 import BeautifulSoup
+from lxml import etree
+from unittest.mock import patch
+from extract import ScrapingError
+from field_spec import Field, PageSpec, BOOK_PAGE_SPEC, BOOK_LIST_ROW_SPEC, read_soup_field
+
+
+def parse_tree(html: str) -> etree.Element:
+    return etree.fromstring(html, etree.HTMLParser())
+
+
+def test_field_matches_single_class():
+    field = Field('span', 'votes')
+    assert field.matches(parse_tree('<span class="votes big">1</span>').find('.//span'))
+    assert not field.matches(parse_tree('<span class="count">1</span>').find('.//span'))
+
+
+def test_field_with_space_matches_exact_class():
+    field = Field('span', 'greyText smallText')
+    assert field.matches(parse_tree('<span class="greyText smallText">1</span>').find('.//span'))
+    assert not field.matches(parse_tree('<span class="greyText">1</span>').find('.//span'))
+
+
+def test_field_cleans_value_with_pattern_and_template():
+    field = Field('span', pattern=r'\s*(.*?)\s*\Z', template='#{}')
+    assert field.read_value(parse_tree('<span>  12 </span>').find('.//span')) == '#12'
+
+
+def test_field_raises_scraping_error_on_unexpected_value():
+    field = Field('span', pattern=r'(\d+)')
+    with pytest.raises(ScrapingError):
+        field.read_value(parse_tree('<span>none</span>').find('.//span'))
+
+
+def test_spec_reads_first_match_within_scope():
+    spec = PageSpec(scopes={'box': Field('div', 'box')},
+                    fields={'name': Field('b', within='box')})
+    html = '<b>outside</b><div class="box"><b>inside</b></div><b>after</b>'
+    assert spec.parse_tree(parse_tree(html)) == {'name': 'inside'}
+
+
+def test_spec_reads_rows():
+    spec = PageSpec(fields={'title': Field('h1')}, row_tag='tr',
+                    row_spec=PageSpec(fields={'cell': Field('td')}))
+    html = '<h1>T</h1><table><tr><td>a</td></tr><tr><td>b</td></tr></table>'
+    assert spec.parse_tree(parse_tree(html)) == {
+        'title': 'T', 'books': [{'cell': 'a'}, {'cell': 'b'}]}
+
+
+def test_spec_raises_scraping_error_on_missing_field():
+    spec = PageSpec(fields={'name': Field('h1')})
+    with pytest.raises(ScrapingError):
+        spec.parse_tree(parse_tree('<p>no heading</p>'))
+
+
+def test_spec_stops_once_all_fields_are_read():
+    html = ('<div class="BookCover__image"><img src="big.jpg"></div>'
+            '<div class="RatingStatistics__meta" aria-label="1 ratings and 2,000 reviews"></div>')
+    events = etree.iterwalk(parse_tree(html + '<p>rest</p>' * 5), events=('start', 'end'))
+    assert BOOK_PAGE_SPEC.parse(events) == {'big_image_url': 'big.jpg',
+                                            'review_count': '2,000'}
+    assert any(element.tag == 'p' for _, element in events)
+
+
+def test_spec_reads_the_same_fields_from_soup():
+    spec = PageSpec(scopes={'box': Field('div', 'box wide')},
+                    fields={'name': Field('b', within='box'),
+                            'link': Field('a', 'big', read='href', template='{base_url}{}')},
+                    row_tag='tr', row_spec=PageSpec(fields={'cell': Field('td')}))
+    html = ('<b>outside</b><div class="box wide"><b>inside</b></div><a class="big x" href="/1">'
+            '</a><table><tr><td>a</td></tr><tr><td>b</td></tr></table>')
+    with patch('field_spec.GOODREADS_BASE_URL', 'https://mock'):
+        assert spec.parse_soup(BeautifulSoup(html, 'lxml')) == spec.parse_tree(parse_tree(html))
+        assert read_soup_field(spec, 'link', BeautifulSoup(html, 'lxml')) == 'https://mock/1'
+
+
+def test_selected_fields_stop_at_the_last_one():
+    html = '<tr><td><a itemprop="url" href="/book/show/1"></a></td></tr>'
+    with patch('field_spec.GOODREADS_BASE_URL', 'https://mock'):
+        assert read_soup_field(BOOK_LIST_ROW_SPEC, 'book_url_path',
+                               BeautifulSoup(html, 'lxml')) == 'https://mock/book/show/1'
+    with pytest.raises(ScrapingError):
+        BOOK_LIST_ROW_SPEC.parse_soup(BeautifulSoup(html, 'lxml'))
@@ -0,0 +1,53 @@
+# pylint: skip-file
+import threading
+import pytest
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+import http_session
+
+
+class KeepAliveHandler(BaseHTTPRequestHandler):
+    '''Serves a small page over HTTP/1.1, echoing the Accept-Encoding header'''
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        body = self.headers.get('Accept-Encoding', '').encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def local_server_url():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), KeepAliveHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    http_session.reset_session()
+    yield f'http://127.0.0.1:{server.server_address[1]}'
+    http_session.reset_session()
+    server.shutdown()
+    server.server_close()
+
+
+def test_get_page_sends_compression_headers(local_server_url):
+    response = http_session.get_page(local_server_url + '/author/show/1')
+    assert response.text == 'gzip, deflate'
+
+
+def test_get_connection_stats_counts_reused_connections(local_server_url):
+    for page in range(3):
+        http_session.get_page(f'{local_server_url}/book/show/{page}')
+    assert http_session.get_connection_stats() == {
+        'requests': 3,
+        'connections_opened': 1,
+        'connections_reused': 2
+    }
+
+
+def test_get_connection_stats_without_session():
+    http_session.reset_session()
+    assert http_session.get_connection_stats() == {
+        'requests': 0, 'connections_opened': 0, 'connections_reused': 0}
@@ -0,0 +1,106 @@
+# pylint: skip-file
+import pandas as pd
+from datetime import datetime, timedelta
+from os import path
+from bs4 import BeautifulSoup
+from unittest.mock import MagicMock, patch
+import extract
+from incremental import KnownBooks, load_known_books, parse_count
+
+NOW = datetime(2025, 5, 1, 9, 0)
+BOOK_URL = 'https://www.goodreads.com/book/show/2767052-the-hunger-games'
+
+
+def make_known_books(days_ago=1, rating_count=8_000_000):
+    return KnownBooks([{'book_url_path': BOOK_URL, 'big_image_url': 'big.jpg',
+                        'review_count': 238122, 'rating_count': rating_count,
+                        'date_recorded': NOW - timedelta(days=days_ago)}],
+                      max_age_days=7, rating_count_change=0.01)
+
+
+def test_parse_count():
+    assert parse_count('8,712,345') == 8712345
+    assert parse_count('n/a') is None
+
+
+def test_fresh_known_book_skips_book_page():
+    known_books = make_known_books()
+    assert known_books.get_book_page_data(BOOK_URL, '8,040,000', NOW) == {
+        'big_image_url': 'big.jpg', 'review_count': '238,122', 'book_page_fetched': False}
+    assert known_books.get_stats() == {'book_pages_skipped': 1, 'book_pages_fetched': 0}
+
+
+def test_unknown_book_is_fetched():
+    known_books = make_known_books()
+    assert known_books.get_book_page_data(BOOK_URL + '-2', '8,000,000', NOW) is None
+    assert known_books.get_stats()['book_pages_fetched'] == 1
+
+
+def test_old_review_count_is_fetched():
+    assert make_known_books(days_ago=8).get_book_page_data(BOOK_URL, '8,000,000', NOW) is None
+
+
+def test_moved_rating_count_is_fetched():
+    assert make_known_books().get_book_page_data(BOOK_URL, '8,100,000', NOW) is None
+
+
+@patch('incremental.pd.read_sql')
+def test_load_known_books(mock_read_sql):
+    mock_read_sql.return_value = pd.DataFrame([{
+        'book_url_path': BOOK_URL, 'big_image_url': 'big.jpg', 'review_count': 1,
+        'rating_count': 1, 'date_recorded': NOW}])
+    assert BOOK_URL in load_known_books(MagicMock(), ['author-url'], NOW).books
+    params = mock_read_sql.call_args.kwargs['params']
+    assert params == {'author_urls': ['author-url'], 'fetched_since': NOW - timedelta(days=7)}
+
+
+def run_days(days, rating_counts):
+    '''Runs a book through a run a day, measuring it as the loader would and
+    reading it back as KNOWN_BOOKS_QUERY does, returning the days its page was fetched.'''
+    measurements = [{'book_url_path': BOOK_URL, 'big_image_url': 'big.jpg',
+                     'review_count': 238122, 'rating_count': rating_counts[0],
+                     'date_recorded': NOW, 'book_page_fetched': True}]
+    fetched_days = []
+    for day in range(1, days + 1):
+        now = NOW + timedelta(days=day)
+        fetched = [measurement for measurement in measurements
+                   if measurement['book_page_fetched']
+                   and measurement['date_recorded'] >= now - timedelta(days=7)]
+        known_books = KnownBooks(fetched[-1:], max_age_days=7, rating_count_change=0.01)
+        rating_count = rating_counts[day]
+        book_page = known_books.get_book_page_data(BOOK_URL, f'{rating_count:,}', now)
+        if book_page is None:
+            fetched_days.append(day)
+            book_page = {'big_image_url': 'big.jpg', 'review_count': '238,200'}
+        measurements.append({'book_url_path': BOOK_URL, 'big_image_url': 'big.jpg',
+                             'review_count': parse_count(book_page['review_count']),
+                             'rating_count': rating_count, 'date_recorded': now,
+                             'book_page_fetched': book_page.get('book_page_fetched', True)})
+    return fetched_days
+
+
+def test_skipped_runs_do_not_reset_the_review_count_age():
+    assert run_days(16, [8_000_000] * 17) == [8, 16]
+
+
+def test_slow_rating_count_growth_is_measured_from_the_last_fetch():
+    rating_counts = [8_000_000 + day * 30_000 for day in range(8)]
+    assert run_days(7, rating_counts) == [3, 6]
+
+
+@patch('extract.get_soup')
+def test_get_individual_book_data_skips_known_book_page(patch_get_soup):
+    with open(path.join(path.dirname(__file__), 'test_book_list.html'), encoding='utf-8') as f:
+        book_container = BeautifulSoup(f.read(), 'lxml').find('tr')
+    rating_count = extract.get_book_aggregate_data(book_container)['rating_count']
+    known_books = KnownBooks([{
+        'book_url_path': extract.get_book_url(book_container), 'big_image_url': 'big.jpg',
+        'review_count': 238122, 'rating_count': parse_count(rating_count),
+        'date_recorded': datetime.now()}])
+
+    with patch('extract.KNOWN_BOOKS', known_books):
+        book = extract.get_individual_book_data(book_container)
+    patch_get_soup.assert_not_called()
+    assert book['big_image_url'] == 'big.jpg'
+    assert book['review_count'] == '238,122'
+    assert book['rating_count'] == rating_count
@@ -6,7 +6,8 @@ from unittest.mock import MagicMock, patch
 from load import connect_to_database, get_database_authors, upload_new_values_to_database, get_author_id, \
     get_database_books_by_author, is_valid_port, COLUMN_NAMES_IN_TABLES, get_new_authors_or_books, format_values_to_upload, \
     get_values_to_upload, get_book_id, load_book_or_author_data_into_table, load_measurements_into_table, \
-    load_to_database
+    load_to_database, bulk_load_to_database, bulk_load_books_to_database, get_unique_rows, \
+    copy_measurements, merge_load_to_database, merge_load_books_to_database, upsert_measurements
 
 DB_USERNAME, DB_PASSWORD, DB_HOST, DB_NAME, DB_PORT = 'test_user', 'test_pass', 'test_host', 'test_name', '5432'
 
@@ -64,7 +65,8 @@ def book_info():
              'year_published': 2008,
              'average_rating': 4.34,
              'rating_count': 9365720,
-             'book_url_path': 'https://www.goodreads.com/book/show/6148028-catching-fire'
+             'book_url_path': 'https://www.goodreads.com/book/show/6148028-catching-fire',
+             'book_page_fetched': True
              },
             {
         'book_title': 'Catching Fire (The Hunger Games, #2)',
@@ -74,7 +76,8 @@ def book_info():
         'year_published': 2009,
         'average_rating': 4.34,
         'rating_count': 3882544,
-        'book_url_path': 'https://www.goodreads.com/book/show/7260188-mockingjay'
+        'book_url_path': 'https://www.goodreads.com/book/show/7260188-mockingjay',
+        'book_page_fetched': False
     }]
 
 
@@ -123,6 +126,14 @@ def test_upload_new_values_to_database_authors(fake_connection, capsys, formatte
     assert mock_cursor.executemany.call_count == 1
 
 
+def test_upload_measurements_skips_existing_day():
+    conn = MagicMock()
+    upload_new_values_to_database(
+        [(1, 2, 3.5, 4)], conn, COLUMN_NAMES_IN_TABLES['book_measurement'], 'book_measurement')
+    query = conn.cursor.return_value.executemany.call_args.args[0]
+    assert 'ON CONFLICT DO NOTHING' in query
+
+
 @patch("load.pd.read_sql")
 def test_get_author_id_one_name_returned(mock_read_sql, fake_connection, fake_author):
     mock_read_sql_returns = pd.DataFrame(
@@ -174,3 +185,190 @@ def test_get_database_books(mock_read_sql, fake_connection, book_info):
     assert mock_read_sql.call_count == 1
     assert isinstance(books, list) == True
     assert isinstance(books[0], dict) == True
+
+
+def fake_execute_values(cursor, query, values, page_size=None, fetch=False):
+    """Stands in for execute_values, returning ids for the upserted rows"""
+    if 'RETURNING author_url, author_id' in query:
+        return [(row[1], author_id) for author_id, row in enumerate(values, start=1)]
+    if 'RETURNING author_id, book_url_path, book_id' in query:
+        return [(row[0], row[5], book_id) for book_id, row in enumerate(values, start=10)]
+    return None
+
+
+@pytest.fixture
+def bulk_authors(book_info):
+    return [{'author_name': 'Suzanne Collins', 'author_url': 'url1',
+             'author_image_url': 'image1', 'rating_count': 10, 'average_rating': 4.1,
+             'shelved_count': 5, 'review_count': 2,
+             'books': [dict(book) for book in book_info]},
+            {'author_name': 'Author 2', 'author_url': 'url2',
+             'author_image_url': 'image2', 'rating_count': 20, 'average_rating': 3.9,
+             'shelved_count': 6, 'review_count': 3, 'books': []}]
+
+
+@patch("load.execute_values", side_effect=fake_execute_values)
+@patch("load.pd.read_sql")
+def test_bulk_load_uses_one_statement_per_table(mock_read_sql, mock_execute_values, bulk_authors):
+    conn = MagicMock()
+    bulk_load_to_database(bulk_authors, conn, COLUMN_NAMES_IN_TABLES)
+    queries = [call.args[1] for call in mock_execute_values.call_args_list]
+    assert len(queries) == 4
+    assert 'ON CONFLICT (author_url)' in queries[0]
+    assert 'INTO author_measurement' in queries[1]
+    assert 'ON CONFLICT (author_id, book_url_path)' in queries[2]
+    assert 'INTO book_measurement' in queries[3]
+    assert mock_read_sql.call_count == 0
+    assert conn.commit.call_count == 1
+
+
+@patch("load.execute_values", side_effect=fake_execute_values)
+def test_bulk_load_sets_returned_ids(mock_execute_values, bulk_authors):
+    bulk_load_to_database(bulk_authors, MagicMock(), COLUMN_NAMES_IN_TABLES)
+    assert [author['author_id'] for author in bulk_authors] == [1, 2]
+    assert [book['book_id'] for book in bulk_authors[0]['books']] == [10, 11]
+    book_measurements = mock_execute_values.call_args_list[3].args[2]
+    assert [measurement[0] for measurement in book_measurements] == [10, 11]
+
+
+@patch("load.execute_values", side_effect=psycopg2.Error("failed"))
+def test_bulk_load_rolls_back_on_error(mock_execute_values, bulk_authors):
+    conn = MagicMock()
+    with pytest.raises(psycopg2.Error):
+        bulk_load_to_database(bulk_authors, conn, COLUMN_NAMES_IN_TABLES)
+    assert conn.rollback.call_count == 1
+    assert conn.commit.call_count == 0
+
+
+@patch("load.execute_values", side_effect=fake_execute_values)
+def test_bulk_load_books_to_database(mock_execute_values, book_info):
+    books = [dict(book) for book in book_info]
+    bulk_load_books_to_database(books, 7, MagicMock(), COLUMN_NAMES_IN_TABLES)
+    assert mock_execute_values.call_count == 2
+    assert all(book['author_id'] == 7 for book in books)
+
+
+def test_get_unique_rows_keeps_last():
+    rows = [{'url': 'a', 'n': 1}, {'url': 'b', 'n': 2}, {'url': 'a', 'n': 3}]
+    assert get_unique_rows(rows, ['url']) == [{'url': 'a', 'n': 3}, {'url': 'b', 'n': 2}]
+
+
+def test_copy_measurements_flushes_in_chunks():
+    cursor = MagicMock()
+    copied = []
+    cursor.copy_expert.side_effect = lambda query, buffer: copied.append(buffer.read())
+    measurements = [{'book_id': book_id, 'rating_count': 10, 'average_rating': 4.5,
+                     'review_count': None, 'book_page_fetched': True}
+                    for book_id in range(1, 6)]
+    copy_measurements(measurements, cursor, 'book_measurement',
+                      COLUMN_NAMES_IN_TABLES['book_measurement'], flush_rows=2)
+    assert len(copied) == 3
+    assert copied[0].splitlines() == ['1,10,4.5,,True', '2,10,4.5,,True']
+    assert 'COPY book_measurement_copy' in cursor.copy_expert.call_args.args[0]
+    queries = [call.args[0] for call in cursor.execute.call_args_list]
+    assert 'CREATE TEMP TABLE IF NOT EXISTS book_measurement_copy' in queries[0]
+    assert all('ON CONFLICT DO NOTHING' in query
+               for query in queries[1:])
+
+
+@patch("load.COPY_MEASUREMENTS", True)
+@patch("load.execute_values", side_effect=fake_execute_values)
+def test_bulk_load_copies_measurements(mock_execute_values, bulk_authors):
+    conn = MagicMock()
+    bulk_load_to_database(bulk_authors, conn, COLUMN_NAMES_IN_TABLES)
+    assert mock_execute_values.call_count == 2
+    assert conn.cursor.return_value.copy_expert.call_count == 2
+
+
+@patch("load.MERGE_LOAD", True)
+@patch("load.execute_values", side_effect=fake_execute_values)
+def test_replayed_day_overwrites_stored_measurements(mock_execute_values, bulk_authors):
+    for author in bulk_authors:
+        author['date_recorded'] = '2025-05-01T09:00:00'
+        for book in author['books']:
+            book['date_recorded'] = '2025-05-01T09:00:00'
+    column_names = dict(COLUMN_NAMES_IN_TABLES)
+    for table_name in ('author_measurement', 'book_measurement'):
+        column_names[table_name] = COLUMN_NAMES_IN_TABLES[table_name] + ['date_recorded']
+    load_to_database(bulk_authors, MagicMock(), column_names, replace_measurements=True)
+
+    queries = [call.args[1] for call in mock_execute_values.call_args_list]
+    assert 'INSERT INTO author_measurement_2025_05' in queries[1]
+    assert ('ON CONFLICT (author_id, (CAST(date_recorded AS DATE))) DO UPDATE SET'
+            in queries[1])
+    assert 'rating_count = EXCLUDED.rating_count' in queries[1]
+    assert 'author_id = EXCLUDED.author_id' not in queries[1]
+    assert 'INSERT INTO book_measurement_2025_05' in queries[3]
+    assert ('ON CONFLICT (book_id, (CAST(date_recorded AS DATE))) DO UPDATE SET'
+            in queries[3])
+    author_measurements = mock_execute_values.call_args_list[1].args[2]
+    assert [measurement[0] for measurement in author_measurements] == [10, 20]
+
+
+def test_upsert_measurements_keeps_last_of_a_day():
+    measurements = [{'book_id': 1, 'rating_count': 10, 'date_recorded': '2025-05-01T09:00:00'},
+                    {'book_id': 1, 'rating_count': 12, 'date_recorded': '2025-05-01T18:00:00'},
+                    {'book_id': 1, 'rating_count': 15, 'date_recorded': '2025-06-01T09:00:00'}]
+    with patch("load.execute_values") as mock_execute_values:
+        upsert_measurements(measurements, MagicMock(), 'book_measurement',
+                            ['book_id', 'rating_count', 'date_recorded'])
+    calls = mock_execute_values.call_args_list
+    assert 'INTO book_measurement_2025_05' in calls[0].args[1]
+    assert [row[1] for row in calls[0].args[2]] == [12]
+    assert 'INTO book_measurement_2025_06' in calls[1].args[1]
+    assert [row[1] for row in calls[1].args[2]] == [15]
+
+
+def test_merge_load_stages_and_merges_in_one_transaction(bulk_authors):
+    conn = MagicMock()
+    cursor = conn.cursor.return_value
+    cursor.fetchall.return_value = [('url1', 1), ('url2', 2)]
+    merge_load_to_database(bulk_authors, conn, COLUMN_NAMES_IN_TABLES)
+    queries = [call.args[0] for call in cursor.execute.call_args_list]
+    assert 'CREATE TEMP TABLE author_stage ON COMMIT DROP' in queries[0]
+    assert 'ON CONFLICT (author_url) DO UPDATE' in queries[1]
+    assert 'INSERT INTO author_measurement' in queries[2]
+    assert 'CREATE TEMP TABLE book_stage ON COMMIT DROP' in queries[4]
+    assert 'IS DISTINCT FROM' in queries[5]
+    assert 'INSERT INTO book_measurement' in queries[6]
+    copies = [call.args[0] for call in cursor.copy_expert.call_args_list]
+    assert copies[0].startswith('COPY author_stage')
+    assert copies[1].startswith('COPY book_stage')
+    assert [author['author_id'] for author in bulk_authors] == [1, 2]
+    assert all(book['author_id'] == 1 for book in bulk_authors[0]['books'])
+    assert conn.commit.call_count == 1
+
+
+@patch("load.pd.read_sql")
+def test_merge_load_books_skips_python_diffing(mock_read_sql, book_info):
+    conn = MagicMock()
+    books = [dict(book) for book in book_info]
+    merge_load_books_to_database(books, 3, conn, COLUMN_NAMES_IN_TABLES)
+    copied = conn.cursor.return_value.copy_expert.call_args.args[1].getvalue().splitlines()
+    assert copied[0].startswith('3,"The Hunger Games (The Hunger Games, #1)"')
+    assert len(copied) == 2
+    assert mock_read_sql.call_count == 0
+
+
+@patch("load.pd.read_sql")
+def test_legacy_book_load_updates_changed_books_in_place(mock_read_sql, book_info):
+    column_names = COLUMN_NAMES_IN_TABLES['book']
+    books = [{**book, 'author_id': 1} for book in book_info]
+    stored_books = [dict(books[0], book_title='Old Title'), books[1]]
+    mock_read_sql.return_value = pd.DataFrame(stored_books)
+    conn = MagicMock()
+    cursor = conn.cursor.return_value
+    load_book_or_author_data_into_table(books + [books[0]], 'book', column_names, conn, 1)
+
+    assert cursor.executemany.call_count == 1
+    query, values = cursor.executemany.call_args.args
+    assert query.strip().startswith('UPDATE book SET')
+    assert 'WHERE author_id = %s AND book_url_path = %s' in query
+    assert values == [(books[0]['book_title'], 2008, books[0]['small_image_url'],
+                       books[0]['big_image_url'], 1, books[0]['book_url_path'])]
+
+
+def test_get_new_books_compares_author_and_url(book_info):
+    books = [{**book, 'author_id': 1} for book in book_info]
+    stored_books = [dict(books[0], book_title='Old Title')]
+    assert get_new_authors_or_books(books + [books[1]], stored_books, 'book', None) == [books[1]]
@@ -0,0 +1,48 @@
+# pylint: skip-file
+import pytest
+from unittest.mock import patch
+import extract
+import http_session
+from mock_goodreads import MockGoodreadsServer
+
+
+@pytest.fixture
+def mock_server():
+    http_session.reset_session()
+    with MockGoodreadsServer(authors=2, books_per_author=6, seed=1) as server:
+        with patch('field_spec.GOODREADS_BASE_URL', server.base_url):
+            yield server
+    http_session.reset_session()
+
+
+def test_mock_author_is_scraped(mock_server):
+    author = extract.get_author_data(mock_server.get_author_urls()[1])
+    assert author['author_name'] == 'Mock Author 1'
+    assert len(author['books']) == 6
+    book_urls = {book['book_url_path'] for book in author['books']}
+    assert len(book_urls) == 6
+    assert all(url.startswith(mock_server.base_url + '/book/show/9000010') for url in book_urls)
+
+
+def test_mock_book_list_is_paginated(mock_server):
+    author_soup = extract.get_soup(mock_server.get_author_urls()[0])
+    with patch('extract.BOOK_LIST_PER_PAGE', 4):
+        books_data = extract.get_authors_books_measurement_data(author_soup, paginated=True)
+        assert len(list(books_data['books'])) == 6
+
+
+def test_unknown_author_is_not_found(mock_server):
+    with pytest.raises(extract.ScrapingError):
+        extract.fetch_html(mock_server.base_url + '/author/show/1.Unknown')
+    assert mock_server.get_stats()['not_found'] == 1
+
+
+@pytest.mark.parametrize('options, status_code, stat', [
+    ({'throttle_rate': 1.0}, 429, 'throttled'),
+    ({'error_rate': 1.0}, 503, 'errors')])
+def test_injected_failures(options, status_code, stat):
+    with MockGoodreadsServer(authors=1, **options) as server:
+        response = http_session.get_page(server.get_author_urls()[0])
+        assert response.status_code == status_code
+        assert server.get_stats()[stat] == 1
+    http_session.reset_session()
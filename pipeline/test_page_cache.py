@@ -0,0 +1,71 @@
+# pylint: skip-file
+import pytest
+from unittest.mock import MagicMock
+from page_cache import PageCache, get_expiry_time
+
+URL = 'https://www.goodreads.com/book/show/2767052-the-hunger-games'
+
+
+def fake_response(status_code: int, html: str = '', headers: dict = None) -> MagicMock:
+    response = MagicMock()
+    response.status_code = status_code
+    response.content = html.encode('utf-8')
+    response.headers = headers or {}
+    return response
+
+
+@pytest.fixture
+def page_cache(tmp_path):
+    return PageCache(str(tmp_path), max_bytes=1024)
+
+
+def test_get_html_miss_stores_page(page_cache):
+    get_page = MagicMock(return_value=fake_response(
+        200, '<html>book</html>', {'ETag': '"abc"'}))
+    assert page_cache.get_html(URL, get_page) == '<html>book</html>'
+    assert page_cache.lookup(URL)['etag'] == '"abc"'
+    assert page_cache.get_stats()['misses'] == 1
+
+
+def test_get_html_sends_validators_and_reuses_body_on_304(page_cache):
+    page_cache.store(URL, '<html>book</html>',
+                     {'ETag': '"abc"', 'Last-Modified': 'Mon, 01 Sep 2025 00:00:00 GMT'})
+    get_page = MagicMock(return_value=fake_response(304))
+
+    assert page_cache.get_html(URL, get_page) == '<html>book</html>'
+    get_page.assert_called_once_with(URL, headers={
+        'If-None-Match': '"abc"',
+        'If-Modified-Since': 'Mon, 01 Sep 2025 00:00:00 GMT'})
+    assert page_cache.get_stats()['not_modified'] == 1
+
+
+def test_get_html_fresh_page_is_a_hit(page_cache):
+    page_cache.store(URL, '<html>book</html>',
+                     {'Cache-Control': 'public, max-age=600'})
+    get_page = MagicMock()
+    assert page_cache.get_html(URL, get_page) == '<html>book</html>'
+    assert get_page.call_count == 0
+    assert page_cache.get_stats()['hits'] == 1
+
+
+def test_store_skips_pages_without_validators(page_cache):
+    page_cache.store(URL, '<html>book</html>', {})
+    assert page_cache.lookup(URL) is None
+
+
+def test_store_evicts_least_recently_used(page_cache):
+    for page in range(3):
+        page_cache.store(f'{URL}/{page}', 'x' * 400, {'ETag': str(page)})
+    assert page_cache.lookup(f'{URL}/0') is None
+    assert page_cache.lookup(f'{URL}/2')['etag'] == '2'
+    assert page_cache.get_stats()['evictions'] == 1
+
+
+def test_cache_index_survives_restart(tmp_path, page_cache):
+    page_cache.store(URL, '<html>book</html>', {'ETag': '"abc"'})
+    assert PageCache(str(tmp_path), max_bytes=1024).lookup(URL)['html'] == '<html>book</html>'
+
+
+@pytest.mark.parametrize("cache_control", ['no-cache', 'private, max-age=0', ''])
+def test_get_expiry_time_requires_revalidation(cache_control):
+    assert get_expiry_time({'Cache-Control': cache_control}) == 0
@@ -0,0 +1,118 @@
+# pylint: skip-file
+import logging
+import pytest
+from os import path
+from bs4 import BeautifulSoup
+from unittest.mock import patch
+import extract
+from extract import ScrapingError
+from parse_pool import ParsePipeline, run_parse_pool, BOOK_PAGE
+from run_memo import RunMemo
+
+log = logging.getLogger()
+AUTHOR_URL = 'https://www.goodreads.com/author/show/153394.Suzanne_Collins'
+
+
+def read_test_html(filename: str) -> str:
+    with open(path.join(path.dirname(__file__), filename), 'r', encoding="utf-8") as f:
+        return f.read()
+
+
+def read_short_book_list_html(books: int = 3) -> str:
+    '''The test book list cut down to its first few books, to keep parsing quick'''
+    books_soup = BeautifulSoup(read_test_html('test_book_list.html'), "lxml")
+    for book_container in books_soup.find_all("tr")[books:]:
+        book_container.decompose()
+    return str(books_soup)
+
+
+@pytest.fixture(scope='module')
+def fake_fetch_html():
+    '''Returns the test html for each type of goodreads page by url'''
+    pages = {'/author/show/': read_test_html('test_author_page.html'),
+             '/author/list/': read_short_book_list_html(),
+             '/book/show/': read_test_html('test_book_page.html')}
+
+    def fetch_html(url):
+        for url_path, html in pages.items():
+            if url_path in url:
+                return html
+        raise extract.ScrapingError(f"Unable to scrape {url}.")
+    return fetch_html
+
+
+def make_pipeline(fetch) -> ParsePipeline:
+    return ParsePipeline(fetch_workers=4, parse_workers=2, queue_size=2, fetch=fetch)
+
+
+def test_run_parse_pool_matches_get_author_data(fake_fetch_html):
+    with patch('extract.get_soup',
+               side_effect=lambda url: BeautifulSoup(fake_fetch_html(url), "lxml")):
+        expected = extract.get_author_data(AUTHOR_URL)
+    extracted = []
+    stats = run_parse_pool([AUTHOR_URL], extracted.append, log,
+                           pipeline=make_pipeline(fake_fetch_html))
+    assert extracted == [expected]
+    assert stats['authors_extracted'] == 1
+    assert stats['pages_parsed'] == 2 + len(expected['books'])
+
+
+def test_run_parse_pool_counts_failed_authors_and_skips_failed_books(fake_fetch_html):
+    def fetch_html(url):
+        if url.endswith('2767052-the-hunger-games'):
+            raise extract.ScrapingError(f"Unable to scrape {url}.")
+        return fake_fetch_html(url)
+    author_urls = [AUTHOR_URL, 'https://www.goodreads.com/unknown', AUTHOR_URL]
+    extracted, failed = [], []
+    stats = run_parse_pool(author_urls, extracted.append, log, on_failure=failed.append,
+                           authors_in_flight=2, pipeline=make_pipeline(fetch_html))
+    assert stats['authors_extracted'] == 2
+    assert stats['authors_failed'] == 1
+    assert failed == ['https://www.goodreads.com/unknown']
+    assert all(len(author['books']) == 2 for author in extracted)
+
+
+def test_run_parse_pool_fails_authors_on_any_fetch_error(fake_fetch_html):
+    def fetch_html(url):
+        if '/author/list/' in url:
+            raise OSError("Unable to write the page cache")
+        return fake_fetch_html(url)
+    extracted, failed = [], []
+    stats = run_parse_pool([AUTHOR_URL], extracted.append, log, on_failure=failed.append,
+                           pipeline=make_pipeline(fetch_html))
+    assert failed == [AUTHOR_URL]
+    assert stats['authors_failed'] == 1
+    assert stats['pages_failed'] == 1
+
+
+def test_run_parse_pool_skips_authors_not_admitted(fake_fetch_html):
+    extracted = []
+    stats = run_parse_pool([AUTHOR_URL, AUTHOR_URL + '?x'], extracted.append, log,
+                           admit=lambda author_url: author_url == AUTHOR_URL,
+                           pipeline=make_pipeline(fake_fetch_html))
+    assert stats['authors_extracted'] == 1
+    assert [author['author_url'] for author in extracted] == [AUTHOR_URL]
+
+
+def test_run_parse_pool_reuses_book_pages_in_the_run_memo(fake_fetch_html):
+    fetched = []
+
+    def fetch_html(url):
+        fetched.append(url)
+        return fake_fetch_html(url)
+    extracted = []
+    with patch('extract.RUN_MEMO', RunMemo(10)):
+        run_parse_pool([AUTHOR_URL, AUTHOR_URL], extracted.append, log,
+                       authors_in_flight=1, pipeline=make_pipeline(fetch_html))
+    assert extracted[0] == extracted[1]
+    assert sum('/book/show/' in url for url in fetched) == len(extracted[0]['books'])
+
+
+def test_parse_pipeline_returns_parse_errors(fake_fetch_html):
+    with make_pipeline(lambda url: '<html></html>') as pipeline:
+        pipeline.submit(BOOK_PAGE, 'https://www.goodreads.com/book/show/1', 'tag')
+        tag, parsed_page, error = pipeline.get_result()
+    assert tag == 'tag'
+    assert parsed_page is None
+    assert isinstance(error, ScrapingError)
+    assert pipeline.get_stats()['pages_failed'] == 1
@@ -0,0 +1,110 @@
+# pylint: skip-file
+import logging
+from datetime import date
+from unittest.mock import MagicMock
+import psycopg2
+from load import MEASUREMENT_TABLES
+from partitions import (add_months, create_future_partitions, create_partitions_for_dates,
+                        get_partitions, archive_old_partitions, run_partition_maintenance)
+
+
+def fake_connection(partition_names: list[str] = None) -> MagicMock:
+    """Creates a connection whose cursor returns the given partitions"""
+    conn = MagicMock()
+    cursor = conn.cursor.return_value.__enter__.return_value
+    cursor.fetchone.side_effect = lambda: (cursor.execute.call_args.args[1][0] + '_partition',)
+    cursor.fetchall.side_effect = lambda: [
+        (name,) for name in partition_names or []
+        if name.startswith(cursor.execute.call_args.args[1][0] + '_')]
+    return conn
+
+
+def executed(conn: MagicMock) -> list:
+    return [call.args for call in conn.cursor.return_value.__enter__.return_value.execute.call_args_list]
+
+
+def test_add_months_crosses_years():
+    assert add_months(date(2026, 11, 1), 3) == date(2027, 2, 1)
+    assert add_months(date(2026, 1, 1), -1) == date(2025, 12, 1)
+
+
+def test_create_future_partitions_covers_this_month_and_months_ahead():
+    conn = fake_connection()
+    partitions = create_future_partitions(conn, 2, today=date(2026, 12, 15))
+    months = [args[1][1] for args in executed(conn)]
+    assert months == [date(2026, 12, 1), date(2027, 1, 1), date(2027, 2, 1)] * 2
+    assert len(partitions) == 6
+    assert conn.commit.call_count == 1
+
+
+def test_create_partitions_for_dates_creates_each_month_once():
+    conn = fake_connection()
+    create_partitions_for_dates(conn, ['2025-04-09T10:00:00', '2025-04-30T23:00:00',
+                                       '2025-05-01T00:00:00'])
+    assert [args[1] for args in executed(conn)] == [
+        ('author_measurement', date(2025, 4, 1)), ('author_measurement', date(2025, 5, 1)),
+        ('book_measurement', date(2025, 4, 1)), ('book_measurement', date(2025, 5, 1))]
+
+
+def test_get_partitions_reads_the_month_from_the_name():
+    conn = fake_connection(['book_measurement_2026_09', 'book_measurement_old'])
+    assert get_partitions(conn, 'book_measurement') == [
+        ('book_measurement_2026_09', date(2026, 9, 1))]
+
+
+def test_archive_old_partitions_detaches_months_before_retention():
+    conn = fake_connection(['author_measurement_2026_08', 'author_measurement_2026_09',
+                            'book_measurement_2026_07', 'book_measurement_2026_08',
+                            'book_measurement_2026_09', 'book_measurement_2026_10'])
+    archived = archive_old_partitions(conn, 2, 'archive', today=date(2026, 10, 18))
+    assert archived == ['author_measurement_2026_08',
+                        'book_measurement_2026_07', 'book_measurement_2026_08']
+    queries = [args[0] for args in executed(conn)]
+    assert 'ALTER TABLE book_measurement DETACH PARTITION book_measurement_2026_07' in queries
+    assert 'ALTER TABLE book_measurement_2026_08 SET SCHEMA archive' in queries
+
+
+def test_archive_old_partitions_keeps_everything_without_retention():
+    conn = fake_connection(['book_measurement_2020_01'])
+    assert archive_old_partitions(conn, 0, today=date(2026, 10, 18)) == []
+    assert conn.cursor.call_count == 0
+
+
+def test_run_partition_maintenance_logs_failures():
+    conn = MagicMock()
+    conn.cursor.return_value.__enter__.return_value.execute.side_effect = \
+        psycopg2.Error("no function")
+    stats = run_partition_maintenance(conn, logging.getLogger(), today=date(2026, 10, 18))
+    assert stats['partitions'] == []
+    assert 'error' in stats
+    assert conn.rollback.call_count == 1
+
+
+def maintained_connection(partition_names: list[str]) -> MagicMock:
+    """Creates a connection with the given partitions, where creating a partition
+    returns its name as create_measurement_partition does"""
+    conn = fake_connection(partition_names)
+    cursor = conn.cursor.return_value.__enter__.return_value
+    cursor.fetchone.side_effect = lambda: (
+        f"{cursor.execute.call_args.args[1][0]}_{cursor.execute.call_args.args[1][1]:%Y_%m}",)
+    return conn
+
+
+def analysed(conn: MagicMock) -> bool:
+    return any(args[0].startswith('ANALYZE') for args in executed(conn))
+
+
+def test_run_partition_maintenance_only_analyses_when_partitions_change():
+    months = ['2026_10', '2026_11', '2026_12', '2027_01']
+    conn = maintained_connection([f'{table}_{month}' for table in MEASUREMENT_TABLES
+                                  for month in months])
+    stats = run_partition_maintenance(conn, logging.getLogger(), today=date(2026, 10, 18))
+    assert len(stats['partitions']) == 8
+    assert stats['created'] == []
+    assert not analysed(conn)
+
+    conn = maintained_connection([f'{table}_{month}' for table in MEASUREMENT_TABLES
+                                  for month in months[:-1]])
+    stats = run_partition_maintenance(conn, logging.getLogger(), today=date(2026, 10, 18))
+    assert stats['created'] == ['author_measurement_2027_01', 'book_measurement_2027_01']
+    assert analysed(conn)
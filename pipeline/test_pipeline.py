@@ -0,0 +1,69 @@
+# pylint: skip-file
+import logging
+from unittest.mock import MagicMock, patch
+import pandas as pd
+import pipeline
+from extract import ScrapingError
+from pipeline import get_author_urls, run_pipeline, warn_if_unpaginated
+
+log = logging.getLogger()
+
+
+def test_warn_if_unpaginated_flags_modes_that_only_read_the_first_page(caplog):
+    with patch('extract.BOOK_LIST_PAGINATED', True):
+        assert not warn_if_unpaginated('serial', log)
+        assert warn_if_unpaginated('staged', log)
+        with patch.object(pipeline, 'PARSER_ENGINE', 'lxml'):
+            assert warn_if_unpaginated('serial', log)
+    assert 'staged mode with the soup parser' in caplog.text
+    with patch('extract.BOOK_LIST_PAGINATED', False):
+        assert not warn_if_unpaginated('async', log)
+
+
+def test_get_author_urls_reads_only_the_shard():
+    authors_df = pd.DataFrame({'author_url': ['https://www.goodreads.com/author/show/3']})
+    with patch('pipeline.pd.read_sql', return_value=authors_df) as read_sql:
+        assert get_author_urls(MagicMock(), 0, 3) == ['https://www.goodreads.com/author/show/3']
+    assert 'MOD(author_id, %(shard_count)s)' in read_sql.call_args.args[0]
+    assert read_sql.call_args.kwargs['params'] == {'shard': 0, 'shard_count': 3}
+
+
+def paginated_books(pages: int, error: Exception = None):
+    for page in range(pages):
+        yield from [{'book_url_path': f'/book/show/{page}'}] * 2
+    if error is not None:
+        raise error
+
+
+def run_paginated(raw_author: dict, cleaned_author: list[dict]):
+    checkpoint = MagicMock()
+    with patch('extract.BOOK_LIST_PAGINATED', True), \
+            patch('extract.BOOK_LIST_PER_PAGE', 2), \
+            patch('pipeline.extract_author', return_value=raw_author), \
+            patch('pipeline.clean_authors_info', return_value=cleaned_author), \
+            patch('pipeline.clean_books', side_effect=lambda books, log: books), \
+            patch('pipeline.load_to_database') as load_author, \
+            patch('pipeline.load_books_to_database') as load_books:
+        succeeded = run_pipeline('url', MagicMock(), log, checkpoint)
+    stages = [call.args[1] for call in checkpoint.mark.call_args_list]
+    return succeeded, stages, load_author, load_books
+
+
+def test_paginated_author_that_cleans_to_nothing_fails(caplog):
+    succeeded, stages, load_author, _ = run_paginated(
+        {'author_url': 'url', 'books': paginated_books(1)}, [])
+    assert not succeeded
+    assert stages == ['extracted']
+    assert load_author.call_count == 0
+    assert 'Unable to clean data for url' in caplog.text
+
+
+def test_paginated_author_keeps_pages_before_one_that_fails(caplog):
+    books = paginated_books(2, ScrapingError("Unable to scrape page 3."))
+    succeeded, stages, _, load_books = run_paginated(
+        {'author_url': 'url', 'books': books},
+        [{'author_url': 'url', 'author_id': 1, 'books': [{}, {}]}])
+    assert succeeded
+    assert stages == ['extracted', 'transformed', 'loaded']
+    assert load_books.call_count == 1
+    assert "Stopping url's books after 4" in caplog.text
@@ -0,0 +1,47 @@
+# pylint: skip-file
+import pandas as pd
+from datetime import datetime, timedelta
+from unittest.mock import MagicMock, patch
+import priority
+
+NOW = datetime(2025, 5, 1, 9, 0)
+
+
+def make_author(author_url, subscriber_count=0, days_ago=1.0, volatility=0.0):
+    return {'author_id': 1, 'author_url': author_url, 'subscriber_count': subscriber_count,
+            'last_recorded': None if days_ago is None else NOW - timedelta(days=days_ago),
+            'volatility': volatility}
+
+
+def test_get_days_since_measured():
+    assert priority.get_days_since_measured(NOW - timedelta(hours=36), NOW) == 1.5
+    assert priority.get_days_since_measured(pd.NaT, NOW) == priority.NEVER_MEASURED_DAYS
+
+
+def test_cold_authors_are_only_due_every_few_days():
+    assert not priority.is_due(make_author('cold', days_ago=2), NOW)
+    assert priority.is_due(make_author('cold', days_ago=8), NOW)
+    assert priority.is_due(make_author('never measured', days_ago=None), NOW)
+    assert priority.is_due(make_author('subscribed', subscriber_count=1, days_ago=0.5), NOW)
+    assert priority.is_due(make_author('volatile', volatility=0.02, days_ago=0.5), NOW)
+
+
+def test_score_author_favours_subscribers_staleness_and_volatility():
+    base = priority.score_author(make_author('base', subscriber_count=1), NOW)
+    assert priority.score_author(make_author('more', subscriber_count=7), NOW) > base
+    assert priority.score_author(make_author('stale', subscriber_count=1, days_ago=3), NOW) > base
+    assert priority.score_author(make_author('moving', subscriber_count=1, volatility=0.05), NOW) > base
+
+
+@patch('priority.pd.read_sql')
+def test_get_prioritised_author_urls(mock_read_sql):
+    mock_read_sql.return_value = pd.DataFrame([
+        make_author('cold', days_ago=2),
+        make_author('subscribed', subscriber_count=3),
+        make_author('never measured', days_ago=None),
+        make_author('volatile', volatility=0.01)])
+    author_urls = priority.get_prioritised_author_urls(MagicMock(), 1, 4, now=NOW)
+    assert author_urls == ['never measured', 'subscribed', 'volatile']
+    assert mock_read_sql.call_args.kwargs['params'] == {
+        'window': priority.VOLATILITY_DAYS, 'shard': 1, 'shard_count': 4}
+    assert 'MOD(a.author_id' in mock_read_sql.call_args.args[0]
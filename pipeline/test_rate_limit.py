@@ -0,0 +1,100 @@
+# pylint: skip-file
+import time
+import threading
+import pytest
+import requests
+from unittest.mock import MagicMock
+from email.utils import formatdate
+from rate_limit import HostLimiter, RateLimiter, get_retry_after
+
+URL = 'https://www.goodreads.com/book/show/1'
+
+
+def fake_response(status_code, headers=None):
+    response = MagicMock()
+    response.status_code = status_code
+    response.headers = headers or {}
+    return response
+
+
+def test_get_retry_after_seconds():
+    assert get_retry_after('3') == 3
+    assert get_retry_after(None) == 0
+    assert get_retry_after('soon') == 0
+
+
+def test_get_retry_after_http_date():
+    assert 8 < get_retry_after(formatdate(time.time() + 10, usegmt=True)) <= 10
+
+
+def test_healthy_responses_increase_limits():
+    limiter = HostLimiter(rate=100, max_rate=200, max_in_flight=4)
+    for _ in range(10):
+        limiter.acquire()
+        limiter.release(200, 0.1)
+    stats = limiter.get_stats()
+    assert stats['rate'] == 101
+    assert stats['concurrency_limit'] == 4
+    assert stats['in_flight'] == 0
+
+
+def test_throttled_response_halves_limits():
+    limiter = HostLimiter(rate=4, max_rate=5, max_in_flight=4)
+    limiter.concurrency = 4.0
+    limiter.acquire()
+    limiter.release(429, 0.1)
+    stats = limiter.get_stats()
+    assert stats['rate'] == 2
+    assert stats['concurrency_limit'] == 2
+    assert stats['throttled'] == 1
+
+
+def test_latency_spike_halves_limits():
+    limiter = HostLimiter(rate=4)
+    limiter.acquire()
+    limiter.release(200, 0.1)
+    limiter.decreased_at = 0
+    limiter.acquire()
+    limiter.release(200, 1.0)
+    assert limiter.get_stats()['latency_spikes'] == 1
+    assert limiter.rate == pytest.approx(2.05)
+
+
+def test_retry_after_pauses_host():
+    limiter = HostLimiter(rate=100)
+    limiter.acquire()
+    limiter.release(503, 0.01, retry_after='0.3')
+    start = time.monotonic()
+    limiter.acquire()
+    assert time.monotonic() - start >= 0.25
+
+
+def test_concurrency_limit_blocks_until_release():
+    limiter = HostLimiter(rate=100)
+    limiter.acquire()
+    acquired = threading.Event()
+    thread = threading.Thread(target=lambda: (limiter.acquire(), acquired.set()))
+    thread.start()
+    assert not acquired.wait(0.1)
+    limiter.release(200, 0.01)
+    assert acquired.wait(1)
+    thread.join()
+
+
+def test_fetch_records_responses_per_host():
+    rate_limiter = RateLimiter(rate=100)
+    assert rate_limiter.fetch(URL, lambda: fake_response(200)).status_code == 200
+    assert rate_limiter.get_stats()['www.goodreads.com']['requests'] == 1
+
+
+def test_fetch_counts_failed_requests():
+    rate_limiter = RateLimiter(rate=100)
+
+    def send():
+        raise requests.ConnectionError('connection refused')
+
+    with pytest.raises(requests.ConnectionError):
+        rate_limiter.fetch(URL, send)
+    stats = rate_limiter.get_stats()['www.goodreads.com']
+    assert stats['throttled'] == 1
+    assert stats['in_flight'] == 0
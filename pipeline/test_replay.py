@@ -0,0 +1,75 @@
+# pylint: skip-file
+import logging
+import pytest
+from os import path
+from bs4 import BeautifulSoup
+from unittest.mock import MagicMock, patch
+from snapshot_store import SnapshotStore
+import extract
+import replay
+
+log = logging.getLogger()
+AUTHOR_URL = 'https://www.goodreads.com/author/show/153394'
+
+
+def read_test_html(filename: str) -> str:
+    with open(path.join(path.dirname(__file__), filename), 'r', encoding="utf-8") as f:
+        return f.read()
+
+
+@pytest.fixture
+def stored_run(tmp_path):
+    '''Stores a run containing one author, their book list and book pages'''
+    store = SnapshotStore(str(tmp_path))
+    store.save(AUTHOR_URL, read_test_html('test_author_page.html'))
+    book_list_soup = BeautifulSoup(read_test_html('test_book_list.html'), 'lxml')
+    for book_container in book_list_soup.find_all('tr')[2:]:
+        book_container.decompose()
+    book_list = book_list_soup.decode()
+    store.save('https://www.goodreads.com/author/list/153394.Suzanne_Collins?page=1&per_page=10',
+               book_list)
+    book_page = read_test_html('test_book_page.html')
+    for book_container in BeautifulSoup(book_list, 'lxml').find_all('tr'):
+        store.save(extract.get_book_url(book_container), book_page)
+    store.write_manifest('2025-05-01T090000')
+    return str(tmp_path)
+
+
+def test_get_replayed_author_urls():
+    manifest = {'pages': {AUTHOR_URL: 'a', 'https://www.goodreads.com/book/show/1': 'b',
+                          'https://www.goodreads.com/author/list/153394': 'c'}}
+    assert replay.get_replayed_author_urls(manifest) == [AUTHOR_URL]
+
+
+def test_get_column_names_with_date_recorded():
+    columns = replay.get_column_names_with_date_recorded(
+        {'author': ['author_name'], 'author_measurement': ['rating_count'],
+         'book_measurement': ['book_id']})
+    assert columns['author'] == ['author_name']
+    assert columns['author_measurement'] == ['rating_count', 'date_recorded']
+    assert columns['book_measurement'] == ['book_id', 'date_recorded']
+
+
+def test_replay_author_missing_pages_returns_empty(stored_run):
+    assert replay.replay_author(stored_run, '2025-05-01T090000',
+                                'https://www.goodreads.com/author/show/1') == []
+
+
+@patch('replay.load_to_database')
+def test_replay_runs_loads_with_run_date(patch_load, stored_run):
+    stats = replay.replay_runs(MagicMock(), log, snapshot_dir=stored_run, workers=2)
+    assert stats == {'runs_replayed': 1, 'authors_loaded': 1, 'authors_failed': 0}
+
+    loaded_authors = patch_load.call_args[0][0]
+    assert patch_load.call_args.kwargs == {'replace_measurements': True}
+    recorded_at = SnapshotStore(stored_run).read_manifest(
+        '2025-05-01T090000')['recorded_at']
+    assert loaded_authors[0]['author_name'] == 'Suzanne Collins'
+    assert loaded_authors[0]['date_recorded'] == recorded_at
+    assert all(book['date_recorded'] == recorded_at
+               for book in loaded_authors[0]['books'])
+
+
+def test_replay_runs_requires_snapshot_dir():
+    with pytest.raises(ValueError):
+        replay.replay_runs(MagicMock(), log, snapshot_dir=None)
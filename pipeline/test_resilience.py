@@ -0,0 +1,101 @@
+# pylint: skip-file
+import pytest
+import requests
+from unittest.mock import MagicMock
+from resilience import CircuitBreaker, CircuitOpenError, ResilientFetcher, get_backoff
+
+URL = 'https://www.goodreads.com/book/show/1'
+
+
+def fake_response(status_code):
+    response = MagicMock()
+    response.status_code = status_code
+    return response
+
+
+def test_get_backoff_is_capped():
+    for attempt in range(10):
+        assert 0 <= get_backoff(attempt, base=0.5, maximum=4) <= min(4, 0.5 * 2 ** attempt)
+
+
+def test_fetch_retries_until_success():
+    send = MagicMock(side_effect=[fake_response(503), requests.ConnectionError(),
+                                  fake_response(200)])
+    sleep = MagicMock()
+    fetcher = ResilientFetcher(max_retries=3, sleep=sleep)
+    assert fetcher.fetch(URL, send).status_code == 200
+    assert send.call_count == 3
+    assert sleep.call_count == 2
+    assert fetcher.get_stats()['retries'] == 2
+
+
+def test_fetch_returns_last_failed_response():
+    fetcher = ResilientFetcher(max_retries=2, sleep=MagicMock())
+    response = fetcher.fetch(URL, MagicMock(return_value=fake_response(500)))
+    assert response.status_code == 500
+
+
+def test_fetch_raises_last_request_error():
+    fetcher = ResilientFetcher(max_retries=1, sleep=MagicMock())
+    with pytest.raises(requests.Timeout):
+        fetcher.fetch(URL, MagicMock(side_effect=requests.Timeout()))
+
+
+def test_fetch_stops_retrying_when_budget_is_used_up():
+    send = MagicMock(return_value=fake_response(503))
+    fetcher = ResilientFetcher(max_retries=5, retry_budget=2, sleep=MagicMock())
+    fetcher.fetch(URL, send)
+    assert send.call_count == 3
+    assert fetcher.get_stats()['budget_exhausted'] == 1
+    assert fetcher.get_stats()['retry_budget_left'] == 0
+
+
+def test_circuit_opens_at_error_rate():
+    breaker = CircuitBreaker(error_rate=0.5, window=4, min_requests=4, cooldown=60)
+    for succeeded in (True, False, True):
+        breaker.record(succeeded)
+    assert breaker.allow()
+    breaker.record(False)
+    assert breaker.is_open
+    assert not breaker.allow()
+
+
+def test_circuit_closes_after_successful_trial():
+    breaker = CircuitBreaker(error_rate=0.5, window=2, min_requests=2, cooldown=0)
+    breaker.record(False)
+    breaker.record(False)
+    assert breaker.allow()
+    assert not breaker.allow()
+    breaker.record(True)
+    assert not breaker.is_open
+
+
+def test_fetch_fails_fast_while_circuit_is_open():
+    send = MagicMock(side_effect=requests.ConnectionError())
+    fetcher = ResilientFetcher(max_retries=0, sleep=MagicMock())
+    fetcher.breakers['www.goodreads.com'] = CircuitBreaker(
+        error_rate=0.5, window=2, min_requests=2, cooldown=60)
+    for _ in range(2):
+        with pytest.raises(requests.ConnectionError):
+            fetcher.fetch(URL, send)
+    with pytest.raises(CircuitOpenError):
+        fetcher.fetch(URL, send)
+    assert send.call_count == 2
+    assert fetcher.get_stats()['open_circuits'] == ['www.goodreads.com']
+
+
+def test_reset_gives_the_next_run_a_full_budget_and_closed_circuits():
+    send = MagicMock(return_value=fake_response(503))
+    fetcher = ResilientFetcher(max_retries=5, retry_budget=2, sleep=MagicMock())
+    fetcher.fetch(URL, send)
+    fetcher.breakers['www.goodreads.com'] = CircuitBreaker(
+        error_rate=0.5, window=1, min_requests=1, cooldown=60)
+    fetcher.breakers['www.goodreads.com'].record(False)
+    assert fetcher.get_stats()['retry_budget_left'] == 0
+    assert fetcher.get_stats()['open_circuits'] == ['www.goodreads.com']
+
+    fetcher.reset()
+    send.reset_mock()
+    fetcher.fetch(URL, send)
+    assert send.call_count == 3
+    assert fetcher.get_stats()['retries'] == 2
@@ -0,0 +1,112 @@
+# pylint: skip-file
+import threading
+from os import path
+import pytest
+from bs4 import BeautifulSoup
+from unittest.mock import patch
+import extract
+from extract import ScrapingError
+from run_memo import RunMemo, normalise_url
+
+BOOK_URL = 'https://www.goodreads.com/book/show/2767052-the-hunger-games'
+
+
+def test_normalise_url_drops_slug_fragment_and_tracking_parameters():
+    assert normalise_url('https://WWW.Goodreads.com/author/show/153394.Suzanne_Collins'
+                         '?from_search=true&from_srp=true#books') == \
+        'https://www.goodreads.com/author/show/153394'
+    assert normalise_url(BOOK_URL) == normalise_url(
+        'https://www.goodreads.com/book/show/2767052.The_Hunger_Games')
+
+
+def test_normalise_url_keeps_page_parameters_in_order():
+    assert normalise_url('https://www.goodreads.com/author/list/153394?per_page=30&page=2') == \
+        'https://www.goodreads.com/author/list/153394?page=2&per_page=30'
+
+
+def test_get_memoises_parsed_result():
+    memo = RunMemo(10)
+    calls = []
+    parse = lambda: calls.append(1) or {'review_count': '1'}
+    assert memo.get('book_page', BOOK_URL, parse) == {'review_count': '1'}
+    assert memo.get('book_page', BOOK_URL + '?ref=x', parse) == {'review_count': '1'}
+    assert len(calls) == 1
+    assert memo.get_stats() == {'book_page': {'hits': 1, 'misses': 1,
+                                              'evictions': 0, 'hit_rate': 0.5}}
+
+
+def test_get_evicts_least_recently_used():
+    memo = RunMemo(2)
+    for book_id in (1, 2, 1, 3):
+        memo.get('book_page', f'https://www.goodreads.com/book/show/{book_id}',
+                 lambda: {})
+    assert memo.get_stats()['book_page']['evictions'] == 1
+    assert ('book_page', 'https://www.goodreads.com/book/show/1') in memo._entries
+    assert ('book_page', 'https://www.goodreads.com/book/show/2') not in memo._entries
+
+
+def test_failures_are_not_memoised():
+    memo = RunMemo(10)
+
+    def fail():
+        raise ScrapingError("Unable to scrape")
+    with pytest.raises(ScrapingError):
+        memo.get('book_page', BOOK_URL, fail)
+    assert memo.get('book_page', BOOK_URL, lambda: {'review_count': '2'}) == {'review_count': '2'}
+
+
+def test_concurrent_lookups_parse_once():
+    memo = RunMemo(10)
+    started, release = threading.Event(), threading.Event()
+    calls = []
+
+    def slow_parse():
+        calls.append(1)
+        started.set()
+        release.wait()
+        return {'review_count': '3'}
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(
+        memo.get('book_page', BOOK_URL, slow_parse))) for _ in range(3)]
+    threads[0].start()
+    started.wait()
+    for thread in threads[1:]:
+        thread.start()
+    release.set()
+    for thread in threads:
+        thread.join()
+    assert len(calls) == 1
+    assert results == [{'review_count': '3'}] * 3
+
+
+def test_peek_and_put_share_the_memoised_results():
+    memo = RunMemo(1)
+    assert memo.peek('book_page', BOOK_URL) is None
+    memo.put('book_page', BOOK_URL + '#reviews', {'review_count': '1'})
+    assert memo.peek('book_page', BOOK_URL) == {'review_count': '1'}
+    assert memo.get('book_page', BOOK_URL, lambda: {}) == {'review_count': '1'}
+    memo.put('book_page', 'https://www.goodreads.com/book/show/1', {})
+    assert memo.get_stats() == {'book_page': {'hits': 2, 'misses': 1,
+                                              'evictions': 1, 'hit_rate': 0.667}}
+
+
+def test_clear_resets_entries_and_stats():
+    memo = RunMemo(10)
+    memo.get('book_page', BOOK_URL, lambda: {})
+    memo.clear()
+    assert memo.get_stats() == {}
+    assert not memo._entries
+
+
+@patch('extract.get_soup')
+def test_get_individual_book_data_fetches_repeated_book_once(patch_get_soup):
+    with open(path.join(path.dirname(__file__), 'test_book_list.html'), encoding='utf-8') as f:
+        book_container = BeautifulSoup(f.read(), 'lxml').find('tr')
+    with open(path.join(path.dirname(__file__), 'test_book_page.html'), encoding='utf-8') as f:
+        patch_get_soup.return_value = BeautifulSoup(f.read(), 'lxml')
+
+    with patch('extract.RUN_MEMO', RunMemo(10)):
+        first = extract.get_individual_book_data(book_container)
+        second = extract.get_individual_book_data(book_container)
+    assert patch_get_soup.call_count == 1
+    assert first == second
@@ -0,0 +1,42 @@
+# pylint: skip-file
+import pytest
+from shard import dispatch_shards, get_shard_condition, get_shard_events, summarise_shards
+
+
+def fake_shard_handler(event):
+    return {'statusCode': 200,
+            'stats': {'authors': event['shard'] + 1, 'authors_finished': event['shard'] + 1,
+                      'authors_failed': 0}}
+
+
+def test_get_shard_condition():
+    assert get_shard_condition('a.author_id', '1', 3) == (
+        'MOD(a.author_id, %(shard_count)s) = %(shard)s', {'shard': 1, 'shard_count': 3})
+
+
+def test_get_shard_events():
+    events = get_shard_events({'mode': 'serial', 'run_id': 'run'}, 2)
+    assert events == [{'mode': 'serial', 'run_id': 'run', 'shard': 0, 'shard_count': 2},
+                      {'mode': 'serial', 'run_id': 'run', 'shard': 1, 'shard_count': 2}]
+
+
+def test_dispatch_shards_runs_local_worker_processes():
+    responses = dispatch_shards(get_shard_events({}, 3), 'local', fake_shard_handler)
+    assert [response['stats']['authors'] for response in responses] == [1, 2, 3]
+
+
+def test_dispatch_shards_rejects_unknown_backend():
+    with pytest.raises(ValueError):
+        dispatch_shards(get_shard_events({}, 2), 'carrier-pigeon', fake_shard_handler)
+
+
+def test_summarise_shards():
+    continuation = {'author_urls': ['https://www.goodreads.com/author/show/1'], 'shard': 1}
+    summary = summarise_shards([
+        {'statusCode': 200, 'stats': {'authors': 5, 'authors_finished': 5, 'authors_failed': 1}},
+        {'statusCode': 200, 'stats': {'authors': 4, 'authors_finished': 3, 'authors_failed': 0},
+         'continuation': continuation},
+        {'statusCode': 500}])
+    assert summary == {'shards': 3, 'shards_failed': 1, 'authors': 9,
+                       'authors_finished': 8, 'authors_failed': 1,
+                       'continuations': [continuation]}
@@ -0,0 +1,51 @@
+# pylint: skip-file
+import pytest
+from snapshot_store import SnapshotStore, get_digest
+
+AUTHOR_URL = 'https://www.goodreads.com/author/show/153394'
+BOOK_URL = 'https://www.goodreads.com/book/show/2767052-the-hunger-games'
+
+
+@pytest.fixture
+def snapshot_store(tmp_path):
+    return SnapshotStore(str(tmp_path))
+
+
+def test_save_is_content_addressed(snapshot_store, tmp_path):
+    first = snapshot_store.save(AUTHOR_URL, '<html>same</html>')
+    second = snapshot_store.save(BOOK_URL, '<html>same</html>')
+    assert first == second == get_digest('<html>same</html>')
+    assert len(list((tmp_path / 'objects').rglob('*.html.gz'))) == 1
+
+
+def test_load_decompresses_snapshot(snapshot_store):
+    digest = snapshot_store.save(AUTHOR_URL, '<html>author</html>')
+    assert snapshot_store.load(digest) == '<html>author</html>'
+
+
+def test_write_manifest_records_run_pages(snapshot_store):
+    digest = snapshot_store.save(AUTHOR_URL, '<html>author</html>')
+    snapshot_store.write_manifest('2025-05-01T090000')
+    manifest = snapshot_store.read_manifest('2025-05-01T090000')
+    assert manifest['pages'] == {AUTHOR_URL: digest}
+    assert snapshot_store.run_pages == {}
+    assert snapshot_store.list_runs() == ['2025-05-01T090000']
+
+
+def test_write_manifest_adds_to_resumed_run(snapshot_store):
+    author_digest = snapshot_store.save(AUTHOR_URL, '<html>author</html>')
+    snapshot_store.write_manifest('run')
+    book_digest = snapshot_store.save(BOOK_URL, '<html>book</html>')
+    snapshot_store.write_manifest('run')
+    assert snapshot_store.read_manifest('run')['pages'] == {
+        AUTHOR_URL: author_digest, BOOK_URL: book_digest}
+
+
+def test_replay_serves_stored_run(snapshot_store):
+    snapshot_store.save(AUTHOR_URL, '<html>author</html>')
+    snapshot_store.write_manifest('run')
+    snapshot_store.start_replay('run')
+    assert snapshot_store.replaying
+    assert snapshot_store.replay(AUTHOR_URL) == '<html>author</html>'
+    with pytest.raises(KeyError):
+        snapshot_store.replay(BOOK_URL)
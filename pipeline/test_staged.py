@@ -0,0 +1,85 @@
+# pylint: skip-file
+import time
+import logging
+import pytest
+from staged import MeasuredQueue, run_stages
+
+log = logging.getLogger()
+AUTHOR_URLS = [f'https://www.goodreads.com/author/show/{author_id}' for author_id in range(6)]
+
+
+def fake_extract(author_url):
+    if author_url.endswith('/3'):
+        raise ValueError("Unable to scrape")
+    return {'author_url': author_url, 'books': []}
+
+
+def test_run_stages_loads_every_author_in_batches():
+    batches, loaded, failed = [], [], []
+    stats = run_stages(AUTHOR_URLS, fake_extract, lambda authors: authors, batches.append,
+                       log, on_loaded=loaded.append, on_failure=failed.append,
+                       scrapers=2, queue_size=2, batch_size=2, batch_seconds=5)
+    assert sorted(loaded) == sorted(set(AUTHOR_URLS) - {AUTHOR_URLS[3]})
+    assert failed == [AUTHOR_URLS[3]]
+    assert all(len(batch) <= 2 for batch in batches)
+    assert sum(len(batch) for batch in batches) == 5
+    assert stats['authors_loaded'] == 5
+    assert stats['authors_failed'] == 1
+    assert stats['stages']['extract']['authors'] == 6
+    assert stats['queues']['raw']['max_depth'] <= 2
+
+
+def test_run_stages_fails_the_whole_batch_if_loading_fails():
+    def load(authors):
+        raise RuntimeError("database is down")
+    failed = []
+    stats = run_stages(AUTHOR_URLS[:2], fake_extract, lambda authors: authors, load, log,
+                       on_failure=failed.append, batch_size=5, batch_seconds=0)
+    assert sorted(failed) == AUTHOR_URLS[:2]
+    assert stats['authors_loaded'] == 0
+
+
+def test_run_stages_drains_and_reraises_when_the_loader_exits():
+    def load(authors):
+        raise SystemExit()
+    failed = []
+    with pytest.raises(SystemExit):
+        run_stages(AUTHOR_URLS, fake_extract, lambda authors: authors, load, log,
+                   on_failure=failed.append, scrapers=2, queue_size=1, batch_size=1,
+                   batch_seconds=0)
+    assert sorted(failed) == sorted(AUTHOR_URLS)
+
+
+def test_run_stages_fails_authors_that_clean_to_nothing():
+    loaded, failed = [], []
+    run_stages(AUTHOR_URLS[:2], fake_extract, lambda authors: [], lambda authors: None, log,
+               on_loaded=loaded.append, on_failure=failed.append, batch_seconds=0)
+    assert loaded == []
+    assert sorted(failed) == AUTHOR_URLS[:2]
+
+
+def test_run_stages_skips_authors_not_admitted():
+    loaded = []
+    run_stages(AUTHOR_URLS[:2], fake_extract, lambda authors: authors, lambda authors: None,
+               log, on_loaded=loaded.append, admit=lambda author_url: author_url.endswith('/0'))
+    assert loaded == [AUTHOR_URLS[0]]
+
+
+def test_run_stages_reports_slow_stage_as_bottleneck():
+    def slow_load(authors):
+        time.sleep(0.05)
+    stats = run_stages(AUTHOR_URLS[:4], lambda author_url: {'author_url': author_url},
+                       lambda authors: authors, slow_load, log,
+                       scrapers=4, queue_size=1, batch_size=1, batch_seconds=0)
+    assert stats['bottleneck'] == 'load'
+    assert stats['load_batches'] == 4
+
+
+def test_measured_queue_records_depth():
+    measured_queue = MeasuredQueue(3)
+    for item in range(3):
+        measured_queue.put(item)
+    measured_queue.get()
+    stats = measured_queue.get_stats()
+    assert stats['max_depth'] == 3
+    assert stats['average_depth'] == 2.0
@@ -8,7 +8,8 @@ from transform import (is_valid_int,
                        is_valid_url,
                        validate_author,
                        validate_book,
-                       clean_authors_info)
+                       clean_authors_info,
+                       clean_books)
 
 log = logging.getLogger()
 
@@ -21,7 +22,8 @@ PERFECTLY_FORMATTED_BOOK = {
     "review_count": 136598,
     "year_published": 2009,
     "average_rating": 4.34,
-    "rating_count": 3882544
+    "rating_count": 3882544,
+    "book_page_fetched": True
 }
 
 PERFECTLY_FORMATTED_AUTHOR = {
@@ -154,6 +156,13 @@ def test_invalid_book():
     assert validate_book(book_copy, log) is None
 
 
+def test_clean_books_drops_invalid_books():
+    invalid_book = deepcopy(VALID_BOOK_1)
+    invalid_book['review_count'] = None
+    books = clean_books(iter([deepcopy(VALID_BOOK_1), invalid_book]), log)
+    assert len(books) == 1
+
+
 # Test Author Cleaning
 def test_perfectly_formatted_author():
     author_copy = deepcopy(PERFECTLY_FORMATTED_AUTHOR)
@@ -1,10 +1,11 @@
 '''This module explores cleaning and transforming the data received from extract.py
 and converting it into a valid format for loading into the database'''
 
+import os
 import logging
 
 EXPECTED_KEYS = 9
-GOODREADS_URL = "https://www.goodreads.com/author/show/"
+GOODREADS_URL = os.environ.get("GOODREADS_BASE_URL", "https://www.goodreads.com") + "/author/show/"
 
 
 def clean_authors_info(authors: list[dict], log: logging.Logger) -> list[dict]:
@@ -15,16 +16,19 @@ def clean_authors_info(authors: list[dict], log: logging.Logger) -> list[dict]:
         valid_author = validate_author(author, log)
         if valid_author:
             valid_authors_list.append(valid_author)
+            author['books'] = clean_books(author['books'], log)
+    return valid_authors_list
 
-            valid_books_list = []
 
-            for book in author['books']:
-                valid_book = validate_book(book, log)
-                if valid_book:
-                    valid_books_list.append(valid_book)
+def clean_books(books: list[dict], log: logging.Logger) -> list[dict]:
+    '''Validates and filters a list of books, returning only valid entries'''
+    valid_books_list = []
 
-            author['books'] = valid_books_list
-    return valid_authors_list
+    for book in books:
+        valid_book = validate_book(book, log)
+        if valid_book:
+            valid_books_list.append(valid_book)
+    return valid_books_list
 
 
 def validate_author(author: dict, log: logging.Logger) -> dict:
@@ -70,6 +74,7 @@ def validate_book(book: dict, log: logging.Logger) -> dict:
         book['book_url_path'] = is_valid_url(book['book_url_path'])
         book['big_image_url'] = is_valid_image_url(book['big_image_url'])
         book['small_image_url'] = is_valid_image_url(book['small_image_url'])
+        book['book_page_fetched'] = book.get('book_page_fetched', True)
 
         return book
     except ValueError as e:
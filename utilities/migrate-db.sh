@@ -0,0 +1,20 @@
+source .env
+export PGPASSWORD=$DB_PASSWORD
+PSQL="psql -h $DB_HOST -p $DB_PORT -U $DB_USERNAME -d $DB_NAME"
+
+for migration in ../database/migrations/*.sql; do
+  version=$(basename "$migration" | cut -d_ -f1)
+  applied=$($PSQL -tAc "SELECT 1 FROM schema_migration WHERE version = '$version'" 2>/dev/null)
+  if [ "$applied" = "1" ]; then
+    continue
+  fi
+
+  echo "Applying migration $version"
+  $PSQL -v ON_ERROR_STOP=1 -1 -f "$migration"
+  if [ $? -ne 0 ]; then
+    echo "Failed to apply migration $version"
+    exit 1
+  fi
+done
+
+echo "Database is up to date"